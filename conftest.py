@@ -0,0 +1,28 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from stage.utils.waiting import SdkWaitAdapter
+
+# The SDK's wait_for_* methods of pipeline and snapshot commands poll once a second; the whole suite waits through
+# stage.utils.waiting's adaptive polling instead. Installed at configuration time, before plugins wrapping the SDK's
+# methods at session start (e.g. stage.utils.durations), so that those wrap the adapted methods.
+_sdk_wait_adapter = SdkWaitAdapter()
+
+
+def pytest_configure(config):
+    _sdk_wait_adapter.install()
+
+
+def pytest_unconfigure(config):
+    _sdk_wait_adapter.uninstall()
@@ -19,15 +19,21 @@ The tests in this module are for running JDBC based pipelines to assert on syste
 import logging
 import string
 import uuid
-from time import sleep
 
 import pytest
 import sqlalchemy
 from streamsets.testframework.markers import database
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.waiting import PipelineWaiter, WaitTimeoutError, wait_for
+
 logger = logging.getLogger(__name__)
 
+# Upper bound of how long the network stays disconnected for the pipeline to go into retry mode.
+RETRY_TIMEOUT_SEC = 5
+# Timeout of a status request, which may hang while SDC's network is disconnected.
+STATUS_REQUEST_TIMEOUT_SEC = 1
+
 
 @database
 def test_query_consumer_network(sdc_builder, sdc_executor, database):
@@ -74,7 +80,7 @@ def test_query_consumer_network(sdc_builder, sdc_executor, database):
         pipeline_cmd = sdc_executor.start_pipeline(pipeline)
         pipeline_cmd.wait_for_pipeline_output_records_count(int(number_of_rows/3))
         sdc_executor.container.network_disconnect()
-        sleep(5) # sleep few seconds to have pipeline go into retry mode
+        wait_for_retry(sdc_executor, pipeline)
         sdc_executor.container.network_reconnect()
         pipeline_cmd.wait_for_finished()
 
@@ -85,3 +91,21 @@ def test_query_consumer_network(sdc_builder, sdc_executor, database):
     finally:
         logger.info('Dropping table %s in %s database...', table_name, database.type)
         table.drop(database.engine)
+
+
+def wait_for_retry(sdc_executor, pipeline):
+    """Wait for the pipeline to go into retry mode, but no longer than :py:const:`RETRY_TIMEOUT_SEC`. SDC may not
+    be reachable while its network is disconnected, in which case this simply waits out the whole time.
+    """
+    waiter = PipelineWaiter(sdc_executor, request_timeout_sec=STATUS_REQUEST_TIMEOUT_SEC)
+
+    def in_retry():
+        try:
+            return waiter.get_status(pipeline) in ('RUNNING_ERROR', 'RETRY')
+        except Exception as exception:
+            logger.debug('Could not get pipeline status: %s', exception)
+
+    try:
+        wait_for(in_retry, timeout_sec=RETRY_TIMEOUT_SEC, description='pipeline to go into retry mode')
+    except WaitTimeoutError:
+        logger.info('Pipeline not seen in retry mode after %s seconds', RETRY_TIMEOUT_SEC)
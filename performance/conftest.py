@@ -0,0 +1,47 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+
+from performance.utils.benchmark import PipelineBenchmark
+from stage.utils.data_seeding import SeededTableCache
+
+# JSON-lines file benchmark results are appended to; set the variable to an empty string to disable it.
+BENCHMARK_RESULTS_FILE = os.environ.get('BENCHMARK_RESULTS_FILE', 'benchmark_results.jsonl')
+# Identifier of the test session's results in that file; generated unless given, e.g. by CI.
+BENCHMARK_RUN_ID = os.environ.get('BENCHMARK_RUN_ID')
+
+
+@pytest.fixture(scope='session')
+def benchmark_run_id():
+    return BENCHMARK_RUN_ID or f'{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+
+
+@pytest.fixture(scope='session')
+def seeded_tables():
+    """Session-wide :py:class:`stage.utils.data_seeding.SeededTableCache`; all cached tables are dropped at the end."""
+    cache = SeededTableCache()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def pipeline_benchmark(sdc_executor, benchmark, benchmark_run_id, request):
+    """:py:class:`performance.utils.benchmark.PipelineBenchmark` bound to the current test."""
+    return PipelineBenchmark(sdc_executor, benchmark, request.node.nodeid, results_file=BENCHMARK_RESULTS_FILE or None,
+                             run_id=benchmark_run_id)
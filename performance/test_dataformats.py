@@ -0,0 +1,110 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module measure parse throughput of the Data Parser processor for each data format, using generated
+input lines fed by a Dev Raw Data Source (see stage.utils.payloads). Throughput is reported in records/sec and in
+MB/sec of parsed input.
+"""
+
+import base64
+import logging
+
+import pytest
+from streamsets.sdk.utils import Version
+from streamsets.testframework.markers import sdc_min_version
+
+from stage.test_dataformats import create_text_pipeline
+from stage.utils.payloads import PayloadGenerator, XML_LIST_ITEM_ELEMENT
+
+logger = logging.getLogger(__name__)
+
+# Number of input lines in the Dev Raw Data Source; they're repeated for every batch.
+NUMBER_OF_LINES = 1_000
+NUMBER_OF_FIELDS = 10
+LIST_LENGTH = 3
+STRING_LENGTH = 10
+MULTI_CHARACTER_DELIMITER = '||'
+# Every Avro input line is a base64-encoded container file with this many records.
+AVRO_RECORDS_PER_CONTAINER = 100
+
+
+@pytest.fixture(scope='module')
+def payload_generator():
+    return PayloadGenerator(seed=0, number_of_fields=NUMBER_OF_FIELDS, list_length=LIST_LENGTH,
+                            string_length=STRING_LENGTH)
+
+
+@sdc_min_version('3.0.0.0')
+@pytest.mark.parametrize('data_format, parser_configs, records_per_line', [
+    pytest.param('JSON', {}, 1, id='json'),
+    pytest.param('DELIMITED', dict(csv_record_type='LIST', header_line='NO_HEADER'), 1, id='delimited-list'),
+    pytest.param('DELIMITED', dict(csv_record_type='LIST_MAP', header_line='NO_HEADER'), 1, id='delimited-list_map'),
+    pytest.param('DELIMITED', dict(delimiter_format_type='MULTI_CHARACTER',
+                                   multi_character_field_delimiter=MULTI_CHARACTER_DELIMITER,
+                                   header_line='NO_HEADER'), 1, id='delimited-multi_character'),
+    pytest.param('LOG', {}, 1, id='log'),
+    pytest.param('SYSLOG', {}, 1, id='syslog'),
+    pytest.param('XML', {}, 1, id='xml'),
+    # Data Parser only keeps the first of multiple parsed values unless told otherwise.
+    pytest.param('XML', dict(delimiter_element=XML_LIST_ITEM_ELEMENT,
+                             multiple_values_behavior='SPLIT_INTO_MULTIPLE_RECORDS'),
+                 LIST_LENGTH, id='xml-delimiter_element')
+])
+def test_data_parser(sdc_builder, pipeline_benchmark, payload_generator, data_format, parser_configs,
+                     records_per_line):
+    """Benchmark the Data Parser processor on generated lines of a data format. The pipeline looks like:
+
+        dev_raw_data_source >> data_parser >> trash
+    """
+    if ('multi_character_field_delimiter' in parser_configs
+            and Version(sdc_builder.version) < Version('3.8.0')):
+        pytest.skip('Multi-character delimiters were added in SDC 3.8.0')
+
+    delimiter = parser_configs.get('multi_character_field_delimiter', ',')
+    raw_data = '\n'.join(payload_generator.lines(data_format, NUMBER_OF_LINES, delimiter=delimiter))
+    pipeline = create_text_pipeline(sdc_builder, data_format, raw_data, **parser_configs)
+
+    pipeline_benchmark.run_steady_state(pipeline,
+                                        bytes_per_record=len(raw_data.encode()) / (NUMBER_OF_LINES * records_per_line))
+
+
+@sdc_min_version('3.0.0.0')
+def test_data_parser_avro(sdc_builder, pipeline_benchmark, payload_generator):
+    """Benchmark the Data Parser processor on Avro container files with embedded schema. As Dev Raw Data Source
+    can't produce binary data, containers are base64-encoded and decoded first. The pipeline looks like:
+
+        dev_raw_data_source >> base64_field_decoder >> data_parser >> trash
+    """
+    container = payload_generator.to_bytes('AVRO', AVRO_RECORDS_PER_CONTAINER)
+    line = base64.b64encode(container).decode()
+    raw_data = '\n'.join([line] * (NUMBER_OF_LINES // AVRO_RECORDS_PER_CONTAINER or 1))
+
+    builder = sdc_builder.get_pipeline_builder()
+
+    origin = builder.add_stage('Dev Raw Data Source')
+    origin.set_attributes(data_format='TEXT', raw_data=raw_data, max_line_length=len(line))
+
+    base64_field_decoder = builder.add_stage('Base64 Field Decoder', type='processor')
+    base64_field_decoder.set_attributes(field_to_decode='/text', target_field='/avro')
+
+    parser = builder.add_stage('Data Parser')
+    parser.set_attributes(field_to_parse='/avro', target_field='/', data_format='AVRO', avro_schema_location='SOURCE')
+
+    trash = builder.add_stage('Trash')
+
+    origin >> base64_field_decoder >> parser >> trash
+    pipeline = builder.build('Parse AVRO')
+
+    pipeline_benchmark.run_steady_state(pipeline, bytes_per_record=len(container) / AVRO_RECORDS_PER_CONTAINER)
@@ -0,0 +1,200 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module measure Directory origin throughput on thousands of small files and on a few multi-GB
+files. Input files are written on the SDC host by a single Jython pipeline looping over all of them, rather than by
+a pipeline per file, and results report files/sec alongside records/sec.
+"""
+
+import logging
+import os
+import textwrap
+import time
+
+import pytest
+from streamsets.testframework.utils import get_random_string
+
+from stage.utils.payloads import PayloadGenerator
+
+logger = logging.getLogger(__name__)
+
+FILES_PARENT_DIRECTORY = '/tmp'
+FILE_NAME_PATTERN = 'sdc-*.csv'
+# Records in the block that's repeated to fill every file.
+RECORDS_PER_BLOCK = 1_000
+MANY_FILES = 5_000
+MANY_FILES_RECORDS_PER_FILE = 100
+LARGE_FILES = 4
+# ~114 bytes per record, i.e. ~2.9 GB per file.
+LARGE_FILES_RECORDS_PER_FILE = 25_000_000
+NUMBER_OF_SUBDIRECTORIES = 10
+FILES_WRITER_TIMEOUT_SEC = 3600
+
+FILES_WRITER_SCRIPT = """
+    import os
+    import shutil
+
+    block = '''{block}'''
+    for record in records:
+        if os.path.isdir('{directory}'):
+            shutil.rmtree('{directory}')
+        for i in range({number_of_files}):
+            directory = '{directory}'
+            if {number_of_subdirectories}:
+                directory = os.path.join(directory, 'dir-%04d' % (i % {number_of_subdirectories}))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            path = os.path.join(directory, 'sdc-%08d.csv' % i)
+            with open(path, 'w') as f:
+                f.write(block[:{partial_block_length}])
+                for _ in range({blocks_per_file}):
+                    f.write(block)
+            # Distinct, increasing modification times make TIMESTAMP and LEXICOGRAPHICAL read orders comparable.
+            os.utime(path, ({mtime} + i, {mtime} + i))
+"""
+
+DIRECTORIES_REMOVER_SCRIPT = """
+    import shutil
+
+    for record in records:
+        for directory in {directories}:
+            shutil.rmtree(directory, True)
+"""
+
+READ_ORDERS = [pytest.param('LEXICOGRAPHICAL', False, id='lexicographical'),
+               pytest.param('TIMESTAMP', False, id='timestamp'),
+               # Subdirectories can only be processed when reading files in timestamp order.
+               pytest.param('TIMESTAMP', True, id='timestamp-subdirectories')]
+
+
+@pytest.fixture(scope='module')
+def sdc_common_hook():
+    def hook(data_collector):
+        data_collector.add_stage_lib('streamsets-datacollector-jython_2_7-lib')
+    return hook
+
+
+@pytest.fixture(scope='module')
+def block():
+    lines = PayloadGenerator(seed=0).lines('DELIMITED', RECORDS_PER_BLOCK)
+    return ''.join(line + '\n' for line in lines)
+
+
+@pytest.mark.parametrize('file_post_processing', ['NONE', 'DELETE', 'ARCHIVE'])
+@pytest.mark.parametrize('number_of_threads', [1, 2, 4, 8, 16])
+@pytest.mark.parametrize('read_order, process_subdirectories', READ_ORDERS)
+def test_directory_origin_many_files(sdc_builder, sdc_executor, pipeline_benchmark, block, read_order,
+                                     process_subdirectories, number_of_threads, file_post_processing):
+    """Benchmark the Directory origin on thousands of small files. The pipeline looks like:
+
+        directory >> trash
+    """
+    _benchmark_directory_origin(sdc_builder, sdc_executor, pipeline_benchmark, block,
+                                MANY_FILES, MANY_FILES_RECORDS_PER_FILE,
+                                read_order=read_order,
+                                process_subdirectories=process_subdirectories,
+                                number_of_threads=number_of_threads,
+                                file_post_processing=file_post_processing)
+
+
+@pytest.mark.parametrize('file_post_processing', ['NONE', 'DELETE'])
+@pytest.mark.parametrize('number_of_threads', [1, 4])
+@pytest.mark.parametrize('read_order, process_subdirectories', READ_ORDERS[:2])
+def test_directory_origin_large_files(sdc_builder, sdc_executor, pipeline_benchmark, block, read_order,
+                                      process_subdirectories, number_of_threads, file_post_processing):
+    """Benchmark the Directory origin on a few multi-GB files. The pipeline looks like:
+
+        directory >> trash
+    """
+    _benchmark_directory_origin(sdc_builder, sdc_executor, pipeline_benchmark, block,
+                                LARGE_FILES, LARGE_FILES_RECORDS_PER_FILE,
+                                read_order=read_order,
+                                process_subdirectories=process_subdirectories,
+                                number_of_threads=number_of_threads,
+                                file_post_processing=file_post_processing)
+
+
+def _benchmark_directory_origin(sdc_builder, sdc_executor, pipeline_benchmark, block, number_of_files,
+                                records_per_file, **directory_configs):
+    files_directory = os.path.join(FILES_PARENT_DIRECTORY, get_random_string())
+    archive_directory = f'{files_directory}-archive'
+    number_of_subdirectories = NUMBER_OF_SUBDIRECTORIES if directory_configs['process_subdirectories'] else 0
+    # Files processed with NONE post processing are left in place, so only the first round needs them written.
+    staged = []
+
+    def write_files():
+        if staged and directory_configs['file_post_processing'] == 'NONE':
+            return
+        _write_files(sdc_executor, files_directory, block, number_of_files, records_per_file,
+                     number_of_subdirectories)
+        staged.append(True)
+
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    directory = pipeline_builder.add_stage('Directory')
+    directory.set_attributes(data_format='DELIMITED',
+                             header_line='NO_HEADER',
+                             files_directory=files_directory,
+                             file_name_pattern=FILE_NAME_PATTERN,
+                             file_name_pattern_mode='GLOB',
+                             archive_directory=archive_directory,
+                             **directory_configs)
+    trash = pipeline_builder.add_stage('Trash')
+    directory >> trash
+    pipeline = pipeline_builder.build()
+
+    try:
+        pipeline_benchmark.run(pipeline, number_of_files * records_per_file, before_round=write_files,
+                               bytes_per_record=len(block) / RECORDS_PER_BLOCK)
+        extra_info = pipeline_benchmark.benchmark.extra_info
+        extra_info['files_per_second'] = extra_info['records_per_second'] / records_per_file
+        logger.info('Directory origin read %.1f files/sec (%.0f records/sec)',
+                    extra_info['files_per_second'], extra_info['records_per_second'])
+    finally:
+        script = textwrap.dedent(DIRECTORIES_REMOVER_SCRIPT).format(directories=[files_directory, archive_directory])
+        _run_script(sdc_executor, script, 'Directories remover pipeline')
+
+
+def _write_files(sdc_executor, files_directory, block, number_of_files, records_per_file, number_of_subdirectories):
+    """Write ``number_of_files`` files of ``records_per_file`` records each under ``files_directory`` on the SDC
+    host, spreading them over ``number_of_subdirectories`` subdirectories if it isn't ``0``.
+    """
+    blocks_per_file, partial_records = divmod(records_per_file, RECORDS_PER_BLOCK)
+    partial_block_length = sum(len(line) + 1 for line in block.splitlines()[:partial_records])
+    start = time.perf_counter()
+    script = textwrap.dedent(FILES_WRITER_SCRIPT).format(block=block,
+                                                         directory=files_directory,
+                                                         number_of_files=number_of_files,
+                                                         number_of_subdirectories=number_of_subdirectories,
+                                                         blocks_per_file=blocks_per_file,
+                                                         partial_block_length=partial_block_length,
+                                                         mtime=int(time.time()) - number_of_files)
+    _run_script(sdc_executor, script, 'Files writer pipeline')
+    logger.info('Wrote %s files of %s records to %s in %.2f s',
+                number_of_files, records_per_file, files_directory, time.perf_counter() - start)
+
+
+def _run_script(sdc_executor, script, title):
+    builder = sdc_executor.get_pipeline_builder()
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='noop', stop_after_first_batch=True)
+    jython_evaluator = builder.add_stage('Jython Evaluator')
+    jython_evaluator.script = script
+    trash = builder.add_stage('Trash')
+    dev_raw_data_source >> jython_evaluator >> trash
+    pipeline = builder.build(title)
+
+    sdc_executor.add_pipeline(pipeline)
+    sdc_executor.start_pipeline(pipeline).wait_for_finished(timeout_sec=FILES_WRITER_TIMEOUT_SEC)
+    sdc_executor.remove_pipeline(pipeline)
@@ -16,23 +16,60 @@
 The tests in this module are for running high-volume pipelines, for the purpose of performance testing.
 They will generate records from a raw source, run them through one or more processors, with a trash destination.
 Output values will not be validated since the purpose of this test is to test performance and not correctness.
+The stress pipelines are benchmarked both over rounds of a number of records and on a single, warmed-up pipeline run
+(see PipelineBenchmark.run_steady_state); the field processor matrix only on the latter.
 """
 
 import json
 import logging
-import uuid
 
 import pytest
+from streamsets.sdk.utils import Version
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Upper bound of the Dev Raw Data Source payload; it's repeated for every batch.
+MAX_RAW_DATA_SIZE = 1_000_000
+DEEP_NESTING_DEPTH = 50
+LONG_LIST_LENGTH = 1_000
+# The processor matrix is large, so it uses shorter warm-up and measurement windows.
+MATRIX_WARMUP_SEC = 30
+MATRIX_WINDOW_SEC = 10
+
 
 @pytest.mark.parametrize('number_of_records', (50_000, 100_000))
-def test_field_path_stress_pipeline(sdc_builder, sdc_executor, benchmark, number_of_records):
+def test_field_path_stress_pipeline(sdc_builder, sdc_executor, pipeline_benchmark, number_of_records):
     """
     Runs a pipeline with many field processor stages, which runs for a large number of records.
     """
+    pipeline_benchmark.run(_get_field_path_stress_pipeline(sdc_builder), number_of_records)
+
+
+def test_field_path_stress_pipeline_steady_state(sdc_builder, sdc_executor, pipeline_benchmark):
+    """
+    Runs the pipeline of :py:func:`test_field_path_stress_pipeline` once, measuring its warmed-up throughput.
+    """
+    pipeline_benchmark.run_steady_state(_get_field_path_stress_pipeline(sdc_builder))
+
+
+@pytest.mark.parametrize('number_of_records', (50_000, 100_000))
+def test_large_number_of_fields_stress_pipeline(sdc_builder, sdc_executor, pipeline_benchmark, number_of_records):
+    """
+    Runs a pipeline with one processor that removes many fields from records that have a large number of fields.
+    """
+    pipeline_benchmark.run(_get_large_number_of_fields_pipeline(sdc_builder), number_of_records)
+
+
+def test_large_number_of_fields_stress_pipeline_steady_state(sdc_builder, sdc_executor, pipeline_benchmark):
+    """
+    Runs the pipeline of :py:func:`test_large_number_of_fields_stress_pipeline` once, measuring its warmed-up
+    throughput.
+    """
+    pipeline_benchmark.run_steady_state(_get_large_number_of_fields_pipeline(sdc_builder))
+
+
+def _get_field_path_stress_pipeline(sdc_builder):
     raw_data = """
     {
       "first": {
@@ -110,23 +147,10 @@ def test_field_path_stress_pipeline(sdc_builder, sdc_executor, benchmark, number
     trash = pipeline_builder.add_stage('Trash')
 
     source >> remover >> value_replacer >> type_converter >> hasher >> masker >> trash
-    pipeline = pipeline_builder.build('Field Path Stress Test Pipeline - Many Stages')
+    return pipeline_builder.build('Field Path Stress Test Pipeline - Many Stages')
 
-    def benchmark_pipeline(executor, pipeline):
-        pipeline.id = str(uuid.uuid4())
-        executor.add_pipeline(pipeline)
-        executor.start_pipeline(pipeline).wait_for_pipeline_output_records_count(number_of_records)
-        executor.stop_pipeline(pipeline)
-        executor.remove_pipeline(pipeline)
 
-    benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
-
-
-@pytest.mark.parametrize('number_of_records', (50_000, 100_000))
-def test_large_number_of_fields_stress_pipeline(sdc_builder, sdc_executor, benchmark, number_of_records):
-    """
-    Runs a pipeline with one processor that removes many fields from records that have a large number of fields.
-    """
+def _get_large_number_of_fields_pipeline(sdc_builder):
     raw_data_obj = {f'field{i}': i for i in range(1, 250)}
     raw_data = json.dumps(raw_data_obj)
 
@@ -141,13 +165,174 @@ def test_large_number_of_fields_stress_pipeline(sdc_builder, sdc_executor, bench
     trash = pipeline_builder.add_stage('Trash')
 
     source >> remover >> trash
-    pipeline = pipeline_builder.build('Field Path Stress Test Pipeline - Many Fields')
+    return pipeline_builder.build('Field Path Stress Test Pipeline - Many Fields')
+
+
+def _get_payload(record_shape):
+    """The part of a generated record that changes with its shape."""
+    if record_shape.startswith('fields_'):
+        number_of_fields = int(record_shape[len('fields_'):])
+        # Alternate types so that type-dependent processors have something to do.
+        return {f'field{i}': i if i % 2 else f'value{i}' for i in range(number_of_fields)}
+    if record_shape == 'deep_nesting':
+        payload = {'leaf': 'value'}
+        for level in reversed(range(DEEP_NESTING_DEPTH)):
+            payload = {'level': level, 'name': f'level{level}', 'next': payload}
+        return payload
+    if record_shape == 'long_list':
+        return {'items': list(range(LONG_LIST_LENGTH))}
+    raise ValueError(f'Unknown record shape {record_shape}.')
+
+
+def _get_record(record_shape):
+    list_length = LONG_LIST_LENGTH if record_shape == 'long_list' else 3
+    return {'id': 1,
+            'text': ','.join(f'part{i}' for i in range(list_length)),
+            'values': list(range(list_length)),
+            'other': [f'other{i}' for i in range(list_length)],
+            'payload': _get_payload(record_shape)}
+
+
+def _get_leaf_paths(value, path=''):
+    if isinstance(value, dict):
+        return [leaf_path for key, child in value.items() for leaf_path in _get_leaf_paths(child, f'{path}/{key}')]
+    return [path]
+
+
+def _get_scalar_paths(value, path=''):
+    """Paths of the scalar fields under a field, with a wildcard for the items of (scalar) lists."""
+    if isinstance(value, dict):
+        return [scalar_path
+                for key, child in value.items() for scalar_path in _get_scalar_paths(child, f'{path}/{key}')]
+    if isinstance(value, list):
+        return [f'{path}[*]']
+    return [path]
+
+
+def _add_field_flattener(pipeline_builder, record):
+    field_flattener = pipeline_builder.add_stage('Field Flattener')
+    field_flattener.set_attributes(flatten='ENTIRE_RECORD', name_separator='.')
+    return field_flattener
+
+
+def _add_field_merger(pipeline_builder, record):
+    field_merger = pipeline_builder.add_stage('Field Merger')
+    field_merger.set_attributes(fields_to_merge=[{'fromField': '/payload', 'toField': '/merged'}],
+                                overwrite_fields=True)
+    return field_merger
+
+
+def _add_field_order(pipeline_builder, record):
+    field_order = pipeline_builder.add_stage('Field Order')
+    field_order.set_attributes(extra_fields='DISCARD', fields_to_order=list(reversed(_get_leaf_paths(record))),
+                               missing_fields='USE_DEFAULT', default_type='STRING',
+                               default_value='default', output_type='LIST_MAP')
+    return field_order
+
+
+def _add_field_pivoter(pipeline_builder, record):
+    field_pivoter = pipeline_builder.add_stage('Field Pivoter')
+    field_pivoter.set_attributes(copy_all_fields=True, field_to_pivot='/values',
+                                 original_field_name_path='/values_path', pivoted_items_path='/value',
+                                 save_original_field_name=True)
+    return field_pivoter
+
+
+def _add_field_renamer(pipeline_builder, record):
+    field_renamer = pipeline_builder.add_stage('Field Renamer')
+    field_renamer.fields_to_rename = [{'fromFieldExpression': '/payload/(.*)',
+                                       'toFieldExpression': '/payload/renamed_$1'}]
+    return field_renamer
+
+
+def _add_field_replacer(pipeline_builder, record):
+    field_replacer = pipeline_builder.add_stage('Field Replacer')
+    field_replacer.replacement_rules = [{'setToNull': False, 'fields': '/payload/*', 'replacement': 'replaced'},
+                                        {'setToNull': True, 'fields': '/other[*][${f:value() == "other1"}]'}]
+    return field_replacer
+
+
+def _add_field_splitter(pipeline_builder, record):
+    field_splitter = pipeline_builder.add_stage('Field Splitter')
+    field_splitter.set_attributes(field_for_remaining_splits='/split/remaining',
+                                  field_to_split='/text', new_split_fields=['/split/first', '/split/second'],
+                                  not_enough_splits='CONTINUE', original_field='REMOVE',
+                                  separator=',', too_many_splits='TO_LIST')
+    return field_splitter
+
+
+def _add_field_zip(pipeline_builder, record):
+    field_zip = pipeline_builder.add_stage('Field Zip')
+    field_zip.set_attributes(field_does_not_exist='CONTINUE',
+                             fields_to_zip=[{'zippedFieldPath': '/zipped',
+                                             'firstField': '/values',
+                                             'secondField': '/other'}],
+                             zip_values_only=False)
+    return field_zip
+
+
+def _add_field_mapper(pipeline_builder, record):
+    field_mapper = pipeline_builder.add_stage('Field Mapper', type='processor')
+    field_mapper.set_attributes(operate_on='FIELD_VALUES',
+                                conditional_expression="${f:type() == 'INTEGER'}",
+                                mapping_expression='${f:value() + 1}',
+                                maintain_original_paths=False)
+    return field_mapper
+
+
+def _add_field_type_converter(pipeline_builder, record):
+    # Maps and lists can't be converted to strings, so nested payloads are converted leaf by leaf.
+    flat = not any(isinstance(value, (dict, list)) for value in record['payload'].values())
+    payload_paths = ['/payload/*'] if flat else _get_scalar_paths(record['payload'], '/payload')
+    field_type_converter = pipeline_builder.add_stage('Field Type Converter')
+    field_type_converter.set_attributes(conversion_method='BY_FIELD',
+                                        field_type_converter_configs=[{'fields': payload_paths + ['/values[*]'],
+                                                                       'targetType': 'STRING',
+                                                                       'dataLocale': 'en,US'}])
+    return field_type_converter
+
+
+FIELD_PROCESSORS = {'field_flattener': _add_field_flattener,
+                    'field_merger': _add_field_merger,
+                    'field_order': _add_field_order,
+                    'field_pivoter': _add_field_pivoter,
+                    'field_renamer': _add_field_renamer,
+                    'field_replacer': _add_field_replacer,
+                    'field_splitter': _add_field_splitter,
+                    'field_zip': _add_field_zip,
+                    'field_mapper': _add_field_mapper,
+                    'field_type_converter': _add_field_type_converter}
+
+
+@pytest.mark.parametrize('record_shape', ('fields_10', 'fields_250', 'fields_2000', 'deep_nesting', 'long_list'))
+@pytest.mark.parametrize('processor', sorted(FIELD_PROCESSORS))
+def test_field_processor(sdc_builder, sdc_executor, pipeline_benchmark, processor, record_shape):
+    """
+    Runs a pipeline with a single field processor on generated records of a given shape, to see how each processor
+    scales with the number of fields, nesting depth and list length. The pipeline looks like:
+
+        dev_raw_data_source >> <processor> >> trash
+
+    Note that throughput is measured in output records, so the Field Pivoter numbers include the pivoted records.
+    """
+    if processor == 'field_mapper' and Version(sdc_builder.version) < Version('3.8.0'):
+        pytest.skip('Field Mapper was added in SDC 3.8.0')
+
+    record = _get_record(record_shape)
+    record_json = json.dumps(record)
+    raw_data = '\n'.join([record_json] * max(1, MAX_RAW_DATA_SIZE // len(record_json)))
+
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+
+    source = pipeline_builder.add_stage('Dev Raw Data Source')
+    # The default maximum object length (4096 chars) is below the size of the larger records.
+    source.set_attributes(data_format='JSON', raw_data=raw_data, max_object_length_in_chars=len(record_json))
+
+    field_processor = FIELD_PROCESSORS[processor](pipeline_builder, record)
+
+    trash = pipeline_builder.add_stage('Trash')
 
-    def benchmark_pipeline(executor, pipeline):
-        pipeline.id = str(uuid.uuid4())
-        executor.add_pipeline(pipeline)
-        executor.start_pipeline(pipeline).wait_for_pipeline_output_records_count(number_of_records)
-        executor.stop_pipeline(pipeline)
-        executor.remove_pipeline(pipeline)
+    source >> field_processor >> trash
+    pipeline = pipeline_builder.build(f'Field Processor Benchmark - {processor}, {record_shape}')
 
-    benchmark.pedantic(benchmark_pipeline, args=(sdc_executor, pipeline), rounds=2)
+    pipeline_benchmark.run_steady_state(pipeline, warmup_sec=MATRIX_WARMUP_SEC, window_sec=MATRIX_WINDOW_SEC)
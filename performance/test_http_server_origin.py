@@ -0,0 +1,127 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module drive the HTTP Server origin with
+:py:class:`performance.utils.http_load.HttpLoadGenerator` and measure accepted requests/sec, request latency, error
+rates under overload and end-to-end record latency. Record latency is computed by a JavaScript Evaluator from the
+time the client sent the record and sampled from a snapshot of the first batches, so it assumes the test and SDC
+hosts share a clock (as they do with a local SDC container).
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from performance.utils.http_load import HttpLoadGenerator
+from performance.utils.latency import LatencySamples, get_record_latency
+from stage.utils.latency_probe import RECORD_LATENCY_SCRIPT
+from stage.utils.sharding import shard_port
+from stage.utils.snapshots import SnapshotReader
+
+logger = logging.getLogger(__name__)
+
+HTTP_PORT = shard_port(8001)
+APPLICATION_ID = 'benchmark'
+REQUESTS = 100_000
+RECORD_SIZES = [100, 10_000]
+# Besides their payload, records have a sequence number and a timestamp. The default limit is 4096 chars.
+MAX_OBJECT_LENGTH = max(RECORD_SIZES) + 1024
+# Batches captured to sample end-to-end record latency from.
+LATENCY_SAMPLED_BATCHES = 10
+
+
+@pytest.mark.parametrize('record_size', RECORD_SIZES)
+@pytest.mark.parametrize('records_per_request', [1, 100])
+@pytest.mark.parametrize('concurrency', [1, 16, 128])
+def test_http_server_origin(sdc_builder, sdc_executor, pipeline_benchmark, concurrency, records_per_request,
+                            record_size):
+    """Benchmark the HTTP Server origin with a pool of keep-alive connections. The pipeline looks like:
+
+        http_server >> javascript_evaluator >> trash
+    """
+    pipeline, javascript_evaluator = _get_pipeline(sdc_builder)
+    generator = HttpLoadGenerator(_get_url(sdc_executor), APPLICATION_ID,
+                                  requests=REQUESTS // records_per_request,
+                                  concurrency=concurrency,
+                                  records_per_request=records_per_request,
+                                  record_size=record_size)
+
+    load_futures, latency_futures = [], []
+
+    def after_start(pipeline):
+        # Start capturing before sending, so that the snapshot has the first batches of the run.
+        snapshot_reader = SnapshotReader.capture(sdc_executor, pipeline, batches=LATENCY_SAMPLED_BATCHES)
+        load_futures.append(executor.submit(generator.run))
+        latency_futures.append(executor.submit(get_record_latency, snapshot_reader,
+                                               javascript_evaluator.instance_name))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pipeline_benchmark.run(pipeline, generator.number_of_records, after_start=after_start)
+    load_results = [future.result()._asdict() for future in load_futures]
+    record_latency = LatencySamples()
+    for future in latency_futures:
+        record_latency.extend(future.result())
+
+    extra_info = pipeline_benchmark.benchmark.extra_info
+    extra_info['load'] = load_results
+    extra_info['record_latency'] = record_latency.summary()
+    logger.info('Record latency %s', extra_info['record_latency'])
+    for result in load_results:
+        assert result['error_rate'] == 0, f'Requests failed: {result["statuses"]} {result["errors"]}'
+
+
+@pytest.mark.parametrize('max_concurrent_requests', [10, 100])
+@pytest.mark.parametrize('concurrency', [500, 2_000])
+def test_http_server_origin_overload(sdc_builder, sdc_executor, benchmark, concurrency, max_concurrent_requests):
+    """Measure accepted requests/sec and error rates of the HTTP Server origin with more concurrent clients than it
+    accepts concurrent requests. Requests that aren't accepted aren't retried. The pipeline looks like:
+
+        http_server >> javascript_evaluator >> trash
+    """
+    pipeline, _ = _get_pipeline(sdc_builder, max_concurrent_requests=max_concurrent_requests)
+    generator = HttpLoadGenerator(_get_url(sdc_executor), APPLICATION_ID,
+                                  requests=REQUESTS,
+                                  concurrency=concurrency)
+    sdc_executor.add_pipeline(pipeline)
+    try:
+        sdc_executor.start_pipeline(pipeline)
+        result = benchmark.pedantic(generator.run, rounds=1)
+    finally:
+        sdc_executor.stop_pipeline(pipeline)
+        sdc_executor.remove_pipeline(pipeline)
+
+    benchmark.extra_info.update(result._asdict())
+    assert result.accepted_requests > 0
+
+
+def _get_pipeline(sdc_builder, max_concurrent_requests=None):
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    http_server = pipeline_builder.add_stage('HTTP Server')
+    http_server.set_attributes(application_id=APPLICATION_ID,
+                               data_format='JSON',
+                               max_object_length_in_chars=MAX_OBJECT_LENGTH,
+                               http_listening_port=HTTP_PORT)
+    if max_concurrent_requests:
+        http_server.set_attributes(max_concurrent_requests=max_concurrent_requests)
+    javascript_evaluator = pipeline_builder.add_stage('JavaScript Evaluator')
+    javascript_evaluator.script = RECORD_LATENCY_SCRIPT
+    trash = pipeline_builder.add_stage('Trash')
+    http_server >> javascript_evaluator >> trash
+    return pipeline_builder.build(), javascript_evaluator
+
+
+def _get_url(sdc_executor):
+    return f'http://{sdc_executor.server_host}:{HTTP_PORT}'
@@ -0,0 +1,120 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module measure Kafka Producer destination throughput across partition strategies, data formats
+and ``one_message_per_batch``. Records come from a Dev Data Generator producing as fast as it can; what lands in
+the topic is counted by a :py:class:`performance.utils.kafka_counting.KafkaCountingConsumer`, which reports produced
+messages/sec, bytes/sec and how evenly messages were spread over the partitions.
+"""
+
+import json
+import logging
+import string
+
+import pytest
+from streamsets.testframework.environments.cloudera import ClouderaManagerCluster
+from streamsets.testframework.markers import cluster, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils.kafka_counting import KafkaCountingConsumer
+from performance.utils.kafka_seeding import DATA_FORMATS, create_topic, delete_topics
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = 2_000_000
+PARTITIONS = 8
+BATCH_SIZE = 1000
+FIELDS_TO_GENERATE = [{'field': 'key', 'type': 'INTEGER'},
+                      {'field': 'text', 'type': 'STRING'}]
+AVRO_SCHEMA = {'type': 'record',
+               'name': 'Record',
+               'fields': [{'name': 'key', 'type': 'int'},
+                          {'name': 'text', 'type': 'string'}]}
+# Spreads records over all partitions by their random key.
+PARTITION_EXPRESSION = f"${{math:abs(record:value('/key') % {PARTITIONS})}}"
+
+
+@pytest.fixture(autouse=True)
+def kafka_check(cluster):
+    if isinstance(cluster, ClouderaManagerCluster) and not hasattr(cluster, 'kafka'):
+        pytest.skip('Kafka tests require Kafka to be installed on the cluster')
+
+
+@pytest.fixture
+def topic(cluster):
+    topic = f'benchmark_{get_random_string(string.ascii_letters, 10)}'
+    create_topic(cluster, topic, PARTITIONS)
+    yield topic
+    delete_topics(cluster, [topic])
+
+
+@cluster('cdh', 'kafka')
+@sdc_min_version('3.0.0.0')
+@pytest.mark.parametrize('one_message_per_batch', [False, True])
+@pytest.mark.parametrize('data_format', DATA_FORMATS)
+@pytest.mark.parametrize('partition_strategy', ['ROUND_ROBIN', 'EXPRESSION', 'DEFAULT'])
+def test_kafka_destination(sdc_builder, sdc_executor, cluster, pipeline_benchmark, topic, partition_strategy,
+                           data_format, one_message_per_batch):
+    """Benchmark the Kafka Producer destination. The pipeline looks like:
+
+        dev_data_generator >> kafka_destination
+    """
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    dev_data_generator = pipeline_builder.add_stage('Dev Data Generator')
+    dev_data_generator.set_attributes(batch_size=BATCH_SIZE,
+                                      delay_between_batches=0,
+                                      fields_to_generate=FIELDS_TO_GENERATE)
+    kafka_destination = pipeline_builder.add_stage(name='com_streamsets_pipeline_stage_destination_kafka_KafkaDTarget',
+                                                   library=cluster.kafka.standalone_stage_lib)
+    kafka_destination.set_attributes(topic=topic,
+                                     partition_strategy=partition_strategy,
+                                     one_message_per_batch=one_message_per_batch,
+                                     **_get_data_format_configs(data_format))
+    if partition_strategy == 'EXPRESSION':
+        kafka_destination.set_attributes(partition_expression=PARTITION_EXPRESSION)
+    dev_data_generator >> kafka_destination
+    pipeline = pipeline_builder.build().configure_for_environment(cluster)
+
+    counts = []
+    with KafkaCountingConsumer(cluster, topic, PARTITIONS) as counting_consumer:
+        # Produce rates are measured from the steady state's start to its end.
+        pipeline_benchmark.run(pipeline, MESSAGES,
+                               before_round=lambda: counts.append(counting_consumer.reset()),
+                               after_start=lambda pipeline: counting_consumer.start_interval(),
+                               after_steady_state=lambda pipeline: counting_consumer.end_interval())
+        counts.append(counting_consumer.reset())
+    # The first reset only discards what was in the topic before the first round.
+    counts = [count._asdict() for count in counts[1:]]
+
+    extra_info = pipeline_benchmark.benchmark.extra_info
+    extra_info['produced'] = counts
+    for count in counts:
+        logger.info('Produced %s messages at %.0f messages/sec (%.2f MB/sec), partition skew %.2f: %s',
+                    count['messages'], count['messages_per_second'], count['bytes_per_second'] / 1024 ** 2,
+                    count['partition_skew'], count['partitions'])
+        if one_message_per_batch:
+            assert count['messages'] >= MESSAGES // BATCH_SIZE
+        else:
+            assert count['messages'] >= MESSAGES
+
+
+def _get_data_format_configs(data_format):
+    if data_format == 'AVRO':
+        return dict(data_format='AVRO', avro_schema_location='INLINE', avro_schema=json.dumps(AVRO_SCHEMA))
+    if data_format == 'DELIMITED':
+        return dict(data_format='DELIMITED', header_line='NO_HEADER')
+    if data_format == 'TEXT':
+        return dict(data_format='TEXT', text_field_path='/text')
+    return dict(data_format=data_format)
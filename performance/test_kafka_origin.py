@@ -0,0 +1,153 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module measure Kafka Consumer and Kafka Multitopic Consumer throughput on topics pre-seeded with
+millions of messages by :py:class:`performance.utils.kafka_seeding.KafkaSeeder`. A topic is seeded once per data
+format and partition count and shared by all tests of the module; every round reads it from the start with a
+fresh consumer group of its own, since the group's committed offsets would otherwise make later rounds read nothing.
+"""
+
+import json
+import logging
+import string
+
+import pytest
+from streamsets.testframework.environments.cloudera import ClouderaManagerCluster
+from streamsets.testframework.markers import cluster, sdc_min_version
+from streamsets.testframework.utils import get_random_string
+
+from performance.utils.kafka_seeding import (DATA_FORMATS, KafkaSeeder, create_topic, delete_topics,
+                                             encode_messages)
+from stage.utils.payloads import PayloadGenerator
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = 2_000_000
+MAX_BATCH_SIZES = [1000, 10000]
+BATCH_WAIT_TIME_MS = 1000
+
+
+@pytest.fixture(scope='module')
+def sdc_common_hook():
+    def hook(data_collector):
+        # Batch sizes are capped by production.maxBatchSize, 1000 by default.
+        data_collector.sdc_properties['production.maxBatchSize'] = str(max(MAX_BATCH_SIZES))
+    return hook
+
+
+@pytest.fixture(autouse=True)
+def kafka_check(cluster):
+    if isinstance(cluster, ClouderaManagerCluster) and not hasattr(cluster, 'kafka'):
+        pytest.skip('Kafka tests require Kafka to be installed on the cluster')
+
+
+@pytest.fixture(scope='module')
+def payload_generator():
+    return PayloadGenerator(seed=0, number_of_fields=10, list_length=0, depth=0)
+
+
+@pytest.fixture(scope='module')
+def seeded_topics(cluster, payload_generator):
+    """Get a topic seeded with :py:const:`MESSAGES` messages of a data format over a number of partitions, seeding
+    it on first use. All seeded topics are deleted at the end of the module.
+    """
+    topics = {}
+    seeder = KafkaSeeder(cluster)
+
+    def get_topic(data_format, partitions):
+        if (data_format, partitions) not in topics:
+            topic = f'benchmark_{data_format.lower()}_{partitions}_{get_random_string(string.ascii_letters, 10)}'
+            create_topic(cluster, topic, partitions)
+            seeder.seed(topic, encode_messages(payload_generator, data_format, MESSAGES))
+            topics[(data_format, partitions)] = topic
+        return topics[(data_format, partitions)]
+
+    yield get_topic
+    seeder.close()
+    if topics:
+        delete_topics(cluster, topics.values())
+
+
+@cluster('cdh', 'kafka')
+@pytest.mark.parametrize('partitions', [1, 8])
+@pytest.mark.parametrize('data_format', DATA_FORMATS)
+@pytest.mark.parametrize('max_batch_size_in_records', MAX_BATCH_SIZES)
+def test_kafka_consumer(sdc_builder, sdc_executor, cluster, pipeline_benchmark, seeded_topics, payload_generator,
+                        max_batch_size_in_records, data_format, partitions):
+    """Benchmark the Kafka Consumer origin. The pipeline looks like:
+
+        kafka_consumer >> trash
+    """
+    topic = seeded_topics(data_format, partitions)
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    kafka_consumer = pipeline_builder.add_stage('Kafka Consumer', library=cluster.kafka.standalone_stage_lib)
+    kafka_consumer.set_attributes(topic=topic,
+                                  max_batch_size_in_records=max_batch_size_in_records,
+                                  batch_wait_time_in_ms=BATCH_WAIT_TIME_MS,
+                                  kafka_configuration=[{'key': 'auto.offset.reset', 'value': 'earliest'}],
+                                  **_get_data_format_configs(data_format, payload_generator))
+    trash = pipeline_builder.add_stage('Trash')
+    kafka_consumer >> trash
+    pipeline = pipeline_builder.build().configure_for_environment(cluster)
+
+    pipeline_benchmark.run(pipeline, MESSAGES, before_round=lambda: _use_new_consumer_group(pipeline))
+
+
+@cluster('cdh', 'kafka')
+@sdc_min_version('3.0.0.0')
+@pytest.mark.parametrize('partitions', [1, 8])
+@pytest.mark.parametrize('data_format', DATA_FORMATS)
+@pytest.mark.parametrize('max_batch_size_in_records', MAX_BATCH_SIZES)
+@pytest.mark.parametrize('number_of_threads', [1, 4, 8])
+def test_kafka_multitopic_consumer(sdc_builder, sdc_executor, cluster, pipeline_benchmark, seeded_topics,
+                                   payload_generator, number_of_threads, max_batch_size_in_records, data_format,
+                                   partitions):
+    """Benchmark the Kafka Multitopic Consumer origin. Threads beyond the number of partitions stay idle. The
+    pipeline looks like:
+
+        kafka_multitopic_consumer >> trash
+    """
+    topic = seeded_topics(data_format, partitions)
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    kafka_multitopic_consumer = pipeline_builder.add_stage('Kafka Multitopic Consumer',
+                                                           library=cluster.kafka.standalone_stage_lib)
+    kafka_multitopic_consumer.set_attributes(topic_list=[topic],
+                                             number_of_threads=number_of_threads,
+                                             max_batch_size_in_records=max_batch_size_in_records,
+                                             batch_wait_time_in_ms=BATCH_WAIT_TIME_MS,
+                                             configuration_properties=[{'key': 'auto.offset.reset',
+                                                                        'value': 'earliest'}],
+                                             **_get_data_format_configs(data_format, payload_generator))
+    trash = pipeline_builder.add_stage('Trash')
+    kafka_multitopic_consumer >> trash
+    pipeline = pipeline_builder.build().configure_for_environment(cluster)
+
+    pipeline_benchmark.run(pipeline, MESSAGES, before_round=lambda: _use_new_consumer_group(pipeline))
+
+
+def _use_new_consumer_group(pipeline):
+    pipeline.origin_stage.set_attributes(consumer_group=f'benchmark_{get_random_string(string.ascii_letters, 10)}')
+
+
+def _get_data_format_configs(data_format, payload_generator):
+    if data_format == 'AVRO':
+        return dict(data_format='AVRO',
+                    avro_schema_location='INLINE',
+                    avro_schema=json.dumps(payload_generator.avro_schema()))
+    if data_format == 'DELIMITED':
+        return dict(data_format='DELIMITED', header_line='NO_HEADER')
+    if data_format == 'JSON':
+        return dict(data_format='JSON', json_content='MULTIPLE_OBJECTS')
+    return dict(data_format=data_format)
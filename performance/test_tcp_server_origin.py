@@ -0,0 +1,122 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module measure TCP Server origin throughput under thousands of concurrent client connections,
+driven by :py:class:`performance.utils.tcp_load.TcpLoadGenerator`, along with the send and ack latencies seen by
+the clients.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from performance.utils.tcp_load import (BATCH_ACK_MESSAGE, RECORD_ACK_MESSAGE, TcpLoadGenerator,
+                                        get_client_ssl_context)
+from stage.utils.sharding import shard_port
+
+logger = logging.getLogger(__name__)
+
+TCP_PORT = shard_port(17893)
+# TCP keystore file path relative to $SDC_RESOURCES.
+TCP_KEYSTORE_FILE_PATH = 'resources/tcp_server/keystore.jks'
+MESSAGE_SIZE = 100
+MESSAGES = 1_000_000
+NUMBER_OF_RECEIVER_THREADS = 8
+
+ACKS = [pytest.param(False, False, id='no_acks'),
+        pytest.param(True, False, id='record_acks'),
+        pytest.param(False, True, id='batch_acks')]
+
+
+@pytest.mark.parametrize('record_acks, batch_acks', ACKS)
+@pytest.mark.parametrize('use_tls', [False, True], ids=['plain', 'tls'])
+@pytest.mark.parametrize('connections', [10, 1_000, 5_000])
+def test_tcp_server_origin(sdc_builder, sdc_executor, pipeline_benchmark, connections, use_tls, record_acks,
+                           batch_acks):
+    """Benchmark the TCP Server origin with many concurrent connections. The pipeline looks like:
+
+        tcp_server >> trash
+    """
+    _benchmark_tcp_server(sdc_builder, sdc_executor, pipeline_benchmark,
+                          connections=connections,
+                          messages_per_connection=MESSAGES // connections,
+                          use_tls=use_tls,
+                          record_acks=record_acks,
+                          batch_acks=batch_acks)
+
+
+@pytest.mark.parametrize('messages_per_second', [10, 100])
+def test_tcp_server_origin_throttled_clients(sdc_builder, sdc_executor, pipeline_benchmark, messages_per_second):
+    """Benchmark the TCP Server origin with 5,000 clients sending at a fixed rate, waiting for record acks. Ack
+    latency is the figure of interest here, as throughput is set by the clients. The pipeline looks like:
+
+        tcp_server >> trash
+    """
+    _benchmark_tcp_server(sdc_builder, sdc_executor, pipeline_benchmark,
+                          connections=5_000,
+                          messages_per_connection=messages_per_second * 60,
+                          messages_per_second=messages_per_second,
+                          record_acks=True)
+
+
+def _benchmark_tcp_server(sdc_builder, sdc_executor, pipeline_benchmark, connections, messages_per_connection,
+                          messages_per_second=None, use_tls=False, record_acks=False, batch_acks=False):
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    tcp_server = pipeline_builder.add_stage('TCP Server')
+    tcp_server.set_attributes(data_format='TEXT',
+                              port=[str(TCP_PORT)],
+                              tcp_mode='DELIMITED_RECORDS',
+                              number_of_receiver_threads=NUMBER_OF_RECEIVER_THREADS,
+                              max_batch_size_in_messages=1000,
+                              batch_wait_time_in_ms=100,
+                              max_message_size_in_bytes=MESSAGE_SIZE * 2)
+    if record_acks:
+        tcp_server.set_attributes(record_processed_ack_message=RECORD_ACK_MESSAGE)
+    if batch_acks:
+        tcp_server.set_attributes(batch_completed_ack_message=BATCH_ACK_MESSAGE)
+    if use_tls:
+        tcp_server.set_attributes(use_tls=True,
+                                  keystore_file=TCP_KEYSTORE_FILE_PATH,
+                                  keystore_type='JKS',
+                                  keystore_password='password',
+                                  keystore_key_algorithm='SunX509',
+                                  use_default_protocols=True,
+                                  use_default_cipher_suites=True)
+    trash = pipeline_builder.add_stage('Trash')
+    tcp_server >> trash
+    pipeline = pipeline_builder.build()
+
+    generator = TcpLoadGenerator(sdc_executor.server_host, TCP_PORT,
+                                 connections=connections,
+                                 messages_per_connection=messages_per_connection,
+                                 message_size=MESSAGE_SIZE,
+                                 messages_per_second=messages_per_second,
+                                 ssl_context=get_client_ssl_context() if use_tls else None,
+                                 record_acks=record_acks,
+                                 batch_acks=batch_acks)
+    load_futures = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipeline_benchmark.run(pipeline, generator.number_of_messages,
+                               bytes_per_record=MESSAGE_SIZE + 1,
+                               after_start=lambda pipeline: load_futures.append(executor.submit(generator.run)))
+    load_results = [future.result()._asdict() for future in load_futures]
+
+    pipeline_benchmark.benchmark.extra_info['load'] = load_results
+    for result in load_results:
+        logger.info('Send latency %s, record ack latency %s, batch ack latency %s, %s messages unacknowledged',
+                    result['send_latency'], result['record_ack_latency'], result['batch_ack_latency'],
+                    result['unacknowledged'])
+        assert result['failed_connections'] == 0
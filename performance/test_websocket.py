@@ -0,0 +1,140 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The tests in this module measure websocket throughput and tail latency in both directions:
+
+- into the WebSocket Server origin, from many concurrent clients driven by
+  :py:class:`performance.utils.websocket_load.WebSocketLoadGenerator`;
+- out of the WebSocket Client destination, into a :py:class:`performance.utils.websocket_load.WebSocketSink`
+  running in the test process. SDC has to be able to reach the test host, whose address can be set with the
+  ``WEBSOCKET_SINK_HOST`` environment variable.
+
+Latencies are computed from the wall clocks of SDC and the test host, which are assumed to agree.
+"""
+
+import json
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from performance.utils.latency import LatencySamples, get_record_latency
+from performance.utils.websocket_load import SENT_TIME_SCRIPT, WebSocketLoadGenerator, WebSocketSink
+from stage.utils.latency_probe import RECORD_LATENCY_SCRIPT
+from stage.utils.sharding import shard_port
+from stage.utils.snapshots import SnapshotReader
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_SERVER_PORT = shard_port(8081)
+WEBSOCKET_SINK_PORT = shard_port(8082)
+WEBSOCKET_SINK_HOST = os.environ.get('WEBSOCKET_SINK_HOST') or socket.gethostbyname(socket.gethostname())
+APPLICATION_ID = 'benchmark'
+MESSAGES = 1_000_000
+# Batches captured to sample end-to-end record latency from.
+LATENCY_SAMPLED_BATCHES = 10
+# Records in the Dev Raw Data Source; they're repeated for every batch.
+RAW_DATA_RECORDS = 1_000
+MESSAGE_SIZES = [100, 10_000]
+# Besides their payload, records have a sequence number and a timestamp. The default limit is 4096 chars.
+MAX_OBJECT_LENGTH = max(MESSAGE_SIZES) + 1024
+
+
+@pytest.mark.parametrize('message_size', MESSAGE_SIZES)
+@pytest.mark.parametrize('connections', [1, 100, 1_000])
+def test_websocket_server_origin(sdc_builder, sdc_executor, pipeline_benchmark, connections, message_size):
+    """Benchmark the WebSocket Server origin with sustained message streams from many clients. The pipeline looks
+    like:
+
+        websocket_server >> javascript_evaluator >> trash
+    """
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    websocket_server = pipeline_builder.add_stage('WebSocket Server')
+    websocket_server.set_attributes(application_id=APPLICATION_ID,
+                                    data_format='JSON',
+                                    max_object_length_in_chars=MAX_OBJECT_LENGTH,
+                                    websocket_listening_port=WEBSOCKET_SERVER_PORT)
+    javascript_evaluator = pipeline_builder.add_stage('JavaScript Evaluator')
+    javascript_evaluator.script = RECORD_LATENCY_SCRIPT
+    trash = pipeline_builder.add_stage('Trash')
+    websocket_server >> javascript_evaluator >> trash
+    pipeline = pipeline_builder.build()
+
+    generator = WebSocketLoadGenerator(f'ws://{sdc_executor.server_host}:{WEBSOCKET_SERVER_PORT}', APPLICATION_ID,
+                                       connections=connections,
+                                       messages_per_connection=MESSAGES // connections,
+                                       message_size=message_size)
+    load_futures, latency_futures = [], []
+
+    def after_start(pipeline):
+        # Start capturing before sending, so that the snapshot has the first batches of the run.
+        snapshot_reader = SnapshotReader.capture(sdc_executor, pipeline, batches=LATENCY_SAMPLED_BATCHES)
+        load_futures.append(executor.submit(generator.run))
+        latency_futures.append(executor.submit(get_record_latency, snapshot_reader,
+                                               javascript_evaluator.instance_name))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pipeline_benchmark.run(pipeline, generator.number_of_messages, after_start=after_start)
+    load_results = [future.result()._asdict() for future in load_futures]
+    record_latency = LatencySamples()
+    for future in latency_futures:
+        record_latency.extend(future.result())
+
+    extra_info = pipeline_benchmark.benchmark.extra_info
+    extra_info['load'] = load_results
+    extra_info['record_latency'] = record_latency.summary()
+    logger.info('Record latency %s', extra_info['record_latency'])
+    for result in load_results:
+        assert result['failed_connections'] == 0, f'Connections failed: {result["errors"]}'
+
+
+@pytest.mark.parametrize('record_size', MESSAGE_SIZES)
+def test_websocket_client_destination(sdc_builder, sdc_executor, pipeline_benchmark, record_size):
+    """Benchmark the WebSocket Client destination writing to a websocket server in the test process. The pipeline
+    looks like:
+
+        dev_raw_data_source >> javascript_evaluator >> websocket_client
+    """
+    raw_data = '\n'.join(json.dumps(dict(seq=index, payload='x' * record_size)) for index in range(RAW_DATA_RECORDS))
+
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    dev_raw_data_source = pipeline_builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='JSON', json_content='MULTIPLE_OBJECTS',
+                                       max_object_length_in_chars=MAX_OBJECT_LENGTH, raw_data=raw_data)
+    javascript_evaluator = pipeline_builder.add_stage('JavaScript Evaluator')
+    javascript_evaluator.script = SENT_TIME_SCRIPT
+    websocket_client = pipeline_builder.add_stage('WebSocket Client', type='destination')
+    websocket_client.set_attributes(data_format='JSON',
+                                    resource_url=f'ws://{WEBSOCKET_SINK_HOST}:{WEBSOCKET_SINK_PORT}')
+    dev_raw_data_source >> javascript_evaluator >> websocket_client
+    pipeline = pipeline_builder.build()
+
+    sink_results = []
+    with WebSocketSink(WEBSOCKET_SINK_PORT) as sink:
+        pipeline_benchmark.run(pipeline, MESSAGES,
+                               bytes_per_record=len(raw_data) / RAW_DATA_RECORDS,
+                               before_round=lambda: sink_results.append(sink.reset()))
+        sink_results.append(sink.reset())
+    # The first reset only discards what was received before the first round.
+    sink_results = [result._asdict() for result in sink_results[1:]]
+
+    extra_info = pipeline_benchmark.benchmark.extra_info
+    extra_info['sink'] = sink_results
+    for result in sink_results:
+        logger.info('Sink received %s messages at %.0f messages/sec, latency %s',
+                    result['messages'], result['messages_per_second'], result['latency'])
+        assert result['records'] >= MESSAGES
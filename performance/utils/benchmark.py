@@ -0,0 +1,356 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pipeline benchmark harness built on top of pytest-benchmark.
+
+Each round is split in three phases: startup (add and start the pipeline), steady state (wait for the expected
+number of output records) and teardown (stop and remove the pipeline). Only the steady state phase is timed by
+pytest-benchmark; the other two are timed separately and stored with the rest of the round's results. The steady
+state phase waits through :py:class:`stage.utils.waiting.PipelineWaiter`, whose polling follows the pipeline's progress
+so that the end of the phase isn't overestimated by a fixed polling interval.
+
+Every round produces a result record with the following keys:
+
+* ``test_id``, ``run_id``, ``sdc_version``, ``timestamp``, ``round``, ``number_of_records``
+* ``startup_seconds``, ``steady_state_seconds``, ``teardown_seconds``
+* ``records_per_second``: ``number_of_records`` divided by ``steady_state_seconds``
+* ``bytes_per_record`` and ``megabytes_per_second``, if the average input size of a record was given
+* ``batch_processing``: ``count``, ``mean``, ``p50``, ``p95``, ``p99`` (and ``duration_units``) of the
+  ``pipeline.batchProcessing.timer`` under the ``pipeline`` key and of each stage's batch processing timer
+  under its instance name
+* ``gc_time_ms``: time spent in garbage collection during the round
+* ``heap_peak_bytes``, ``heap_used_bytes``: heap usage as reported by the SDC JVM at the end of the round
+
+Records are appended to ``benchmark.extra_info['rounds']`` and, when a results file is given, to a JSON-lines file.
+
+Pipelines that keep producing records can instead be measured with
+:py:meth:`PipelineBenchmark.run_steady_state`, which warms the pipeline up and then samples its throughput over
+fixed-duration windows of a single run, producing one record per window.
+"""
+
+import json
+import logging
+import statistics
+import uuid
+from datetime import datetime
+from time import perf_counter, sleep
+
+from stage.utils.waiting import PipelineWaiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SEC = 3600
+DEFAULT_WARMUP_SEC = 60
+DEFAULT_WINDOW_SEC = 30
+DEFAULT_MIN_WINDOWS = 5
+DEFAULT_MAX_WINDOWS = 20
+DEFAULT_TARGET_CV = 0.05
+PIPELINE_OUTPUT_RECORDS_COUNTER = 'pipeline.batchOutputRecords.counter'
+TIMER_FIELDS = ('count', 'mean', 'p50', 'p95', 'p99', 'duration_units')
+PIPELINE_BATCH_PROCESSING_TIMER = 'pipeline.batchProcessing.timer'
+STAGE_BATCH_PROCESSING_TIMER = 'stage.{}.batchProcessing.timer'
+GARBAGE_COLLECTOR_BEAN_PREFIX = 'java.lang:type=GarbageCollector'
+MEMORY_POOL_BEAN_PREFIX = 'java.lang:type=MemoryPool'
+MEMORY_BEAN = 'java.lang:type=Memory'
+
+
+class PipelineBenchmark:
+    """Run pipeline benchmarks and collect structured throughput results.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector to run pipelines on.
+        benchmark: The pytest-benchmark ``benchmark`` fixture.
+        test_id (:obj:`str`): Identifier stored with every result (usually the pytest node id).
+        results_file (:obj:`str`, optional): Path of a JSON-lines file to append results to. Default: ``None``
+        run_id (:obj:`str`, optional): Identifier of the test session, stored with every result so that runs
+            appended to the same results file can be told apart. Default: ``None``
+    """
+    def __init__(self, sdc_executor, benchmark, test_id, results_file=None, run_id=None):
+        self.sdc_executor = sdc_executor
+        self.benchmark = benchmark
+        self.test_id = test_id
+        self.results_file = results_file
+        self.run_id = run_id
+        self.results = []
+        self.waiter = PipelineWaiter(sdc_executor)
+
+    def run(self, pipeline, number_of_records, rounds=2, wait_for_finished=False, timeout_sec=DEFAULT_TIMEOUT_SEC,
+            bytes_per_record=None, before_round=None, after_start=None, after_steady_state=None):
+        """Benchmark a pipeline.
+
+        Args:
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Pipeline to benchmark. Its id is replaced
+                before each round.
+            number_of_records (:obj:`int`): Number of output records expected in each round.
+            rounds (:obj:`int`, optional): Number of rounds. Default: ``2``
+            wait_for_finished (:obj:`bool`, optional): Wait for the pipeline to finish on its own instead of
+                waiting for the output record count and stopping it. Default: ``False``
+            timeout_sec (:obj:`int`, optional): Timeout of the steady state phase.
+                Default: :py:const:`DEFAULT_TIMEOUT_SEC`
+            bytes_per_record (:obj:`float`, optional): Average input size of a record. If given, results also
+                contain ``megabytes_per_second``. Default: ``None``
+            before_round (:obj:`callable`, optional): Called without arguments before each round's pipeline is
+                added, e.g. to stage input consumed by the previous round. Not timed. Default: ``None``
+            after_start (:obj:`callable`, optional): Called with the pipeline once it's started, e.g. to start
+                feeding a listening origin in the background. Not timed. Default: ``None``
+            after_steady_state (:obj:`callable`, optional): Called with the pipeline at the end of the steady state
+                phase, before it's stopped, e.g. to sample what a destination wrote. Not part of
+                ``steady_state_seconds``. Default: ``None``
+
+        Returns:
+            A :obj:`list` of result records, one per round.
+        """
+        state = {}
+
+        def setup():
+            if state:
+                self._finish_round(state, wait_for_finished)
+            if before_round:
+                before_round()
+            state.update(self._start_round(pipeline, number_of_records, bytes_per_record))
+            if after_start:
+                after_start(state['pipeline'])
+            return (state['pipeline'],), {}
+
+        def steady_state(pipeline):
+            start = perf_counter()
+            if wait_for_finished:
+                self.waiter.wait_for_finished(pipeline, timeout_sec=timeout_sec)
+            else:
+                self.waiter.wait_for_output_records_count(pipeline, number_of_records, timeout_sec=timeout_sec)
+            state['steady_state_seconds'] = perf_counter() - start
+            if after_steady_state:
+                after_steady_state(pipeline)
+
+        try:
+            self.benchmark.pedantic(steady_state, setup=setup, rounds=rounds)
+            self._finish_round(state, wait_for_finished)
+        finally:
+            if state:
+                # A round failed; don't leave its pipeline running for the next test.
+                self._abort_round(state)
+
+        self.benchmark.extra_info['rounds'] = self.results
+        self.benchmark.extra_info['records_per_second'] = (sum(result['records_per_second']
+                                                               for result in self.results) / len(self.results))
+        if bytes_per_record:
+            self.benchmark.extra_info['megabytes_per_second'] = (self.benchmark.extra_info['records_per_second']
+                                                                 * bytes_per_record / 1024 ** 2)
+        return self.results
+
+    def _start_round(self, pipeline, number_of_records, bytes_per_record):
+        pipeline.id = str(uuid.uuid4())
+        gc_time_ms = self._get_gc_time_ms()
+
+        start = perf_counter()
+        self.sdc_executor.add_pipeline(pipeline)
+        self.sdc_executor.start_pipeline(pipeline)
+        startup_seconds = perf_counter() - start
+
+        return dict(pipeline=pipeline,
+                    number_of_records=number_of_records,
+                    bytes_per_record=bytes_per_record,
+                    startup_seconds=startup_seconds,
+                    gc_time_ms=gc_time_ms)
+
+    def run_steady_state(self, pipeline, warmup_sec=DEFAULT_WARMUP_SEC, window_sec=DEFAULT_WINDOW_SEC,
+                         min_windows=DEFAULT_MIN_WINDOWS, max_windows=DEFAULT_MAX_WINDOWS, target_cv=DEFAULT_TARGET_CV,
+                         bytes_per_record=None):
+        """Benchmark a long-running pipeline by sampling its throughput over fixed-duration windows.
+
+        The pipeline is started once and left running for ``warmup_sec`` so that JIT compilation and class loading
+        don't skew the numbers. Throughput is then computed from the output record counter of the live metrics
+        endpoint over consecutive windows, adding windows until the coefficient of variation drops below
+        ``target_cv`` (or ``max_windows`` is reached). pytest-benchmark times the whole measurement; the window
+        statistics are stored in ``benchmark.extra_info['steady_state']`` and each window produces a result record.
+
+        Args:
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Pipeline to benchmark. It has to keep
+                producing records for the whole measurement.
+            warmup_sec (:obj:`int`, optional): Warm-up duration. Default: :py:const:`DEFAULT_WARMUP_SEC`
+            window_sec (:obj:`int`, optional): Window duration. Default: :py:const:`DEFAULT_WINDOW_SEC`
+            min_windows (:obj:`int`, optional): Minimum number of windows. Default: :py:const:`DEFAULT_MIN_WINDOWS`
+            max_windows (:obj:`int`, optional): Maximum number of windows. Default: :py:const:`DEFAULT_MAX_WINDOWS`
+            target_cv (:obj:`float`, optional): Coefficient of variation to reach.
+                Default: :py:const:`DEFAULT_TARGET_CV`
+            bytes_per_record (:obj:`float`, optional): Average input size of a record. If given, results also
+                contain ``megabytes_per_second``. Default: ``None``
+
+        Returns:
+            A :obj:`list` of result records, one per window.
+        """
+        state = self._start_round(pipeline, number_of_records=None, bytes_per_record=bytes_per_record)
+        windows = []
+        try:
+            logger.info('Warming up pipeline %s for %s s ...', pipeline.id, warmup_sec)
+            sleep(warmup_sec)
+
+            def measure():
+                previous_count, previous_time = self._get_output_records_count(pipeline), perf_counter()
+                while len(windows) < max_windows:
+                    sleep(window_sec)
+                    count, now = self._get_output_records_count(pipeline), perf_counter()
+                    windows.append(dict(number_of_records=count - previous_count,
+                                        steady_state_seconds=now - previous_time))
+                    previous_count, previous_time = count, now
+
+                    if len(windows) >= min_windows:
+                        cv = _get_window_statistics(windows)['coefficient_of_variation']
+                        logger.debug('Coefficient of variation after %s windows: %.4f', len(windows), cv)
+                        if cv <= target_cv:
+                            break
+
+            self.benchmark.pedantic(measure, rounds=1)
+        finally:
+            common = self._stop_round(state)
+
+        for window in windows:
+            self._write_result(self._get_result(common, **window))
+
+        window_statistics = _get_window_statistics(windows)
+        if window_statistics['coefficient_of_variation'] > target_cv:
+            logger.warning('Coefficient of variation %.4f still above target %.4f after %s windows',
+                           window_statistics['coefficient_of_variation'], target_cv, len(windows))
+        logger.info('Steady state of %s: %.0f records/sec (stddev %.0f, CV %.4f, %s windows)',
+                    self.test_id, window_statistics['mean'], window_statistics['stddev'],
+                    window_statistics['coefficient_of_variation'], len(windows))
+        self.benchmark.extra_info['steady_state'] = dict(window_statistics,
+                                                         warmup_sec=warmup_sec,
+                                                         window_sec=window_sec)
+        self.benchmark.extra_info['rounds'] = self.results
+        self.benchmark.extra_info['records_per_second'] = window_statistics['mean']
+        if bytes_per_record:
+            self.benchmark.extra_info['megabytes_per_second'] = window_statistics['mean'] * bytes_per_record / 1024 ** 2
+        return self.results
+
+    def _finish_round(self, state, wait_for_finished):
+        common = self._stop_round(state, stop_pipeline=not wait_for_finished)
+        self._write_result(self._get_result(common,
+                                            number_of_records=state['number_of_records'],
+                                            steady_state_seconds=state['steady_state_seconds']))
+        state.clear()
+
+    def _abort_round(self, state):
+        pipeline = state['pipeline']
+        state.clear()
+        try:
+            self.sdc_executor.stop_pipeline(pipeline).wait_for_stopped()
+        except Exception as exception:
+            logger.warning('Could not stop pipeline %s of a failed round: %s', pipeline.id, exception)
+        try:
+            self.sdc_executor.remove_pipeline(pipeline)
+        except Exception as exception:
+            logger.warning('Could not remove pipeline %s of a failed round: %s', pipeline.id, exception)
+
+    def _stop_round(self, state, stop_pipeline=True):
+        """Collect metrics of the round, stop and remove the pipeline and return fields common to its results."""
+        pipeline = state['pipeline']
+        metrics = self.sdc_executor.api_client.get_pipeline_metrics(pipeline.id)
+        jmx_beans = self._get_jmx_beans()
+
+        start = perf_counter()
+        if stop_pipeline:
+            self.sdc_executor.stop_pipeline(pipeline).wait_for_stopped()
+        self.sdc_executor.remove_pipeline(pipeline)
+        teardown_seconds = perf_counter() - start
+
+        return dict(startup_seconds=state['startup_seconds'],
+                    bytes_per_record=state['bytes_per_record'],
+                    teardown_seconds=teardown_seconds,
+                    batch_processing=get_batch_processing_stats(metrics, pipeline),
+                    gc_time_ms=_get_gc_time_ms(jmx_beans) - state['gc_time_ms'],
+                    **_get_heap_usage(jmx_beans))
+
+    def _get_result(self, common, number_of_records, steady_state_seconds):
+        result = dict(common,
+                      test_id=self.test_id,
+                      run_id=self.run_id,
+                      sdc_version=self.sdc_executor.version,
+                      timestamp=datetime.utcnow().isoformat(),
+                      round=len(self.results) + 1,
+                      number_of_records=number_of_records,
+                      steady_state_seconds=steady_state_seconds,
+                      records_per_second=number_of_records / steady_state_seconds if steady_state_seconds else 0)
+        if result['bytes_per_record']:
+            result['megabytes_per_second'] = result['records_per_second'] * result['bytes_per_record'] / 1024 ** 2
+        logger.info('Round %s of %s: %.0f records/sec (startup %.2f s, steady state %.2f s, teardown %.2f s)',
+                    result['round'], self.test_id, result['records_per_second'],
+                    result['startup_seconds'], result['steady_state_seconds'], result['teardown_seconds'])
+        return result
+
+    def _get_output_records_count(self, pipeline):
+        return self.waiter.get_counter(pipeline, PIPELINE_OUTPUT_RECORDS_COUNTER)
+
+    def _write_result(self, result):
+        self.results.append(result)
+        if self.results_file:
+            with open(self.results_file, 'a') as results_file:
+                results_file.write(json.dumps(result, sort_keys=True) + '\n')
+
+    def _get_gc_time_ms(self):
+        return _get_gc_time_ms(self._get_jmx_beans())
+
+    def _get_jmx_beans(self):
+        api_client = self.sdc_executor.api_client
+        try:
+            response = api_client.session.get(f'{api_client.server_url}/rest/v1/system/jmx')
+            response.raise_for_status()
+            return response.json().get('beans', [])
+        except Exception as exception:
+            # JVM statistics are informational; don't fail the benchmark because they're unavailable.
+            logger.warning('Could not get JMX metrics from SDC: %s', exception)
+            return []
+
+
+def get_batch_processing_stats(metrics, pipeline):
+    """Extract batch processing timer statistics for the pipeline and each of its stages.
+
+    Args:
+        metrics (:obj:`dict`): Pipeline metrics as returned by SDC's ``/v1/pipeline/{id}/metrics`` endpoint.
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): The pipeline the metrics belong to.
+
+    Returns:
+        A :obj:`dict` of timer statistics keyed by ``'pipeline'`` and stage instance names.
+    """
+    timers = (metrics or {}).get('timers', {})
+    names = {'pipeline': PIPELINE_BATCH_PROCESSING_TIMER}
+    names.update({stage.instance_name: STAGE_BATCH_PROCESSING_TIMER.format(stage.instance_name)
+                  for stage in pipeline.stages})
+    return {key: {field: timers[name].get(field) for field in TIMER_FIELDS}
+            for key, name in names.items() if name in timers}
+
+
+def _get_gc_time_ms(jmx_beans):
+    return sum(bean.get('CollectionTime', 0) for bean in jmx_beans
+               if bean.get('name', '').startswith(GARBAGE_COLLECTOR_BEAN_PREFIX))
+
+
+def _get_heap_usage(jmx_beans):
+    heap_peak_bytes = sum(bean['PeakUsage']['used'] for bean in jmx_beans
+                          if bean.get('name', '').startswith(MEMORY_POOL_BEAN_PREFIX)
+                          and bean.get('Type') == 'HEAP' and bean.get('PeakUsage'))
+    heap_used_bytes = next((bean['HeapMemoryUsage']['used'] for bean in jmx_beans
+                            if bean.get('name') == MEMORY_BEAN and bean.get('HeapMemoryUsage')), None)
+    return dict(heap_peak_bytes=heap_peak_bytes or None, heap_used_bytes=heap_used_bytes)
+
+
+def _get_window_statistics(windows):
+    throughputs = [window['number_of_records'] / window['steady_state_seconds'] for window in windows]
+    mean = statistics.mean(throughputs) if throughputs else 0
+    stddev = statistics.stdev(throughputs) if len(throughputs) > 1 else 0
+    return dict(windows=len(throughputs),
+                mean=mean,
+                stddev=stddev,
+                coefficient_of_variation=stddev / mean if mean else float('inf'))
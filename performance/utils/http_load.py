@@ -0,0 +1,142 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+aiohttp load generator for the HTTP Server origin.
+
+``concurrency`` workers share one keep-alive connection pool and POST JSON records, optionally at a fixed overall
+request rate. Every record carries its sequence number and the wall clock time it was sent at in ``sent_ms``, so that
+a processor in the pipeline can compute its end-to-end latency (see
+:py:const:`stage.utils.latency_probe.RECORD_LATENCY_SCRIPT`). Responses are counted by status code and failed requests
+by error type.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, namedtuple
+from time import perf_counter
+
+import aiohttp
+
+from performance.utils.latency import LatencySamples
+
+logger = logging.getLogger(__name__)
+
+APPLICATION_ID_HEADER = 'X-SDC-APPLICATION-ID'
+DEFAULT_RECORD_SIZE = 100
+DEFAULT_REQUEST_TIMEOUT_SEC = 30
+ACCEPTED_STATUS = 200
+
+HttpLoadResult = namedtuple('HttpLoadResult', ['requests', 'accepted_requests', 'records', 'bytes', 'seconds',
+                                               'requests_per_second', 'accepted_requests_per_second',
+                                               'statuses', 'errors', 'error_rate', 'request_latency'])
+
+
+class HttpLoadGenerator:
+    """POST records to an HTTP Server origin from a pool of keep-alive connections.
+
+    Args:
+        url (:obj:`str`): URL of the origin.
+        application_id (:obj:`str`): Application ID sent in the :py:const:`APPLICATION_ID_HEADER` header.
+        requests (:obj:`int`): Number of requests.
+        concurrency (:obj:`int`): Number of requests in flight, and of pooled connections.
+        records_per_request (:obj:`int`, optional): Records in every request body. Default: ``1``
+        record_size (:obj:`int`, optional): Size of the payload of a record. Default: :py:const:`DEFAULT_RECORD_SIZE`
+        requests_per_second (:obj:`float`, optional): Overall request rate. Default: ``None`` (unthrottled)
+        timeout_sec (:obj:`int`, optional): Timeout of a request. Default: :py:const:`DEFAULT_REQUEST_TIMEOUT_SEC`
+    """
+    def __init__(self, url, application_id, requests, concurrency, records_per_request=1,
+                 record_size=DEFAULT_RECORD_SIZE, requests_per_second=None, timeout_sec=DEFAULT_REQUEST_TIMEOUT_SEC):
+        self.url = url
+        self.application_id = application_id
+        self.requests = requests
+        self.concurrency = concurrency
+        self.records_per_request = records_per_request
+        self.record_size = record_size
+        self.requests_per_second = requests_per_second
+        self.timeout_sec = timeout_sec
+
+    @property
+    def number_of_records(self):
+        return self.requests * self.records_per_request
+
+    def run(self):
+        """Send all requests.
+
+        Runs its own event loop, so it can be called from a thread while the test waits on the pipeline.
+
+        Returns:
+            A :py:class:`HttpLoadResult`. ``error_rate`` is the fraction of requests that failed or weren't accepted.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._run())
+        finally:
+            loop.close()
+
+    async def _run(self):
+        state = dict(bytes=0, statuses=Counter(), errors=Counter(), latency=LatencySamples())
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout_sec)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={APPLICATION_ID_HEADER: self.application_id}) as session:
+            sequences = iter(range(self.requests))
+            start = perf_counter()
+            await asyncio.gather(*(self._send(session, sequences, start, state) for _ in range(self.concurrency)))
+            seconds = perf_counter() - start
+
+        accepted_requests = state['statuses'][ACCEPTED_STATUS]
+        result = HttpLoadResult(requests=self.requests,
+                                accepted_requests=accepted_requests,
+                                records=accepted_requests * self.records_per_request,
+                                bytes=state['bytes'],
+                                seconds=seconds,
+                                requests_per_second=self.requests / seconds,
+                                accepted_requests_per_second=accepted_requests / seconds,
+                                statuses={str(status): count for status, count in state['statuses'].items()},
+                                errors=dict(state['errors']),
+                                error_rate=1 - accepted_requests / self.requests if self.requests else 0,
+                                request_latency=state['latency'].summary())
+        logger.info('Sent %s requests in %.2f s: %.0f accepted requests/sec, error rate %.2f%% (%s, %s)',
+                    self.requests, seconds, result.accepted_requests_per_second, result.error_rate * 100,
+                    result.statuses, result.errors)
+        return result
+
+    async def _send(self, session, sequences, start, state):
+        # Workers share the sequence iterator, which is safe as they all run on the same event loop.
+        for sequence in sequences:
+            if self.requests_per_second:
+                delay = start + sequence / self.requests_per_second - perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            body = self._get_body(sequence)
+            sent = perf_counter()
+            try:
+                async with session.post(self.url, data=body) as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                state['errors'][type(error).__name__] += 1
+                continue
+            state['latency'].add(perf_counter() - sent)
+            state['statuses'][status] += 1
+            state['bytes'] += len(body)
+
+    def _get_body(self, sequence):
+        sent_ms = int(time.time() * 1000)
+        first_record = sequence * self.records_per_request
+        return '\n'.join(json.dumps(dict(seq=first_record + index, sent_ms=sent_ms, payload='x' * self.record_size))
+                         for index in range(self.records_per_request)).encode()
@@ -0,0 +1,185 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Counting Kafka consumer, to measure what a pipeline produced to a topic without the overhead of decoding it.
+
+:py:class:`KafkaCountingConsumer` reads all partitions of a topic from the beginning on its own thread, with fetches
+tuned for throughput, and only counts messages and their bytes per partition. Like
+:py:class:`performance.utils.websocket_load.WebSocketSink`, :py:meth:`KafkaCountingConsumer.reset` returns what was
+counted since the previous reset, so that every benchmark round gets its own numbers. Before counting stops it
+waits for the consumer to catch up with the end of every partition, so that a round's count is complete.
+
+The consumer may drain a topic slower than a pipeline fills it, so produce rates don't come from the consumer: they
+come from the growth of the partitions' end offsets between :py:meth:`KafkaCountingConsumer.start_interval` and
+:py:meth:`KafkaCountingConsumer.end_interval`, e.g. called at the start and end of a round's steady state::
+
+    with KafkaCountingConsumer(cluster, topic, partitions) as counting_consumer:
+        pipeline_benchmark.run(pipeline, MESSAGES,
+                               before_round=lambda: counts.append(counting_consumer.reset()),
+                               after_start=lambda pipeline: counting_consumer.start_interval(),
+                               after_steady_state=lambda pipeline: counting_consumer.end_interval())
+
+The consumed messages give their average size, for the bytes produced per second, and the partition skew.
+"""
+
+import logging
+import statistics
+import threading
+from collections import namedtuple
+from time import perf_counter
+
+from kafka import TopicPartition
+
+from stage.utils.waiting import wait_for
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_CONFIGS = dict(enable_auto_commit=False,
+                        fetch_max_bytes=64 * 1024 ** 2,
+                        max_partition_fetch_bytes=8 * 1024 ** 2,
+                        receive_buffer_bytes=4 * 1024 ** 2)
+DEFAULT_POLL_TIMEOUT_MS = 500
+DEFAULT_CATCH_UP_TIMEOUT_SEC = 300
+
+KafkaCountResult = namedtuple('KafkaCountResult', ['messages', 'bytes', 'interval_messages', 'interval_seconds',
+                                                   'messages_per_second', 'bytes_per_second', 'partitions',
+                                                   'partition_skew'])
+
+
+class KafkaCountingConsumer:
+    """Count the messages of all partitions of a topic on a background thread.
+
+    Args:
+        cluster: Cluster with Kafka.
+        topic (:obj:`str`): Topic name.
+        partitions (:obj:`int`): Number of partitions of the topic.
+        **consumer_configs: Consumer configurations overriding :py:const:`CONSUMER_CONFIGS`.
+    """
+    def __init__(self, cluster, topic, partitions, **consumer_configs):
+        self.cluster = cluster
+        self.topic = topic
+        self.partitions = [TopicPartition(topic, partition) for partition in range(partitions)]
+        self.consumer_configs = dict(CONSUMER_CONFIGS, **consumer_configs)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Consumer of the caller's thread, only to get end offsets.
+        self._offsets_consumer = None
+        self._interval_start = None
+        self._interval_end = None
+        # Messages consumed since the start, to compare with the end offsets of the partitions.
+        self._total_messages = 0
+        self._reset_state()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        consumer = self.cluster.kafka.consumer(**self.consumer_configs)
+        consumer.assign(self.partitions)
+        consumer.seek_to_beginning(*self.partitions)
+        self._offsets_consumer = self.cluster.kafka.consumer()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._consume, args=(consumer,), name='kafka-counting-consumer',
+                                        daemon=True)
+        self._thread.start()
+        logger.info('Counting messages of topic %s (%s partitions)', self.topic, len(self.partitions))
+
+    def stop(self):
+        if self._thread:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+            self._offsets_consumer.close()
+            self._offsets_consumer = None
+
+    def start_interval(self):
+        """Start the interval produce rates are measured over, e.g. when a round's pipeline is started."""
+        self._interval_start = (self._get_end_offset(), perf_counter())
+        self._interval_end = None
+
+    def end_interval(self):
+        """End the interval produce rates are measured over, e.g. at the end of a round's steady state."""
+        self._interval_end = (self._get_end_offset(), perf_counter())
+
+    def reset(self, timeout_sec=DEFAULT_CATCH_UP_TIMEOUT_SEC):
+        """Wait for the consumer to reach the end of the topic, get what it counted since it started or was last
+        reset, and start counting anew.
+
+        Args:
+            timeout_sec (:obj:`float`, optional): Timeout of catching up with the end of the topic.
+                Default: :py:const:`DEFAULT_CATCH_UP_TIMEOUT_SEC`
+
+        Returns:
+            A :py:class:`KafkaCountResult`. Its ``messages_per_second`` and ``bytes_per_second`` are those of the
+            interval since the last :py:meth:`start_interval`, and ``None`` without a complete interval.
+        """
+        end_offset = self._get_end_offset()
+        wait_for(lambda: self._total_messages >= end_offset, timeout_sec=timeout_sec,
+                 description=f'counting consumer to reach offset {end_offset} of topic {self.topic}')
+        with self._lock:
+            state = self._state
+            self._reset_state()
+
+        interval_messages = interval_seconds = messages_per_second = bytes_per_second = None
+        if self._interval_start and self._interval_end:
+            interval_messages = self._interval_end[0] - self._interval_start[0]
+            interval_seconds = self._interval_end[1] - self._interval_start[1]
+            messages_per_second = interval_messages / interval_seconds if interval_seconds else 0
+            message_size = state['bytes'] / state['messages'] if state['messages'] else 0
+            bytes_per_second = messages_per_second * message_size
+        self._interval_start = self._interval_end = None
+
+        counts = [state['partitions'].get(partition.partition, 0) for partition in self.partitions]
+        mean = statistics.mean(counts)
+        return KafkaCountResult(messages=state['messages'],
+                                bytes=state['bytes'],
+                                interval_messages=interval_messages,
+                                interval_seconds=interval_seconds,
+                                messages_per_second=messages_per_second,
+                                bytes_per_second=bytes_per_second,
+                                partitions=dict(state['partitions']),
+                                # Largest partition relative to an even spread, i.e. 1.0 when perfectly balanced.
+                                partition_skew=max(counts) / mean if mean else 0)
+
+    def _reset_state(self):
+        self._state = dict(messages=0, bytes=0, partitions={})
+
+    def _get_end_offset(self):
+        """Get the sum of the end offsets of all partitions, i.e. the number of messages in a topic never compacted
+        or truncated.
+        """
+        return sum(self._offsets_consumer.end_offsets(self.partitions).values())
+
+    def _consume(self, consumer):
+        try:
+            while not self._stopped.is_set():
+                batches = consumer.poll(timeout_ms=DEFAULT_POLL_TIMEOUT_MS)
+                if not batches:
+                    continue
+                with self._lock:
+                    state = self._state
+                    for topic_partition, messages in batches.items():
+                        partition = topic_partition.partition
+                        state['partitions'][partition] = state['partitions'].get(partition, 0) + len(messages)
+                        state['messages'] += len(messages)
+                        state['bytes'] += sum(len(message.value) for message in messages if message.value)
+                    self._total_messages += sum(len(messages) for messages in batches.values())
+        finally:
+            consumer.close()
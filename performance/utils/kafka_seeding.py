@@ -0,0 +1,133 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fast seeding of Kafka topics with millions of messages.
+
+A single producer, tuned for throughput (batching with ``linger.ms``, compression, leader-only acks), sends all
+messages and is flushed once at the end, instead of a producer being created and flushed per message. Messages are
+records of a :py:class:`stage.utils.payloads.PayloadGenerator`, one record per message; Avro messages are encoded
+in chunks by the cached encoders of :py:mod:`stage.utils.encoding`.
+"""
+
+import logging
+from itertools import islice
+from time import perf_counter
+
+from kafka.admin import KafkaAdminClient, NewTopic
+
+from stage.utils.encoding import encode_many
+
+logger = logging.getLogger(__name__)
+
+DATA_FORMATS = ('JSON', 'DELIMITED', 'TEXT', 'AVRO')
+PRODUCER_CONFIGS = dict(acks=1,
+                        compression_type='gzip',
+                        linger_ms=50,
+                        batch_size=1024 ** 2,
+                        buffer_memory=256 * 1024 ** 2,
+                        max_request_size=4 * 1024 ** 2)
+TOPIC_REPLICATION_FACTOR = 1
+# Records encoded at a time by :py:func:`stage.utils.encoding.encode_many`.
+ENCODING_CHUNK_SIZE = 10_000
+
+
+def create_topic(cluster, topic, partitions):
+    """Create a topic with the given number of partitions.
+
+    Args:
+        cluster (:py:class:`streamsets.testframework.environments.cloudera.ClouderaManagerCluster` or
+            :py:class:`streamsets.testframework.environments.kafka.KafkaCluster`): Cluster with Kafka.
+        topic (:obj:`str`): Topic name.
+        partitions (:obj:`int`): Number of partitions.
+    """
+    admin_client = KafkaAdminClient(bootstrap_servers=cluster.kafka.brokers)
+    try:
+        admin_client.create_topics([NewTopic(name=topic, num_partitions=partitions,
+                                             replication_factor=TOPIC_REPLICATION_FACTOR)])
+    finally:
+        admin_client.close()
+
+
+def delete_topics(cluster, topics):
+    """Delete topics, logging instead of failing if they can't be."""
+    admin_client = KafkaAdminClient(bootstrap_servers=cluster.kafka.brokers)
+    try:
+        admin_client.delete_topics(list(topics))
+    except Exception as exception:
+        logger.warning('Could not delete topics %s: %s', topics, exception)
+    finally:
+        admin_client.close()
+
+
+def encode_messages(payload_generator, data_format, number_of_messages):
+    """Lazily encode records of a payload generator into one message each.
+
+    ``AVRO`` messages are single binary-encoded datums, to be read with the generator's ``avro_schema()`` inline;
+    other formats are the generator's lines.
+
+    Yields:
+        A :obj:`bytes` per message.
+    """
+    if data_format == 'AVRO':
+        schema = payload_generator.avro_schema()
+        records = payload_generator.records(number_of_messages)
+        while True:
+            messages = encode_many(islice(records, ENCODING_CHUNK_SIZE), 'AVRO', schema=schema)
+            if not messages:
+                break
+            yield from messages
+    else:
+        for line in payload_generator.lines(data_format, number_of_messages):
+            yield line.encode()
+
+
+class KafkaSeeder:
+    """Send messages through a single throughput-tuned producer.
+
+    Args:
+        cluster: Cluster with Kafka.
+        **producer_configs: Producer configurations overriding :py:const:`PRODUCER_CONFIGS`.
+    """
+    def __init__(self, cluster, **producer_configs):
+        self.producer = cluster.kafka.producer(**dict(PRODUCER_CONFIGS, **producer_configs))
+
+    def seed(self, topic, messages):
+        """Send messages to a topic and wait for all of them to be acknowledged.
+
+        Args:
+            topic (:obj:`str`): Topic name.
+            messages (:obj:`iterable`): Messages as :obj:`bytes`.
+
+        Returns:
+            A :obj:`dict` with the number of ``messages``, their ``bytes`` and the ``seconds`` it took.
+        """
+        failures = []
+        number_of_messages = number_of_bytes = 0
+        start = perf_counter()
+        for message in messages:
+            self.producer.send(topic, message).add_errback(failures.append)
+            number_of_messages += 1
+            number_of_bytes += len(message)
+        self.producer.flush()
+        seconds = perf_counter() - start
+        if failures:
+            raise Exception(f'{len(failures)} of {number_of_messages} messages could not be sent to {topic}, '
+                            f'e.g. because of {failures[0]!r}')
+        logger.info('Seeded %s with %s messages (%s bytes) in %.2f s (%.0f messages/sec)',
+                    topic, number_of_messages, number_of_bytes, seconds, number_of_messages / seconds)
+        return dict(messages=number_of_messages, bytes=number_of_bytes, seconds=seconds)
+
+    def close(self):
+        self.producer.close()
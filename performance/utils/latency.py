@@ -0,0 +1,72 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Latency samples collected by load generators, summarized as percentiles in milliseconds.
+
+Samples are counted in a :py:class:`stage.utils.latency_probe.LatencyHistogram`, so that load generators can record
+the latency of every one of millions of messages in constant memory.
+"""
+
+from stage.utils.latency_probe import RECORD_LATENCY_FIELD, LatencyHistogram
+from stage.utils.record_tables import RecordTable
+
+PERCENTILES = (50, 95, 99, 99.9)
+DEFAULT_SNAPSHOT_TIMEOUT_SEC = 300
+
+
+class LatencySamples:
+    """Latencies in seconds."""
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+
+    def __len__(self):
+        return len(self.histogram)
+
+    def add(self, seconds):
+        self.histogram.record(seconds)
+
+    def extend(self, other):
+        self.histogram.merge(other.histogram)
+
+    def percentile(self, percentile):
+        """Nearest-rank percentile in seconds, ``None`` if there are no samples."""
+        return self.histogram.value_at_percentile(percentile)
+
+    def summary(self):
+        """Get ``count``, ``mean_ms``, ``min_ms``, ``max_ms`` and ``p<N>_ms`` for every percentile in
+        :py:const:`PERCENTILES`, e.g. ``p999_ms`` for the 99.9th.
+        """
+        return self.histogram.summary(PERCENTILES)
+
+
+def get_record_latency(snapshot_reader, instance_name, timeout_sec=DEFAULT_SNAPSHOT_TIMEOUT_SEC):
+    """Get the latencies computed by :py:const:`stage.utils.latency_probe.RECORD_LATENCY_SCRIPT` from a snapshot.
+
+    Args:
+        snapshot_reader (:py:class:`stage.utils.snapshots.SnapshotReader`): Snapshot being captured.
+        instance_name (:obj:`str`): Instance name of the JavaScript Evaluator running the script.
+        timeout_sec (:obj:`int`, optional): Time to wait for the snapshot.
+            Default: :py:const:`DEFAULT_SNAPSHOT_TIMEOUT_SEC`
+
+    Returns:
+        A :py:class:`LatencySamples`.
+    """
+    samples = LatencySamples()
+    snapshot_reader.wait_for_finished(timeout_sec=timeout_sec)
+    output = RecordTable.from_records(snapshot_reader.output(instance_name), [RECORD_LATENCY_FIELD])
+    for latency_ms in output.column(RECORD_LATENCY_FIELD):
+        if latency_ms is not None:
+            samples.add(latency_ms / 1000)
+    return samples
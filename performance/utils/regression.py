@@ -0,0 +1,346 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare benchmark results against a stored baseline and flag throughput regressions.
+
+Results are the per-round records written by :py:class:`performance.utils.benchmark.PipelineBenchmark`, read either
+from its JSON-lines file or from a pytest-benchmark ``--benchmark-json`` file (where they live in each benchmark's
+``extra_info['rounds']``). The baseline is a JSON file of the form::
+
+    {"<test id>": {"<SDC version>": [<records/sec of round 1>, <records/sec of round 2>, ...]}}
+
+A JSON-lines file accumulates the results of every run; only each test's latest run (by ``run_id``) is compared,
+unless ``--run-id`` picks one.
+
+Everything works offline against files on disk, e.g.::
+
+    $ python -m performance.utils.regression --baseline baseline.json --results benchmark_results.jsonl \\
+        --fail-threshold 0.15 --report regression.md
+
+The exit status is 1 if at least one test regressed by more than the fail threshold.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import random
+import re
+import sys
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRIC = 'records_per_second'
+DEFAULT_WARN_THRESHOLD = 0.05
+DEFAULT_FAIL_THRESHOLD = 0.15
+DEFAULT_ALPHA = 0.05
+DEFAULT_BOOTSTRAP_RESAMPLES = 10_000
+# Above this many samples in total, Mann-Whitney p-values use the normal approximation.
+MAX_EXACT_MANN_WHITNEY_SAMPLES = 40
+
+STATUS_OK = 'OK'
+STATUS_WARN = 'WARN'
+STATUS_FAIL = 'FAIL'
+STATUS_NEW = 'NEW'
+
+Comparison = namedtuple('Comparison', ['test_id', 'sdc_version', 'baseline_sdc_version', 'baseline_mean',
+                                       'current_mean', 'delta', 'p_value', 'confidence_interval', 'status'])
+
+
+def load_results(path, metric=DEFAULT_METRIC, run_id=None):
+    """Load benchmark results grouped by test id and SDC version.
+
+    Args:
+        path (:obj:`str`): JSON-lines results file or pytest-benchmark JSON file.
+        metric (:obj:`str`, optional): Result key to collect. Default: :py:const:`DEFAULT_METRIC`
+        run_id (:obj:`str`, optional): Run to load. Default: ``None`` (the latest run of each test and SDC version)
+
+    Returns:
+        A :obj:`dict` of the same shape as the baseline file.
+    """
+    with open(path) as results_file:
+        if path.endswith('.jsonl'):
+            records = [json.loads(line) for line in results_file if line.strip()]
+        else:
+            records = [record
+                       for benchmark in json.load(results_file).get('benchmarks', [])
+                       for record in benchmark.get('extra_info', {}).get('rounds', [])]
+
+    # Records of files written before runs had ids all belong to a run with id None.
+    runs = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        if record.get(metric) is not None and (run_id is None or record.get('run_id') == run_id):
+            runs[(record['test_id'], record['sdc_version'])][record.get('run_id')].append(record)
+
+    results = defaultdict(dict)
+    for (test_id, sdc_version), run_records in runs.items():
+        latest_run = max(run_records.values(),
+                         key=lambda records: max(record.get('timestamp', '') for record in records))
+        results[test_id][sdc_version] = [record[metric] for record in latest_run]
+    return dict(results)
+
+
+def load_baseline(path):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def update_baseline(baseline, results):
+    """Return a new baseline with ``results`` replacing the entries for the same test id and SDC version."""
+    updated = {test_id: dict(versions) for test_id, versions in baseline.items()}
+    for test_id, versions in results.items():
+        updated.setdefault(test_id, {}).update(versions)
+    return updated
+
+
+def compare(baseline, results, method='mann-whitney', warn_threshold=DEFAULT_WARN_THRESHOLD,
+            fail_threshold=DEFAULT_FAIL_THRESHOLD, alpha=DEFAULT_ALPHA, baseline_sdc_version=None):
+    """Compare results against a baseline, assuming higher values are better.
+
+    A test is flagged only if the drop is statistically significant at ``alpha`` and its relative size is at least
+    the warn (or fail) threshold. With the Mann-Whitney test, samples too small to ever reach ``alpha`` (e.g. 2 rounds
+    against 2, whose smallest p-value is 1/6) are flagged on the threshold alone.
+
+    Args:
+        baseline (:obj:`dict`): Baseline samples keyed by test id and SDC version.
+        results (:obj:`dict`): Current samples, same shape as ``baseline``.
+        method (:obj:`str`, optional): ``'mann-whitney'`` or ``'bootstrap'``. Default: ``'mann-whitney'``
+        warn_threshold (:obj:`float`, optional): Relative drop that triggers a warning.
+            Default: :py:const:`DEFAULT_WARN_THRESHOLD`
+        fail_threshold (:obj:`float`, optional): Relative drop that triggers a failure.
+            Default: :py:const:`DEFAULT_FAIL_THRESHOLD`
+        alpha (:obj:`float`, optional): Significance level. Default: :py:const:`DEFAULT_ALPHA`
+        baseline_sdc_version (:obj:`str`, optional): Baseline SDC version to compare against. By default, the same
+            version as the results is used if present in the baseline, otherwise the latest one. Default: ``None``
+
+    Returns:
+        A :obj:`list` of :py:class:`Comparison` instances.
+    """
+    if method not in ('mann-whitney', 'bootstrap'):
+        raise ValueError(f'Unknown comparison method {method}.')
+
+    comparisons = []
+    for test_id, versions in sorted(results.items()):
+        for sdc_version, current in sorted(versions.items()):
+            baseline_versions = baseline.get(test_id, {})
+            reference_version = _get_reference_version(baseline_versions, sdc_version, baseline_sdc_version)
+            current_mean = _mean(current)
+            if reference_version is None:
+                comparisons.append(Comparison(test_id, sdc_version, None, None, current_mean,
+                                              None, None, None, STATUS_NEW))
+                continue
+
+            reference = baseline_versions[reference_version]
+            baseline_mean = _mean(reference)
+            delta = current_mean / baseline_mean - 1 if baseline_mean else 0
+            if method == 'mann-whitney':
+                p_value = mann_whitney_u_test(current, reference)
+                confidence_interval = None
+                significant = p_value < alpha or min_mann_whitney_p_value(len(current), len(reference)) >= alpha
+            else:
+                p_value = None
+                confidence_interval = bootstrap_ratio_interval(current, reference, alpha=alpha)
+                significant = confidence_interval[1] < 1
+
+            status = STATUS_OK
+            if significant and delta <= -fail_threshold:
+                status = STATUS_FAIL
+            elif significant and delta <= -warn_threshold:
+                status = STATUS_WARN
+            comparisons.append(Comparison(test_id, sdc_version, reference_version, baseline_mean, current_mean,
+                                          delta, p_value, confidence_interval, status))
+    return comparisons
+
+
+def mann_whitney_u_test(current, baseline):
+    """One-sided Mann-Whitney U test of whether ``current`` tends to be smaller than ``baseline``.
+
+    Returns:
+        The p-value as a :obj:`float`. Exact for small samples without ties, normal approximation otherwise.
+    """
+    n1, n2 = len(current), len(baseline)
+    if not n1 or not n2:
+        return 1.0
+
+    ranks = _rank(list(current) + list(baseline))
+    u = sum(ranks[:n1]) - n1 * (n1 + 1) / 2
+    tied = len(set(current) | set(baseline)) < n1 + n2
+
+    if not tied and n1 + n2 <= MAX_EXACT_MANN_WHITNEY_SAMPLES:
+        total = math.comb(n1 + n2, n1)
+        return sum(_u_distribution(n1, n2, k) for k in range(int(u) + 1)) / total
+
+    tie_groups = defaultdict(int)
+    for value in itertools.chain(current, baseline):
+        tie_groups[value] += 1
+    n = n1 + n2
+    tie_correction = sum(t ** 3 - t for t in tie_groups.values()) / (n * (n - 1))
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_correction))
+    if not sigma:
+        return 1.0
+    z = (u - n1 * n2 / 2 + 0.5) / sigma
+    return 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+def min_mann_whitney_p_value(n1, n2):
+    """Smallest one-sided p-value the exact Mann-Whitney U test can give for samples of these sizes."""
+    return 1 / math.comb(n1 + n2, n1) if n1 and n2 else 1.0
+
+
+def bootstrap_ratio_interval(current, baseline, alpha=DEFAULT_ALPHA, resamples=DEFAULT_BOOTSTRAP_RESAMPLES, seed=0):
+    """Percentile bootstrap confidence interval of ``mean(current) / mean(baseline)``.
+
+    Returns:
+        A (low, high) :obj:`tuple`.
+    """
+    generator = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        baseline_mean = _mean(generator.choices(baseline, k=len(baseline)))
+        if baseline_mean:
+            ratios.append(_mean(generator.choices(current, k=len(current))) / baseline_mean)
+    ratios.sort()
+    if not ratios:
+        return (math.nan, math.nan)
+    low = ratios[int(alpha / 2 * (len(ratios) - 1))]
+    high = ratios[int((1 - alpha / 2) * (len(ratios) - 1))]
+    return (low, high)
+
+
+def markdown_report(comparisons):
+    """Render comparisons as a markdown table."""
+    lines = ['| Test | SDC version | Baseline | Current | Delta | p-value / CI | Status |',
+             '|---|---|---|---|---|---|---|']
+    lines.extend('| {} |'.format(' | '.join(row)) for row in _report_rows(comparisons))
+    return '\n'.join(lines) + '\n'
+
+
+def html_report(comparisons):
+    """Render comparisons as an HTML table."""
+    header = ''.join(f'<th>{title}</th>' for title in ('Test', 'SDC version', 'Baseline', 'Current', 'Delta',
+                                                       'p-value / CI', 'Status'))
+    rows = ''.join('<tr>{}</tr>'.format(''.join(f'<td>{_escape_html(cell)}</td>' for cell in row))
+                   for row in _report_rows(comparisons))
+    return f'<table>\n<thead><tr>{header}</tr></thead>\n<tbody>{rows}</tbody>\n</table>\n'
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', required=True, help='Baseline JSON file')
+    parser.add_argument('--results', required=True, help='JSON-lines or pytest-benchmark JSON results file')
+    parser.add_argument('--metric', default=DEFAULT_METRIC)
+    parser.add_argument('--run-id', help='Run to compare (by default, the latest run of each test)')
+    parser.add_argument('--method', choices=('mann-whitney', 'bootstrap'), default='mann-whitney')
+    parser.add_argument('--warn-threshold', type=float, default=DEFAULT_WARN_THRESHOLD)
+    parser.add_argument('--fail-threshold', type=float, default=DEFAULT_FAIL_THRESHOLD)
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA)
+    parser.add_argument('--baseline-sdc-version')
+    parser.add_argument('--report', help='Write the report to this file (.html for HTML, markdown otherwise)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Merge the results into the baseline file after comparing')
+    parsed_args = parser.parse_args(args)
+
+    baseline = load_baseline(parsed_args.baseline)
+    results = load_results(parsed_args.results, metric=parsed_args.metric, run_id=parsed_args.run_id)
+    comparisons = compare(baseline, results,
+                          method=parsed_args.method,
+                          warn_threshold=parsed_args.warn_threshold,
+                          fail_threshold=parsed_args.fail_threshold,
+                          alpha=parsed_args.alpha,
+                          baseline_sdc_version=parsed_args.baseline_sdc_version)
+
+    report = markdown_report(comparisons)
+    print(report)
+    if parsed_args.report:
+        with open(parsed_args.report, 'w') as report_file:
+            report_file.write(html_report(comparisons) if parsed_args.report.endswith('.html') else report)
+
+    if parsed_args.update_baseline:
+        with open(parsed_args.baseline, 'w') as baseline_file:
+            json.dump(update_baseline(baseline, results), baseline_file, indent=2, sort_keys=True)
+
+    return 1 if any(comparison.status == STATUS_FAIL for comparison in comparisons) else 0
+
+
+def _get_reference_version(baseline_versions, sdc_version, baseline_sdc_version):
+    if baseline_sdc_version:
+        return baseline_sdc_version if baseline_sdc_version in baseline_versions else None
+    if sdc_version in baseline_versions:
+        return sdc_version
+    return max(baseline_versions, key=_version_key, default=None)
+
+
+def _version_key(version):
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+def _rank(values):
+    """Ranks starting at 1, with ties getting the average of their ranks."""
+    order = sorted(range(len(values)), key=values.__getitem__)
+    ranks = [0] * len(values)
+    position = 0
+    while position < len(order):
+        end = position
+        while end + 1 < len(order) and values[order[end + 1]] == values[order[position]]:
+            end += 1
+        for index in order[position:end + 1]:
+            ranks[index] = (position + end) / 2 + 1
+        position = end + 1
+    return ranks
+
+
+@lru_cache(maxsize=None)
+def _u_distribution(n1, n2, u):
+    """Number of orderings of n1 + n2 distinct samples for which the U statistic of the first sample equals u."""
+    if u < 0:
+        return 0
+    if n1 == 0 or n2 == 0:
+        return 1 if u == 0 else 0
+    # The largest value either belongs to the first sample (adding n2 to U) or to the second one.
+    return _u_distribution(n1 - 1, n2, u - n2) + _u_distribution(n1, n2 - 1, u)
+
+
+def _report_rows(comparisons):
+    for comparison in comparisons:
+        if comparison.p_value is not None:
+            significance = f'{comparison.p_value:.3f}'
+        elif comparison.confidence_interval is not None:
+            significance = '[{:.3f}, {:.3f}]'.format(*comparison.confidence_interval)
+        else:
+            significance = '-'
+        yield (comparison.test_id,
+               comparison.sdc_version if not comparison.baseline_sdc_version
+               or comparison.baseline_sdc_version == comparison.sdc_version
+               else f'{comparison.baseline_sdc_version} -> {comparison.sdc_version}',
+               f'{comparison.baseline_mean:,.0f}' if comparison.baseline_mean is not None else '-',
+               f'{comparison.current_mean:,.0f}',
+               f'{comparison.delta:+.1%}' if comparison.delta is not None else '-',
+               significance,
+               comparison.status)
+
+
+def _escape_html(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio load generator for the TCP Server origin in ``DELIMITED_RECORDS`` mode.
+
+A single event loop drives thousands of connections, each sending newline-separated messages at an optional fixed
+rate. Every message is ``<connection>:<sequence>:`` padded to the message size, so that acks can be matched to the
+message they acknowledge when the origin is configured with :py:const:`RECORD_ACK_MESSAGE` and/or
+:py:const:`BATCH_ACK_MESSAGE`. The generator records:
+
+* send latency: time for a message to be written and drained to the socket,
+* record ack latency: time from sending a message to receiving its record processed ack,
+* batch ack latency: time from the first message sent since the previous batch completed ack to the next one.
+"""
+
+import asyncio
+import logging
+import resource
+import ssl
+from collections import namedtuple
+from time import perf_counter
+
+from performance.utils.latency import LatencySamples
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MESSAGE_SIZE = 100
+# Connections being opened at the same time; more tend to overflow the server's accept backlog.
+DEFAULT_CONNECT_CONCURRENCY = 200
+DEFAULT_CONNECT_TIMEOUT_SEC = 60
+DEFAULT_ACK_TIMEOUT_SEC = 300
+CONNECT_RETRY_INTERVAL_SEC = 0.1
+RECORD_SEPARATOR = b'\n'
+ACK_SEPARATOR = b';'
+# Ack messages for the TCP Server origin (record_processed_ack_message and batch_completed_ack_message) which the
+# generator knows how to match to sent messages.
+RECORD_ACK_MESSAGE = "r${record:value('/text')};"
+BATCH_ACK_MESSAGE = 'b;'
+
+TcpLoadResult = namedtuple('TcpLoadResult', ['connections', 'failed_connections', 'messages', 'bytes', 'seconds',
+                                             'messages_per_second', 'megabytes_per_second', 'unacknowledged',
+                                             'send_latency', 'record_ack_latency', 'batch_ack_latency'])
+
+
+def get_client_ssl_context():
+    """Client TLS context accepting the origin's self-signed certificate (resources/tcp_server/keystore.jks)."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def raise_open_files_limit(number_of_files):
+    """Raise the soft limit of open files of this process to fit ``number_of_files``, up to the hard limit."""
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted_limit = number_of_files + 100
+    if soft_limit != resource.RLIM_INFINITY and soft_limit < wanted_limit:
+        new_limit = wanted_limit if hard_limit == resource.RLIM_INFINITY else min(wanted_limit, hard_limit)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (new_limit, hard_limit))
+        if new_limit < wanted_limit:
+            logger.warning('Open files limit %s is lower than the %s connections', new_limit, number_of_files)
+
+
+class TcpLoadGenerator:
+    """Send messages to a TCP Server origin over many concurrent connections.
+
+    Args:
+        host (:obj:`str`): Host of the origin.
+        port (:obj:`int`): Port of the origin.
+        connections (:obj:`int`): Number of concurrent connections.
+        messages_per_connection (:obj:`int`): Messages sent over every connection.
+        message_size (:obj:`int`, optional): Message size in bytes, without the separator.
+            Default: :py:const:`DEFAULT_MESSAGE_SIZE`
+        messages_per_second (:obj:`float`, optional): Send rate of every connection. Default: ``None`` (unthrottled)
+        ssl_context (:py:class:`ssl.SSLContext`, optional): Context to connect with TLS. Default: ``None``
+        record_acks (:obj:`bool`, optional): Whether the origin sends :py:const:`RECORD_ACK_MESSAGE`.
+            Default: ``False``
+        batch_acks (:obj:`bool`, optional): Whether the origin sends :py:const:`BATCH_ACK_MESSAGE`. Default: ``False``
+        connect_concurrency (:obj:`int`, optional): Connections opened at the same time.
+            Default: :py:const:`DEFAULT_CONNECT_CONCURRENCY`
+        ack_timeout_sec (:obj:`int`, optional): Time to wait for outstanding acks after the last message of a
+            connection was sent. Default: :py:const:`DEFAULT_ACK_TIMEOUT_SEC`
+    """
+    def __init__(self, host, port, connections, messages_per_connection, message_size=DEFAULT_MESSAGE_SIZE,
+                 messages_per_second=None, ssl_context=None, record_acks=False, batch_acks=False,
+                 connect_concurrency=DEFAULT_CONNECT_CONCURRENCY, ack_timeout_sec=DEFAULT_ACK_TIMEOUT_SEC):
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.messages_per_connection = messages_per_connection
+        self.message_size = message_size
+        self.messages_per_second = messages_per_second
+        self.ssl_context = ssl_context
+        self.record_acks = record_acks
+        self.batch_acks = batch_acks
+        self.connect_concurrency = connect_concurrency
+        self.ack_timeout_sec = ack_timeout_sec
+
+    @property
+    def number_of_messages(self):
+        return self.connections * self.messages_per_connection
+
+    def run(self):
+        """Open all connections, send all messages and wait for their acks.
+
+        Runs its own event loop, so it can be called from a thread while the test waits on the pipeline.
+
+        Returns:
+            A :py:class:`TcpLoadResult` with latencies summarized by
+            :py:meth:`performance.utils.latency.LatencySamples.summary`.
+        """
+        raise_open_files_limit(self.connections)
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._run())
+        finally:
+            loop.close()
+
+    async def _run(self):
+        connect_semaphore = asyncio.Semaphore(self.connect_concurrency)
+        connections = [_Connection(self, index) for index in range(self.connections)]
+        start = perf_counter()
+        outcomes = await asyncio.gather(*(connection.run(connect_semaphore) for connection in connections),
+                                        return_exceptions=True)
+        seconds = perf_counter() - start
+
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        if errors:
+            logger.warning('%s of %s connections failed, e.g. with %r', len(errors), len(connections), errors[0])
+        send_latency, record_ack_latency, batch_ack_latency = LatencySamples(), LatencySamples(), LatencySamples()
+        for connection in connections:
+            send_latency.extend(connection.send_latency)
+            record_ack_latency.extend(connection.record_ack_latency)
+            batch_ack_latency.extend(connection.batch_ack_latency)
+        messages = sum(connection.messages for connection in connections)
+        number_of_bytes = sum(connection.bytes for connection in connections)
+        result = TcpLoadResult(connections=len(connections),
+                               failed_connections=len(errors),
+                               messages=messages,
+                               bytes=number_of_bytes,
+                               seconds=seconds,
+                               messages_per_second=messages / seconds,
+                               megabytes_per_second=number_of_bytes / seconds / 1024 ** 2,
+                               unacknowledged=sum(len(connection.pending) for connection in connections),
+                               send_latency=send_latency.summary(),
+                               record_ack_latency=record_ack_latency.summary(),
+                               batch_ack_latency=batch_ack_latency.summary())
+        logger.info('Sent %s messages over %s connections in %.2f s (%.0f messages/sec)',
+                    messages, len(connections), seconds, result.messages_per_second)
+        return result
+
+
+class _Connection:
+    """State of one connection of a :py:class:`TcpLoadGenerator`."""
+    def __init__(self, generator, index):
+        self.generator = generator
+        self.index = index
+        self.messages = 0
+        self.bytes = 0
+        # Send times of messages waiting for their record ack, by sequence number.
+        self.pending = {}
+        # Send time of the first message sent since the last batch ack.
+        self.batch_start = None
+        self.done_sending = False
+        self.send_latency = LatencySamples()
+        self.record_ack_latency = LatencySamples()
+        self.batch_ack_latency = LatencySamples()
+
+    @property
+    def acknowledged(self):
+        return (not self.generator.record_acks or not self.pending) and (not self.generator.batch_acks
+                                                                         or self.batch_start is None)
+
+    async def run(self, connect_semaphore):
+        generator = self.generator
+        async with connect_semaphore:
+            reader, writer = await self._connect()
+        ack_reader = (asyncio.ensure_future(self._read_acks(reader))
+                      if generator.record_acks or generator.batch_acks else None)
+        try:
+            padding = b'x' * generator.message_size
+            start = perf_counter()
+            for sequence in range(generator.messages_per_connection):
+                if generator.messages_per_second:
+                    delay = start + sequence / generator.messages_per_second - perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                prefix = f'{self.index}:{sequence}:'.encode()
+                message = prefix + padding[len(prefix):] + RECORD_SEPARATOR
+
+                sent = perf_counter()
+                if generator.record_acks:
+                    self.pending[sequence] = sent
+                if self.batch_start is None:
+                    self.batch_start = sent
+                writer.write(message)
+                await writer.drain()
+                self.send_latency.add(perf_counter() - sent)
+                self.messages += 1
+                self.bytes += len(message)
+
+            self.done_sending = True
+            if ack_reader:
+                if self.acknowledged:
+                    ack_reader.cancel()
+                else:
+                    await asyncio.wait_for(ack_reader, generator.ack_timeout_sec)
+        finally:
+            if ack_reader and not ack_reader.done():
+                ack_reader.cancel()
+            writer.close()
+
+    async def _connect(self):
+        generator = self.generator
+        deadline = perf_counter() + DEFAULT_CONNECT_TIMEOUT_SEC
+        while True:
+            try:
+                return await asyncio.open_connection(generator.host, generator.port, ssl=generator.ssl_context,
+                                                     server_hostname=generator.host if generator.ssl_context else None)
+            except OSError:
+                # The origin may not be listening yet right after the pipeline started.
+                if perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(CONNECT_RETRY_INTERVAL_SEC)
+
+    async def _read_acks(self, reader):
+        while True:
+            try:
+                ack = (await reader.readuntil(ACK_SEPARATOR)).decode().strip()
+            except asyncio.IncompleteReadError:
+                # The origin closed the connection, e.g. because the pipeline was stopped; what's still pending is
+                # reported as unacknowledged.
+                return
+            now = perf_counter()
+            if ack.startswith('b'):
+                if self.batch_start is not None:
+                    self.batch_ack_latency.add(now - self.batch_start)
+                    self.batch_start = None
+            elif ack.startswith('r'):
+                sent = self.pending.pop(int(ack.split(':')[1]), None)
+                if sent is not None:
+                    self.record_ack_latency.add(now - sent)
+            if self.done_sending and self.acknowledged:
+                return
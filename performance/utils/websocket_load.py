@@ -0,0 +1,254 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+aiohttp websocket load generator and sink, to benchmark both directions of SDC's websocket stages.
+
+- :py:class:`WebSocketLoadGenerator` streams JSON messages into the WebSocket Server origin over many concurrent
+  client connections. Like :py:class:`performance.utils.http_load.HttpLoadGenerator`, every message carries the time
+  it was sent at in ``sent_ms`` for :py:const:`stage.utils.latency_probe.RECORD_LATENCY_SCRIPT`.
+- :py:class:`WebSocketSink` is a websocket server for the WebSocket Client destination to write to. It counts the
+  messages it receives and computes their latency from a ``sent_ms`` field set by the pipeline.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from time import perf_counter
+
+import aiohttp
+from aiohttp import web
+
+from performance.utils.latency import LatencySamples
+
+logger = logging.getLogger(__name__)
+
+APPLICATION_ID_HEADER = 'X-SDC-APPLICATION-ID'
+DEFAULT_MESSAGE_SIZE = 100
+DEFAULT_CONNECT_CONCURRENCY = 200
+DEFAULT_SINK_STARTUP_TIMEOUT_SEC = 30
+# JavaScript Evaluator script stamping records with the time they're sent to a WebSocketSink.
+SENT_TIME_SCRIPT = """
+    for (var i = 0; i < records.length; i++) {
+      records[i].value['sent_ms'] = Date.now();
+      output.write(records[i]);
+    }
+"""
+
+WebSocketLoadResult = namedtuple('WebSocketLoadResult', ['connections', 'failed_connections', 'messages', 'bytes',
+                                                         'seconds', 'messages_per_second', 'errors', 'send_latency'])
+WebSocketSinkResult = namedtuple('WebSocketSinkResult', ['connections', 'messages', 'records', 'bytes', 'seconds',
+                                                         'messages_per_second', 'latency'])
+
+
+class WebSocketLoadGenerator:
+    """Stream messages to a WebSocket Server origin over many concurrent connections.
+
+    Args:
+        url (:obj:`str`): URL of the origin, e.g. ``ws://host:port``.
+        application_id (:obj:`str`): Application ID sent in the :py:const:`APPLICATION_ID_HEADER` header.
+        connections (:obj:`int`): Number of concurrent connections.
+        messages_per_connection (:obj:`int`): Messages sent over every connection.
+        message_size (:obj:`int`, optional): Size of the payload of a message.
+            Default: :py:const:`DEFAULT_MESSAGE_SIZE`
+        messages_per_second (:obj:`float`, optional): Send rate of every connection. Default: ``None`` (unthrottled)
+        connect_concurrency (:obj:`int`, optional): Connections opened at the same time.
+            Default: :py:const:`DEFAULT_CONNECT_CONCURRENCY`
+    """
+    def __init__(self, url, application_id, connections, messages_per_connection, message_size=DEFAULT_MESSAGE_SIZE,
+                 messages_per_second=None, connect_concurrency=DEFAULT_CONNECT_CONCURRENCY):
+        self.url = url
+        self.application_id = application_id
+        self.connections = connections
+        self.messages_per_connection = messages_per_connection
+        self.message_size = message_size
+        self.messages_per_second = messages_per_second
+        self.connect_concurrency = connect_concurrency
+
+    @property
+    def number_of_messages(self):
+        return self.connections * self.messages_per_connection
+
+    def run(self):
+        """Open all connections and send all messages.
+
+        Runs its own event loop, so it can be called from a thread while the test waits on the pipeline.
+
+        Returns:
+            A :py:class:`WebSocketLoadResult`.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._run())
+        finally:
+            loop.close()
+
+    async def _run(self):
+        state = dict(messages=0, bytes=0, errors=Counter(), latency=LatencySamples())
+        connect_semaphore = asyncio.Semaphore(self.connect_concurrency)
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector,
+                                         headers={APPLICATION_ID_HEADER: self.application_id}) as session:
+            start = perf_counter()
+            outcomes = await asyncio.gather(*(self._send(session, index, connect_semaphore, state)
+                                              for index in range(self.connections)),
+                                            return_exceptions=True)
+            seconds = perf_counter() - start
+
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                state['errors'][type(outcome).__name__] += 1
+        result = WebSocketLoadResult(connections=self.connections,
+                                     failed_connections=sum(state['errors'].values()),
+                                     messages=state['messages'],
+                                     bytes=state['bytes'],
+                                     seconds=seconds,
+                                     messages_per_second=state['messages'] / seconds,
+                                     errors=dict(state['errors']),
+                                     send_latency=state['latency'].summary())
+        logger.info('Sent %s messages over %s connections in %.2f s (%.0f messages/sec, %s failed connections)',
+                    result.messages, self.connections, seconds, result.messages_per_second, result.failed_connections)
+        return result
+
+    async def _send(self, session, index, connect_semaphore, state):
+        async with connect_semaphore:
+            websocket = await session.ws_connect(self.url)
+        try:
+            payload = 'x' * self.message_size
+            start = perf_counter()
+            for sequence in range(self.messages_per_connection):
+                if self.messages_per_second:
+                    delay = start + sequence / self.messages_per_second - perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                message = json.dumps(dict(connection=index, seq=sequence, sent_ms=int(time.time() * 1000),
+                                          payload=payload))
+                sent = perf_counter()
+                await websocket.send_str(message)
+                state['latency'].add(perf_counter() - sent)
+                state['messages'] += 1
+                state['bytes'] += len(message)
+        finally:
+            await websocket.close()
+
+
+class WebSocketSink:
+    """Websocket server counting received JSON messages, running on its own event loop thread.
+
+    Messages may hold several newline-separated records; records with a ``sent_ms`` field (see
+    :py:const:`SENT_TIME_SCRIPT`) add a latency sample.
+
+    Args:
+        port (:obj:`int`): Port to listen on.
+        host (:obj:`str`, optional): Interface to listen on. Default: ``'0.0.0.0'``
+    """
+    def __init__(self, port, host='0.0.0.0'):
+        self.port = port
+        self.host = host
+        self._lock = threading.Lock()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._reset_state()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, name='websocket-sink', daemon=True)
+        self._thread.start()
+        if not started.wait(DEFAULT_SINK_STARTUP_TIMEOUT_SEC):
+            raise TimeoutError(f'Websocket sink did not start listening on port {self.port}')
+        logger.info('Websocket sink listening on %s:%s', self.host, self.port)
+
+    def stop(self):
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        """Get what was received since the sink started or was last reset, and start counting anew.
+
+        Returns:
+            A :py:class:`WebSocketSinkResult`.
+        """
+        with self._lock:
+            state = self._state
+            self._reset_state()
+        seconds = (state['last'] - state['first']) if state['first'] is not None else 0
+        return WebSocketSinkResult(connections=state['connections'],
+                                   messages=state['messages'],
+                                   records=state['records'],
+                                   bytes=state['bytes'],
+                                   seconds=seconds,
+                                   messages_per_second=state['messages'] / seconds if seconds else 0,
+                                   latency=state['latency'].summary())
+
+    def _reset_state(self):
+        self._state = dict(connections=0, messages=0, records=0, bytes=0, first=None, last=None,
+                           latency=LatencySamples())
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def _handle(self, request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        with self._lock:
+            self._state['connections'] += 1
+        async for message in websocket:
+            if message.type == aiohttp.WSMsgType.TEXT:
+                self._receive(message.data)
+            elif message.type == aiohttp.WSMsgType.BINARY:
+                self._receive(message.data.decode())
+        return websocket
+
+    def _receive(self, data):
+        now = perf_counter()
+        now_ms = time.time() * 1000
+        records = [json.loads(line) for line in data.splitlines() if line.strip()]
+        with self._lock:
+            state = self._state
+            if state['first'] is None:
+                state['first'] = now
+            state['last'] = now
+            state['messages'] += 1
+            state['records'] += len(records)
+            state['bytes'] += len(data)
+            for record in records:
+                if isinstance(record, dict) and 'sent_ms' in record:
+                    state['latency'].add(max(now_ms - record['sent_ms'], 0) / 1000)
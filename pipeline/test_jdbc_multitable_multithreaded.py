@@ -25,6 +25,8 @@ from streamsets.sdk.utils import Version
 from streamsets.testframework.utils import get_random_string
 from streamsets.testframework.markers import database, sdc_min_version
 
+from stage.utils.data_seeding import seed_table
+
 logger = logging.getLogger(__name__)
 
 
@@ -79,10 +81,10 @@ def setup_tables(database, src_tables, target_tables, event_table_name):
         if not src_table.use_primary_key:
             # shuffle the first col values for non-incremental mode
             random.shuffle(row_ids)
-        for src_row_id in row_ids:  # some databases (like MySQL) will start from 1
-            insert_data = {FIRST_COLUMN: src_row_id,
-                           OTHER_COLUMN: get_random_string(string.ascii_lowercase, 20)}
-            db_engine.execute(table.insert(), [insert_data])
+        # some databases (like MySQL) will start from 1
+        seed_table(database, table, ({FIRST_COLUMN: src_row_id,
+                                      OTHER_COLUMN: get_random_string(string.ascii_lowercase, 20)}
+                                     for src_row_id in row_ids))
 
     for target_table in target_tables:
         first_col = sqlalchemy.Column(FIRST_COLUMN, sqlalchemy.Integer, primary_key=target_table.use_primary_key, autoincrement=False)
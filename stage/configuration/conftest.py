@@ -1,14 +1,6 @@
-import textwrap
-
 import pytest
-from streamsets.sdk.models import Configuration
 
-FILE_WRITER_SCRIPT = """
-    file_contents = '''{file_contents}'''
-    for record in records:
-        with open('{filepath}', 'w') as f:
-            f.write(file_contents.decode('utf8').encode('{encoding}'))
-"""
+from stage.utils.file_staging import FileStager
 
 
 @pytest.fixture(scope='module')
@@ -19,7 +11,13 @@ def sdc_common_hook():
 
 
 @pytest.fixture
-def file_writer(sdc_executor):
+def file_stager(sdc_executor):
+    """:py:class:`stage.utils.file_staging.FileStager` for the SDC under test."""
+    return FileStager(sdc_executor)
+
+
+@pytest.fixture
+def file_writer(file_stager):
     """Writes a file to SDC's local FS.
 
     Args:
@@ -28,40 +26,12 @@ def file_writer(sdc_executor):
         encoding (:obj:`str`, optional): The file encoding. Default: ``'utf8'``
     """
     def file_writer_(filepath, file_contents, encoding='utf8'):
-        builder = sdc_executor.get_pipeline_builder()
-        dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
-        dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='noop', stop_after_first_batch=True)
-        jython_evaluator = builder.add_stage('Jython Evaluator')
-        jython_evaluator.script = textwrap.dedent(FILE_WRITER_SCRIPT).format(filepath=str(filepath),
-                                                                             file_contents=file_contents,
-                                                                             encoding=encoding)
-        trash = builder.add_stage('Trash')
-        dev_raw_data_source >> jython_evaluator >> trash
-        pipeline = builder.build('File writer pipeline')
-
-        sdc_executor.add_pipeline(pipeline)
-        sdc_executor.start_pipeline(pipeline).wait_for_finished()
-        sdc_executor.remove_pipeline(pipeline)
+        file_stager.write_file(str(filepath), file_contents, encoding=encoding)
     return file_writer_
 
 
 @pytest.fixture
-def shell_executor(sdc_executor):
+def shell_executor(file_stager):
     def shell_executor_(script, environment_variables=None):
-        builder = sdc_executor.get_pipeline_builder()
-        dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
-        dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='noop', stop_after_first_batch=True)
-        shell = builder.add_stage('Shell')
-        shell.set_attributes(script=script,
-                             environment_variables=(Configuration(**environment_variables)._data
-                                                    if environment_variables
-                                                    else []))
-        trash = builder.add_stage('Trash')
-        dev_raw_data_source >> [trash, shell]
-        pipeline = builder.build('Shell executor pipeline')
-
-        sdc_executor.add_pipeline(pipeline)
-        sdc_executor.start_pipeline(pipeline).wait_for_finished()
-        sdc_executor.remove_pipeline(pipeline)
+        file_stager.run_shell(script, environment_variables)
     return shell_executor_
-
@@ -0,0 +1,55 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from stage.utils.brokers.amqp_broker import AmqpBroker
+from stage.utils.brokers.mqtt_broker import MqttBroker
+from stage.utils.brokers.redis_server import RedisServer
+from stage.utils.pipeline_pool import PipelinePool
+
+
+@pytest.fixture(scope='module')
+def pipeline_pool(sdc_executor):
+    """:py:class:`stage.utils.pipeline_pool.PipelinePool` of the module's Data Collector; its pipelines are removed
+    at the end of the module.
+    """
+    pool = PipelinePool(sdc_executor)
+    yield pool
+    pool.clear()
+
+
+# The broker stand-ins are named apart from the test framework's environment fixtures (``mqtt_broker``, ``redis``
+# and ``rabbitmq``), which they'd otherwise override for every test.
+
+@pytest.fixture
+def local_mqtt_broker():
+    """:py:class:`stage.utils.brokers.mqtt_broker.MqttBroker` stand-in for the ``mqtt_broker`` environment."""
+    with MqttBroker() as broker:
+        yield broker
+        broker.destroy()
+
+
+@pytest.fixture
+def local_redis():
+    """:py:class:`stage.utils.brokers.redis_server.RedisServer` stand-in for the ``redis`` environment."""
+    with RedisServer() as server:
+        yield server
+
+
+@pytest.fixture
+def local_rabbitmq():
+    """:py:class:`stage.utils.brokers.amqp_broker.AmqpBroker` stand-in for the ``rabbitmq`` environment."""
+    with AmqpBroker() as broker:
+        yield broker
@@ -694,7 +694,7 @@ def test_directory_origin_custom_csv_empty_line_file(sdc_builder, sdc_executor,
 
 @sdc_min_version('3.0.0.0')
 @pytest.mark.parametrize('batch_size', [3,4,5,6])
-def test_directory_origin_csv_record_overrun_on_batch_boundary(sdc_builder, sdc_executor, batch_size):
+def test_directory_origin_csv_record_overrun_on_batch_boundary(sdc_builder, sdc_executor, pipeline_pool, batch_size):
     """ Test Directory Origin in Delimited data format. The long delimited record in [2,4,5,8,9]th in the file
     the long delimited record should be ignored in the batch
 
@@ -702,6 +702,8 @@ def test_directory_origin_csv_record_overrun_on_batch_boundary(sdc_builder, sdc_
 
         directory >> trash
 
+    The pipeline only differs in the directory it reads, which is passed as a runtime parameter, so that all batch
+    sizes run the same pipeline from the pool.
     """
     tmp_directory = os.path.join(tempfile.gettempdir(), get_random_string(string.ascii_letters, 10))
     csv_records = setup_long_dilimited_file(sdc_executor, tmp_directory)
@@ -711,7 +713,7 @@ def test_directory_origin_csv_record_overrun_on_batch_boundary(sdc_builder, sdc_
     directory = pipeline_builder.add_stage('Directory', type='origin')
     directory.set_attributes(data_format='DELIMITED',
                              file_name_pattern='sdc*', file_name_pattern_mode='GLOB',
-                             file_post_processing='DELETE', files_directory=tmp_directory,
+                             file_post_processing='DELETE', files_directory='${FILES_DIRECTORY}',
                              max_record_length_in_chars=10,
                              process_subdirectories=True, read_order='TIMESTAMP')
 
@@ -720,9 +722,11 @@ def test_directory_origin_csv_record_overrun_on_batch_boundary(sdc_builder, sdc_
 
     directory >> trash
     directory_pipeline = pipeline_builder.build()
-    sdc_executor.add_pipeline(directory_pipeline)
+    directory_pipeline.add_parameters(FILES_DIRECTORY=tempfile.gettempdir())
+    directory_pipeline = pipeline_pool.get(directory_pipeline)
 
-    snapshot = sdc_executor.capture_snapshot(directory_pipeline, start_pipeline=True, batch_size=batch_size).snapshot
+    snapshot = sdc_executor.capture_snapshot(directory_pipeline, start_pipeline=True, batch_size=batch_size,
+                                             runtime_parameters={'FILES_DIRECTORY': tmp_directory}).snapshot
     sdc_executor.stop_pipeline(directory_pipeline)
 
     # assert all the data captured have the same raw_data
@@ -38,7 +38,7 @@ logger = logging.getLogger(__name__)
 #
 
 @pytest.fixture(scope='module')
-def http_server_pipeline(sdc_builder, sdc_executor):
+def http_server_pipeline(sdc_builder, pipeline_pool):
     """HTTP Server pipeline fixture."""
     pipeline_builder = sdc_builder.get_pipeline_builder()
 
@@ -67,8 +67,7 @@ def http_server_pipeline(sdc_builder, sdc_executor):
                             APPLICATION_ID='test',
                             NEW_FIELD_NAME='javscriptField',
                             NEW_FIELD_VALUE='5000')
-
-    sdc_executor.add_pipeline(pipeline)
+    pipeline = pipeline_pool.get(pipeline)
 
     # Yield a namedtuple so that we can access instance names of the stages within the test.
     yield namedtuple('Pipeline', ['pipeline', 'http_server', 'javascript_evaluator'])(pipeline,
@@ -77,7 +76,7 @@ def http_server_pipeline(sdc_builder, sdc_executor):
 
 
 @pytest.fixture(scope='module')
-def http_client_pipeline(sdc_builder, sdc_executor):
+def http_client_pipeline(sdc_builder, pipeline_pool):
     pipeline_builder = sdc_builder.get_pipeline_builder()
 
     dev_raw_data_source = pipeline_builder.add_stage('Dev Raw Data Source')
@@ -96,8 +95,7 @@ def http_client_pipeline(sdc_builder, sdc_executor):
     pipeline.add_parameters(RAW_DATA='{"f1": "abc"}{"f1": "xyz"}',
                             RESOURCE_URL='http://localhost:8000',
                             APPLICATION_ID='test')
-
-    sdc_executor.add_pipeline(pipeline)
+    pipeline = pipeline_pool.get(pipeline)
 
     yield namedtuple('Pipeline', ['pipeline',
                                   'dev_raw_data_source',
@@ -18,6 +18,8 @@ import textwrap
 
 import pytest
 
+from stage.utils.record_tables import RecordTable, assert_joined
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -101,10 +103,10 @@ def test_jython_evaluator(sdc_builder, sdc_executor):
     snapshot = sdc_executor.capture_snapshot(pipeline, start_pipeline=True).snapshot
     sdc_executor.stop_pipeline(pipeline)
 
-    output_records = snapshot[jython_evaluator.instance_name].output  # is a list of output records
-    # search for a record whose 'name' is raw_company_1['name'] and assert new attribute ('office_space') is created
-    # with expected boolean value (where 'floors' > 2)
-    record_1 = next(record for record in output_records if record.field['name'] == raw_company_1['name'])
-    assert record_1.field['office_space'] == (raw_company_1['floors'] > 2)
-    record_2 = next(record for record in output_records if record.field['name'] == raw_company_2['name'])
-    assert record_2.field['office_space'] == (raw_company_2['floors'] > 2)
+    output = RecordTable.from_records(snapshot[jython_evaluator.instance_name].output, ['name', 'office_space'])
+    # join records on 'name' and assert new attribute ('office_space') is created with expected boolean value
+    # (where 'floors' > 2)
+    assert_joined(output,
+                  [dict(name=company['name'], office_space=company['floors'] > 2)
+                   for company in (raw_company_1, raw_company_2, raw_company_3, raw_company_4)],
+                  key='name')
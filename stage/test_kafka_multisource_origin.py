@@ -27,6 +27,8 @@ logger.setLevel(logging.DEBUG)
 
 # Specify a port for SDC RPC stages to use.
 SNAPSHOT_TIMEOUT_SEC = 120
+# Gap between the timestamps of the two batches of messages sent by produce_kafka_messages_in_different_timestamp.
+TIMESTAMP_GAP_MS = 10000
 
 @pytest.fixture(scope='module')
 def sdc_common_hook():
@@ -58,8 +60,8 @@ def get_kafka_multitopic_consumer_stage(pipeline_builder, cluster):
     return kafka_multitopic_consumer
 
 
-def produce_kafka_messages(topic, cluster, message, data_format):
-    """Send basic messages to Kafka"""
+def produce_kafka_messages(topic, cluster, message, data_format, timestamp_ms=None):
+    """Send basic messages to Kafka, timestamped by the producer unless timestamp_ms is given"""
     # Get Kafka producer
     producer = cluster.kafka.producer()
 
@@ -67,31 +69,32 @@ def produce_kafka_messages(topic, cluster, message, data_format):
 
     # Write records into Kafka depending on the data_format.
     if data_format in basic_data_formats:
-        producer.send(topic, message)
+        producer.send(topic, message, timestamp_ms=timestamp_ms)
 
     producer.flush()
 
 
 def produce_kafka_messages_in_different_timestamp(topic, cluster, messages, data_format, num_messages_to_send_first):
-    """send num_messages_to_send_first messages, sleep 30 seconds, then send the rest of the messages and return the
-    timestamp value after the 30 seconds sleep (<= timestamp of first message in second batch and >= last message in
-    first batch)
+    """send num_messages_to_send_first messages timestamped TIMESTAMP_GAP_MS before the rest of the messages and
+    return a timestamp value in between (<= timestamp of first message in second batch and > last message in first
+    batch). The producer sets the timestamps, which topics keep with Kafka's default CreateTime timestamp type, so
+    nothing waits for the clock to move on.
     """
     timestamp = -1
     if num_messages_to_send_first < len(messages):
+        second_batch_timestamp = int(time.time() * 1000)
+        first_batch_timestamp = second_batch_timestamp - TIMESTAMP_GAP_MS
+        timestamp = second_batch_timestamp - TIMESTAMP_GAP_MS // 2
+
         # Send first batch of messages.
         for i in range(0, num_messages_to_send_first):
             message = messages[i]
-            produce_kafka_messages(topic, cluster, message.encode(), data_format)
-
-        # Sleep for 30 seconds.
-        time.sleep(30)
-        timestamp = int(time.time() * 1000)
+            produce_kafka_messages(topic, cluster, message.encode(), data_format, timestamp_ms=first_batch_timestamp)
 
         # Send second batch of messages.
         for j in range(num_messages_to_send_first, len(messages)):
             message = messages[j]
-            produce_kafka_messages(topic, cluster, message.encode(), data_format)
+            produce_kafka_messages(topic, cluster, message.encode(), data_format, timestamp_ms=second_batch_timestamp)
 
     return timestamp
 
@@ -13,19 +13,18 @@
 # limitations under the License.
 
 import base64
-import io
 import json
 import logging
 import string
 
-import avro
 import pytest
-from avro.datafile import DataFileWriter
 from streamsets.sdk.utils import Version
 from streamsets.testframework.environments.cloudera import ClouderaManagerCluster
 from streamsets.testframework.markers import cluster
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.encoding import encode
+
 logger = logging.getLogger(__name__)
 
 # Specify a port for SDC RPC stages to use.
@@ -851,24 +850,8 @@ def produce_kafka_messages(topic, cluster, message, data_format):
     elif data_format == 'WITH_KEY':
         producer.send(topic, message, key=get_random_string(string.ascii_letters, 10).encode())
 
-    elif data_format == 'AVRO':
-        writer = avro.io.DatumWriter(avro.schema.Parse(json.dumps(SCHEMA)))
-        bytes_writer = io.BytesIO()
-        encoder = avro.io.BinaryEncoder(bytes_writer)
-        writer.write(message, encoder)
-        raw_bytes = bytes_writer.getvalue()
-        producer.send(topic, raw_bytes)
-
-    elif data_format == 'AVRO_WITHOUT_SCHEMA':
-        bytes_writer = io.BytesIO()
-        datum_writer = avro.io.DatumWriter(avro.schema.Parse(json.dumps(SCHEMA)))
-        data_file_writer = DataFileWriter(writer=bytes_writer, datum_writer=datum_writer,
-                                          writer_schema=avro.schema.Parse(json.dumps(SCHEMA)))
-        data_file_writer.append(message)
-        data_file_writer.flush()
-        raw_bytes = bytes_writer.getvalue()
-        data_file_writer.close()
-        producer.send(topic, raw_bytes)
+    elif data_format in ('AVRO', 'AVRO_WITHOUT_SCHEMA'):
+        producer.send(topic, encode(message, data_format, schema=SCHEMA))
 
     producer.flush()
 
@@ -13,25 +13,26 @@
 # limitations under the License.
 
 import base64
-import io
 import json
 import logging
 import string
 import time
 
-import avro
 import pytest
-from avro.datafile import DataFileWriter
 
 from streamsets.testframework.environments.cloudera import ClouderaManagerCluster
 from streamsets.testframework.markers import cluster, sdc_min_version
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.encoding import encode, protobuf_available
+
 logger = logging.getLogger(__name__)
 
 # Specify a port for SDC RPC stages to use.
 SDC_RPC_PORT = 20000
 SNAPSHOT_TIMEOUT_SEC = 120
+# Gap between the timestamps of the two batches of messages sent by produce_kafka_messages_in_different_timestamp.
+TIMESTAMP_GAP_MS = 10000
 
 # Protobuf file path relative to $SDC_RESOURCES.
 PROTOBUF_FILE_PATH = 'resources/protobuf/addressbook.desc'
@@ -765,34 +766,41 @@ def test_kafka_origin_log_record(sdc_builder, sdc_executor, cluster):
 
 
 def produce_kafka_messages_protobuf(topic, sdc_builder, sdc_executor, cluster, message):
+    """Send a single length-delimited Contact protobuf message, encoded from a JSON object, to Kafka.
+
+    Without a protobuf package on the host that can load addressbook_pb2, SDC encodes it with a Kafka Producer
+    pipeline that stops after its first batch, i.e. that one message.
+    """
+    if protobuf_available():
+        producer = cluster.kafka.producer()
+        producer.send(topic, encode(json.loads(message), 'PROTOBUF', message_type='Contact', delimited=True))
+        producer.flush()
+        return
+
     # Build the Kafka destination pipeline.
     builder = sdc_builder.get_pipeline_builder()
     builder.add_error_stage('Discard')
 
     dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
-    dev_raw_data_source.data_format = 'JSON'
-    dev_raw_data_source.raw_data = message
+    dev_raw_data_source.set_attributes(data_format='JSON', raw_data=message, stop_after_first_batch=True)
 
     kafka_destination = builder.add_stage(name='com_streamsets_pipeline_stage_destination_kafka_KafkaDTarget',
                                           library=cluster.kafka.standalone_stage_lib)
     kafka_destination.topic = topic
     kafka_destination.set_attributes(data_format='PROTOBUF', message_type='Contact',
-                                     protobuf_descriptor_file=PROTOBUF_FILE_PATH, delimited_messages=False)
+                                     protobuf_descriptor_file=PROTOBUF_FILE_PATH, delimited_messages=True)
 
     dev_raw_data_source >> kafka_destination
     kafka_destination_pipeline = builder.build(
         title='Kafka Origin PROTOBUF pipeline(Producer)').configure_for_environment(cluster)
 
-    kafka_destination_pipeline.configuration['rateLimit'] = 1
-
     sdc_executor.add_pipeline(kafka_destination_pipeline)
-    sdc_executor.start_pipeline(kafka_destination_pipeline).wait_for_pipeline_batch_count(10)
+    sdc_executor.start_pipeline(kafka_destination_pipeline).wait_for_finished()
 
-    sdc_executor.stop_pipeline(kafka_destination_pipeline)
     history = sdc_executor.get_pipeline_history(kafka_destination_pipeline)
     msgs_sent_count = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
 
-    assert msgs_sent_count != 0
+    assert msgs_sent_count == 1
 
 
 @cluster('cdh', 'kafka')
@@ -870,8 +878,8 @@ def get_kafka_consumer_stage_since_sdc_3_6_0(pipeline_builder, cluster):
     return kafka_consumer
 
 
-def produce_kafka_messages(topic, cluster, message, data_format):
-    """Send basic messages to Kafka"""
+def produce_kafka_messages(topic, cluster, message, data_format, timestamp_ms=None):
+    """Send basic messages to Kafka, timestamped by the producer unless timestamp_ms is given"""
     # Get Kafka producer
     producer = cluster.kafka.producer()
 
@@ -879,53 +887,39 @@ def produce_kafka_messages(topic, cluster, message, data_format):
 
     # Write records into Kafka depending on the data_format.
     if data_format in basic_data_formats:
-        producer.send(topic, message)
+        producer.send(topic, message, timestamp_ms=timestamp_ms)
 
     elif data_format == 'WITH_KEY':
-        producer.send(topic, message, key=get_random_string(string.ascii_letters, 10).encode())
-
-    elif data_format == 'AVRO':
-        writer = avro.io.DatumWriter(avro.schema.Parse(json.dumps(SCHEMA)))
-        bytes_writer = io.BytesIO()
-        encoder = avro.io.BinaryEncoder(bytes_writer)
-        writer.write(message, encoder)
-        raw_bytes = bytes_writer.getvalue()
-        producer.send(topic, raw_bytes)
-
-    elif data_format == 'AVRO_WITHOUT_SCHEMA':
-        bytes_writer = io.BytesIO()
-        datum_writer = avro.io.DatumWriter(avro.schema.Parse(json.dumps(SCHEMA)))
-        data_file_writer = DataFileWriter(writer=bytes_writer, datum_writer=datum_writer,
-                                          writer_schema=avro.schema.Parse(json.dumps(SCHEMA)))
-        data_file_writer.append(message)
-        data_file_writer.flush()
-        raw_bytes = bytes_writer.getvalue()
-        data_file_writer.close()
-        producer.send(topic, raw_bytes)
+        producer.send(topic, message, key=get_random_string(string.ascii_letters, 10).encode(),
+                      timestamp_ms=timestamp_ms)
+
+    elif data_format in ('AVRO', 'AVRO_WITHOUT_SCHEMA'):
+        producer.send(topic, encode(message, data_format, schema=SCHEMA), timestamp_ms=timestamp_ms)
 
     producer.flush()
 
 
 def produce_kafka_messages_in_different_timestamp(topic, cluster, messages, data_format, num_messages_to_send_first):
-    """send num_messages_to_send_first messages, sleep 30 seconds, then send the rest of the messages and return the
-    timestamp value after the 30 seconds sleep (<= timestamp of first message in second batch and >= last message in
-    first batch)
+    """send num_messages_to_send_first messages timestamped TIMESTAMP_GAP_MS before the rest of the messages and
+    return a timestamp value in between (<= timestamp of first message in second batch and > last message in first
+    batch). The producer sets the timestamps, which topics keep with Kafka's default CreateTime timestamp type, so
+    nothing waits for the clock to move on.
     """
     timestamp = -1
     if num_messages_to_send_first < len(messages):
+        second_batch_timestamp = int(time.time() * 1000)
+        first_batch_timestamp = second_batch_timestamp - TIMESTAMP_GAP_MS
+        timestamp = second_batch_timestamp - TIMESTAMP_GAP_MS // 2
+
         # Send first batch of messages.
         for i in range(0, num_messages_to_send_first):
             message = messages[i]
-            produce_kafka_messages(topic, cluster, message.encode(), data_format)
-
-        # Sleep for 30 seconds.
-        time.sleep(30)
-        timestamp = int(time.time() * 1000)
+            produce_kafka_messages(topic, cluster, message.encode(), data_format, timestamp_ms=first_batch_timestamp)
 
         # Send second batch of messages.
         for j in range(num_messages_to_send_first, len(messages)):
             message = messages[j]
-            produce_kafka_messages(topic, cluster, message.encode(), data_format)
+            produce_kafka_messages(topic, cluster, message.encode(), data_format, timestamp_ms=second_batch_timestamp)
 
     return timestamp
 
@@ -17,6 +17,8 @@ import time
 
 from streamsets.testframework.markers import mqtt
 
+from stage.utils.waiting import wait_for
+
 logger = logging.getLogger(__name__)
 
 
@@ -133,3 +135,72 @@ def test_mqtt_to_trash(sdc_builder, sdc_executor, mqtt_broker):
         assert len(expected_messages) == 0
     finally:
         mqtt_broker.destroy()
+
+
+def test_raw_to_mqtt_local_broker(sdc_builder, sdc_executor, local_mqtt_broker):
+    """Test for the MQTT destination stage against the in-process broker stand-in, which needs no ``mqtt_broker``
+    environment. The pipeline looks like:
+
+        dev_raw_data_source >> mqtt_target
+    """
+    data_topic = 'testframework_mqtt_topic'
+    raw_str = 'dummy_value'
+    local_mqtt_broker.initialize(initial_topics=[data_topic])
+
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    dev_raw_data_source = pipeline_builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='TEXT', raw_data=raw_str)
+    mqtt_target = pipeline_builder.add_stage('MQTT Publisher')
+    mqtt_target.configuration.update({'publisherConf.topic': data_topic,
+                                      'publisherConf.dataFormat': 'TEXT'})
+
+    dev_raw_data_source >> mqtt_target
+    pipeline = local_mqtt_broker.configure_pipeline(pipeline_builder.build())
+    sdc_executor.add_pipeline(pipeline)
+
+    snapshot = sdc_executor.capture_snapshot(pipeline, start_pipeline=True).snapshot
+    sdc_executor.stop_pipeline(pipeline)
+
+    output_records = snapshot[dev_raw_data_source.instance_name].output
+    pipeline_msgs = local_mqtt_broker.get_messages(data_topic, num=len(output_records))
+    assert [msg.payload.decode().rstrip() for msg in pipeline_msgs] == [raw_str] * len(output_records)
+    assert all(msg.topic == data_topic for msg in pipeline_msgs)
+
+
+def test_mqtt_to_trash_local_broker(sdc_builder, sdc_executor, local_mqtt_broker):
+    """Test for the MQTT origin stage against the in-process broker stand-in, which needs no ``mqtt_broker``
+    environment. The pipeline looks like:
+
+        mqtt_source >> trash
+    """
+    data_topic = 'mqtt_subscriber_topic'
+
+    pipeline_builder = sdc_builder.get_pipeline_builder()
+    mqtt_source = pipeline_builder.add_stage('MQTT Subscriber')
+    mqtt_source.configuration.update({'subscriberConf.dataFormat': 'TEXT',
+                                      'subscriberConf.topicFilters': [data_topic]})
+    trash = pipeline_builder.add_stage('Trash')
+
+    mqtt_source >> trash
+    pipeline = local_mqtt_broker.configure_pipeline(pipeline_builder.build())
+    sdc_executor.add_pipeline(pipeline)
+
+    expected_messages = [f'Message {i}' for i in range(10)]
+    # the MQTT origin produces a single batch for each message it receives
+    running_snapshot = sdc_executor.capture_snapshot(pipeline, start_pipeline=True, batches=len(expected_messages),
+                                                     wait=False)
+    try:
+        # a message published before the origin subscribes reaches nobody, so the first one is published until the
+        # origin gets it
+        wait_for(lambda: local_mqtt_broker.publish_message(topic=data_topic, payload=expected_messages[0]),
+                 description=f'MQTT Subscriber to subscribe to {data_topic}')
+        for expected_message in expected_messages[1:]:
+            assert local_mqtt_broker.publish_message(topic=data_topic, payload=expected_message) == 1
+        snapshot = running_snapshot.wait_for_finished().snapshot
+    finally:
+        sdc_executor.stop_pipeline(pipeline)
+
+    output_records = [record.field['text'].value
+                      for batch in snapshot.snapshot_batches
+                      for record in batch[mqtt_source.instance_name].output]
+    assert sorted(output_records) == sorted(expected_messages)
@@ -15,8 +15,7 @@
 import logging
 import string
 from collections import namedtuple
-from datetime import datetime
-from time import sleep
+from datetime import datetime, timedelta
 
 import pytest
 import sqlalchemy
@@ -25,11 +24,16 @@ from streamsets.sdk.utils import Version
 from streamsets.testframework.markers import database, sdc_min_version
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.waiting import wait_for
+
 logger = logging.getLogger(__name__)
 
 PRIMARY_KEY = 'ID'
 OTHER_COLUMN = 'NAME'
 BATCH_SIZE = 10  # Max limit imposed by SDC for snapshots
+WAIT_UNTIL_TIME_MAX_INTERVAL_SEC = 0.25
+# SYSDATE has a resolution of one second, so the local clock has to go a second past it.
+WAIT_UNTIL_TIME_MARGIN = timedelta(seconds=1)
 Operations = namedtuple('Operations', ['rows', 'cdc_op_types', 'sdc_op_types', 'change_count'])
 
 
@@ -83,9 +87,10 @@ def get_current_oracle_time(connection):
 
 
 def wait_until_time(time):
-    current_time = datetime.utcnow()
-    if current_time < time:
-        sleep((time - current_time).total_seconds() + 1)
+    time += WAIT_UNTIL_TIME_MARGIN
+    wait_for(lambda: datetime.utcnow() > time, max_interval_sec=WAIT_UNTIL_TIME_MAX_INTERVAL_SEC,
+             timeout_sec=max((time - datetime.utcnow()).total_seconds(), 0) + WAIT_UNTIL_TIME_MAX_INTERVAL_SEC,
+             description=f'local time to reach {time}')
 
 
 @sdc_min_version('3.6.0')
@@ -466,7 +471,9 @@ def test_overlapping_transactions(sdc_builder, sdc_executor, database, buffer_lo
         connection2.execute(table.insert(), rows_c2)
 
         # Ensure timestamp changes
-        sleep(5)
+        long_txn_time = get_current_oracle_time(connection=connection)
+        wait_for(lambda: get_current_oracle_time(connection=connection) > long_txn_time,
+                 description='Oracle time to change')
 
         # Insert data into txn 2, and commit immediately
         rows_c1 = [{'ID': 200, 'NAME': 'TEST_SHORT_TXN'} for _ in range(0, 10)]
@@ -138,3 +138,93 @@ def test_rabbitmq_producer_target(sdc_builder, sdc_executor, rabbitmq):
     logger.debug('Number of messages received from RabbitMQ = %d', (len(msgs_received)))
 
     assert msgs_received == [raw_str] * msgs_sent_count
+
+
+def test_rabbitmq_consumer_local_broker(sdc_builder, sdc_executor, local_rabbitmq):
+    """Test for RabbitMQ consumer origin stage against the in-process AMQP broker stand-in, which needs no
+    ``rabbitmq`` environment. The pipeline looks like:
+
+        rabbitmq_consumer >> trash
+    """
+    name = get_random_string(string.ascii_letters, 10)
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+    rabbitmq_consumer = builder.add_stage('RabbitMQ Consumer').set_attributes(name=name,
+                                                                              data_format='TEXT',
+                                                                              durable=True,
+                                                                              auto_delete=False,
+                                                                              bindings=[])
+    trash = builder.add_stage('Trash')
+
+    rabbitmq_consumer >> trash
+    pipeline = local_rabbitmq.configure_pipeline(builder.build(title='RabbitMQ Consumer local pipeline'))
+    sdc_executor.add_pipeline(pipeline)
+
+    expected_messages = [f'Message {i}' for i in range(10)]
+    connection = local_rabbitmq.blocking_connection
+    channel = connection.channel()
+    try:
+        channel.queue_declare(queue=name, durable=True, exclusive=False, auto_delete=False)
+        channel.confirm_delivery()
+        for expected_message in expected_messages:
+            # with publisher confirms, a message the broker doesn't take raises
+            channel.basic_publish(exchange='',
+                                  routing_key=name,
+                                  body=expected_message,
+                                  properties=pika.BasicProperties(content_type='text/plain', delivery_mode=1),
+                                  mandatory=True)
+    finally:
+        channel.close()
+        connection.close()
+
+    snapshot = sdc_executor.capture_snapshot(pipeline, start_pipeline=True).snapshot
+    sdc_executor.stop_pipeline(pipeline)
+    output_records = [record.field['text'].value for record in snapshot[rabbitmq_consumer.instance_name].output]
+
+    assert sorted(output_records) == sorted(expected_messages)
+
+
+def test_rabbitmq_producer_target_local_broker(sdc_builder, sdc_executor, local_rabbitmq):
+    """Test for RabbitMQ producer target stage against the in-process AMQP broker stand-in, which needs no
+    ``rabbitmq`` environment. The pipeline looks like:
+
+        dev_raw_data_source >> rabbitmq_producer
+    """
+    name = get_random_string(string.ascii_letters, 10)
+    exchange_name = get_random_string(string.ascii_letters, 10)
+    raw_str = 'Hello World!'
+
+    builder = sdc_builder.get_pipeline_builder()
+    builder.add_error_stage('Discard')
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source').set_attributes(data_format='TEXT',
+                                                                                  raw_data=raw_str)
+    rabbitmq_producer = builder.add_stage('RabbitMQ Producer')
+    rabbitmq_producer.set_attributes(name=name, data_format='TEXT',
+                                     durable=False, auto_delete=False,
+                                     bindings=[dict(name=exchange_name,
+                                                    type='DIRECT',
+                                                    durable=False,
+                                                    autoDelete=True)])
+
+    dev_raw_data_source >> rabbitmq_producer
+    pipeline = local_rabbitmq.configure_pipeline(builder.build(title='RabbitMQ Producer local pipeline'))
+    pipeline.rate_limit = 1
+    sdc_executor.add_pipeline(pipeline)
+
+    sdc_executor.start_pipeline(pipeline).wait_for_pipeline_batch_count(3)
+    sdc_executor.stop_pipeline(pipeline)
+
+    history = sdc_executor.get_pipeline_history(pipeline)
+    msgs_sent_count = history.latest.metrics.counter('pipeline.batchOutputRecords.counter').count
+
+    connection = local_rabbitmq.blocking_connection
+    channel = connection.channel()
+    try:
+        msgs_received = [channel.basic_get(name, True)[2].decode().replace('\n', '')
+                         for _ in range(msgs_sent_count)]
+    finally:
+        channel.close()
+        connection.close()
+
+    assert msgs_received == [raw_str] * msgs_sent_count
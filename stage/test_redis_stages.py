@@ -20,6 +20,8 @@ import string
 from streamsets.testframework.markers import redis
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.waiting import wait_for
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -159,3 +161,71 @@ def test_redis_lookup_processor(sdc_builder, sdc_executor, redis):
     finally:
         # delete our key from Redis
         redis.client.delete(redis_key)
+
+
+def test_redis_origin_local_server(sdc_builder, sdc_executor, local_redis):
+    """Test for Redis origin stage against the in-process Redis stand-in, which needs no ``redis`` environment. The
+    pipeline looks like:
+
+        redis_consumer >> trash
+    """
+    raw_dict = dict(name='Jane Smith', zip_code=27023)
+    raw_data = json.dumps(raw_dict)
+    pattern = get_random_string(string.ascii_letters, 10)
+    channel = f'extra{pattern}extra'
+
+    builder = sdc_builder.get_pipeline_builder()
+    redis_consumer = builder.add_stage('Redis Consumer', type='origin')
+    redis_consumer.set_attributes(data_format='JSON', max_batch_size_in_records=10, pattern=[f'*{pattern}*'])
+    trash = builder.add_stage('Trash')
+
+    redis_consumer >> trash
+    pipeline = local_redis.configure_pipeline(builder.build(title='Redis Consumer local pipeline'))
+    sdc_executor.add_pipeline(pipeline)
+
+    try:
+        sdc_executor.start_pipeline(pipeline)
+        snapshot_command = sdc_executor.capture_snapshot(pipeline, start_pipeline=False, wait=False)
+        # a message published before the consumer subscribes reaches nobody, so the first one is published until the
+        # consumer gets it
+        wait_for(lambda: local_redis.client.publish(channel, raw_data),
+                 description=f'Redis Consumer to subscribe to *{pattern}*')
+        for _ in range(19):  # 20 records will make 2 batches (each of 10)
+            assert local_redis.client.publish(channel, raw_data) == 1
+        snapshot = snapshot_command.wait_for_finished().snapshot
+    finally:
+        sdc_executor.stop_pipeline(pipeline)
+
+    output_records = snapshot[redis_consumer.instance_name].output
+    assert redis_consumer.max_batch_size_in_records == len(output_records)
+    for record in output_records:
+        assert record.field['name'].value == raw_dict['name']
+        assert record.field['zip_code'].value == raw_dict['zip_code']
+
+
+def test_redis_destination_local_server(sdc_builder, sdc_executor, local_redis):
+    """Test for Redis destination stage against the in-process Redis stand-in, which needs no ``redis`` environment.
+    The stand-in has no hashes, so the value is written as a string. The pipeline looks like:
+
+        dev_raw_data_source >> redis_destination
+    """
+    redis_key = get_random_string(string.ascii_letters, 10)
+    raw_dict = dict(city=redis_key, latitude='37.7576948')
+    raw_data = json.dumps(raw_dict)
+
+    builder = sdc_builder.get_pipeline_builder()
+    dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+    dev_raw_data_source.set_attributes(data_format='JSON', raw_data=raw_data)
+    redis_destination = builder.add_stage('Redis', type='destination')
+    redis_destination.set_attributes(mode='BATCH', fields=[{'keyExpr': '/city',
+                                                            'valExpr': '/latitude',
+                                                            'dataType': 'STRING'}])
+
+    dev_raw_data_source >> redis_destination
+    pipeline = local_redis.configure_pipeline(builder.build(title='Redis Destination local pipeline'))
+    sdc_executor.add_pipeline(pipeline)
+
+    sdc_executor.start_pipeline(pipeline).wait_for_pipeline_batch_count(1)
+    sdc_executor.stop_pipeline(pipeline)
+
+    assert local_redis.client.get(redis_key).decode() == raw_dict['latitude']
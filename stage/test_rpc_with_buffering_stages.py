@@ -18,12 +18,14 @@ import string
 
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.sharding import shard_port
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
 # Specify a port for SDC RPC stages to use.
-SDC_RPC_LISTENING_PORT = 20000
+SDC_RPC_LISTENING_PORT = shard_port(20000)
 
 
 def test_sdcrpc_with_buffering_origin_target(sdc_builder, sdc_executor):
@@ -16,13 +16,14 @@ import binascii
 import json
 import logging
 import string
-from time import sleep, time
 
 import pytest
 import sqlalchemy
 from streamsets.testframework.markers import database, sdc_min_version
 from streamsets.testframework.utils import get_random_string
 
+from stage.utils.waiting import wait_for_row_count
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_SCHEMA_NAME = 'dbo'
@@ -87,24 +88,10 @@ def wait_for_data_in_ct_table(ct_table_name, no_of_records, database=None, timeo
     """Wait for data is captured by CDC jobs in SQL Server
     (i.e, number of records in CT table is equal to the total number of records).
     """
-    logger.info('Waiting for no_data_event to be updated in %s seconds ...', timeout_sec)
-    start_waiting_time = time()
-    stop_waiting_time = start_waiting_time + timeout_sec
-    db_engine = database.engine
-
-    while time() < stop_waiting_time:
-        event_table = sqlalchemy.Table(ct_table_name, sqlalchemy.MetaData(), autoload=True,
-                                       autoload_with=db_engine, schema='cdc')
-        event_result = db_engine.execute(event_table.select())
-        event_result_list = event_result.fetchall()
-        event_result.close()
-
-        if len(event_result_list) >= no_of_records:
-            logger.info('%s of data is captured in CT Table %s', no_of_records, ct_table_name)
-            return
-        sleep(5)
-
-    raise Exception('Timed out after %s seconds while waiting for captured data.', timeout_sec)
+    logger.info('Waiting for %s records to be captured in CT Table %s in %s seconds ...',
+                no_of_records, ct_table_name, timeout_sec)
+    wait_for_row_count(database.engine, ct_table_name, no_of_records, schema='cdc', timeout_sec=timeout_sec)
+    logger.info('%s of data is captured in CT Table %s', no_of_records, ct_table_name)
 
 
 @database('sqlserver')
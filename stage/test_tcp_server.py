@@ -23,10 +23,14 @@ import pytest
 from streamsets.testframework.environment import TCPClient
 from streamsets.testframework.markers import sdc_min_version
 
+from stage.utils.record_tables import RecordTable, assert_multiset_equal
+from stage.utils.sharding import shard_port
+from stage.utils.snapshots import SnapshotReader
+
 logger = logging.getLogger(__name__)
 
 # TODO: convert to pipeline param. seems to not work (see below)
-TCP_PORT = 17892
+TCP_PORT = shard_port(17892)
 TCP_SSL_FILE_PATH = './resources/tcp_server/file.txt'
 # TCP keystore file path relative to $SDC_RESOURCES.
 TCP_KEYSTORE_FILE_PATH = 'resources/tcp_server/keystore.jks'
@@ -268,8 +272,8 @@ def run_pipeline_send_tcp_messages(sdc_executor, tcp_server_pipeline, tcp_server
 
     try:
         # Run pipeline.
-        snapshot_cmd = sdc_executor.capture_snapshot(tcp_server_pipeline, start_pipeline=True, wait=False,
-                                                     batch_size=10, batches=7)
+        snapshot_reader = SnapshotReader.capture(sdc_executor, tcp_server_pipeline, start_pipeline=True,
+                                                 batch_size=10, batches=7)
         total_num_messages = 0
         expected_messages_list = []
         # Process each client.
@@ -292,12 +296,10 @@ def run_pipeline_send_tcp_messages(sdc_executor, tcp_server_pipeline, tcp_server
 
             tcp_client_socket.close()
 
-        snapshot = snapshot_cmd.wait_for_finished().snapshot
-        output_records_values = [str(record.field['text'])
-                                 for batch in snapshot.snapshot_batches
-                                 for record in batch.stage_outputs[tcp_server_stage.instance_name].output]
-        assert len(output_records_values) == total_num_messages
-        assert sorted(output_records_values) == sorted(expected_messages_list)
+        snapshot_reader.wait_for_finished()
+        output = RecordTable.from_records(snapshot_reader.output(tcp_server_stage.instance_name), ['text'])
+        assert len(output) == total_num_messages
+        assert_multiset_equal(output.column('text'), expected_messages_list)
     finally:
         sdc_executor.stop_pipeline(tcp_server_pipeline, wait=True, force=True)
 
@@ -0,0 +1,24 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process asyncio stand-ins for message brokers, to run and load test messaging stages without external services:
+
+- :py:class:`stage.utils.brokers.mqtt_broker.MqttBroker`: MQTT 3.1.1;
+- :py:class:`stage.utils.brokers.redis_server.RedisServer`: RESP pub/sub, lists and strings;
+- :py:class:`stage.utils.brokers.amqp_broker.AmqpBroker`: AMQP 0-9-1 exchanges, queues and basic publish/consume.
+
+Each of them has the client-side interface tests use of the matching test framework environment (``mqtt_broker``,
+``redis`` and ``rabbitmq``) and points a pipeline's stages at itself with ``configure_pipeline``.
+"""
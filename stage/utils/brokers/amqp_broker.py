@@ -0,0 +1,658 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+AMQP 0-9-1 broker stand-in, for RabbitMQ stages.
+
+It handles connections with any credentials and heartbeats, channels, ``direct``, ``fanout`` and ``topic`` exchanges
+(and the default one), queue declaration, binding, purging and deletion, and basic publish (with publisher confirms
+and mandatory returns), consume, get, ack, reject, nack and recover with prefetch limits. Everything is transient:
+durability flags are accepted but nothing outlives the broker, and transactions aren't supported. Like the test
+framework's ``rabbitmq`` environment, it has a ``blocking_connection`` for tests (which requires the pika package)::
+
+    with AmqpBroker() as rabbitmq:
+        pipeline = rabbitmq.configure_pipeline(pipeline_builder.build())
+        ...
+        channel = rabbitmq.blocking_connection.channel()
+"""
+
+import asyncio
+import itertools
+import logging
+import struct
+from collections import deque, namedtuple
+
+from stage.utils.brokers.server import StandInServer, drain_if_needed
+
+try:
+    import pika
+except ImportError:
+    pika = None
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_HEADER = b'AMQP\x00\x00\x09\x01'
+FRAME_METHOD = 1
+FRAME_HEADER = 2
+FRAME_BODY = 3
+FRAME_HEARTBEAT = 8
+FRAME_END = b'\xce'
+FRAME_MAX = 128 * 1024
+# Bytes of a frame besides its payload.
+FRAME_OVERHEAD = 8
+CONNECTION = 10
+CHANNEL = 20
+EXCHANGE = 40
+QUEUE = 50
+BASIC = 60
+CONFIRM = 85
+NO_ROUTE = 312
+NOT_FOUND = 404
+PRECONDITION_FAILED = 406
+COMMAND_INVALID = 503
+NOT_IMPLEMENTED = 540
+EXCHANGE_TYPES = ('direct', 'fanout', 'topic')
+DEFAULT_EXCHANGES = {'': 'direct', 'amq.direct': 'direct', 'amq.fanout': 'fanout', 'amq.topic': 'topic'}
+SERVER_PROPERTIES = {'product': 'AMQP broker stand-in',
+                     'capabilities': {'publisher_confirms': True,
+                                      'basic.nack': True,
+                                      'consumer_cancel_notify': True,
+                                      'exchange_exchange_bindings': False,
+                                      'connection.blocked': False}}
+
+AmqpMessage = namedtuple('AmqpMessage', ['exchange', 'routing_key', 'properties', 'body', 'redelivered'])
+
+
+class AmqpBroker(StandInServer):
+    """AMQP 0-9-1 broker on its own event loop thread.
+
+    Args:
+        port (:obj:`int`, optional): Port to listen on. Default: ``0`` (an ephemeral port)
+        host (:obj:`str`, optional): Interface to listen on. Default: ``'0.0.0.0'``
+    """
+    name = 'amqp-broker'
+
+    def __init__(self, port=0, host='0.0.0.0'):
+        super().__init__(port, host)
+        self.published = 0
+        self.delivered = 0
+        self.exchanges = {name: _Exchange(exchange_type) for name, exchange_type in DEFAULT_EXCHANGES.items()}
+        self.queues = {}
+        self._names = itertools.count(1)
+
+    @property
+    def uri(self):
+        return f'amqp://{self.advertised_host}:{self.port}'
+
+    @property
+    def blocking_connection(self):
+        """A new :py:class:`pika.BlockingConnection` to the broker."""
+        if pika is None:
+            raise Exception('The pika package is required for a connection to the AMQP broker')
+        return pika.BlockingConnection(pika.ConnectionParameters(host='127.0.0.1', port=self.port))
+
+    def configure_pipeline(self, pipeline):
+        """Point the RabbitMQ stages of a pipeline at the broker.
+
+        Returns:
+            The pipeline.
+        """
+        for stage in pipeline.stages:
+            if 'rabbitmq' in stage.stage_name.lower():
+                stage.set_attributes(uri=self.uri)
+        return pipeline
+
+    async def _handle(self, reader, writer):
+        if await reader.readexactly(len(PROTOCOL_HEADER)) != PROTOCOL_HEADER:
+            writer.write(PROTOCOL_HEADER)
+            return
+        connection = _Connection(self, writer)
+        connection.send_method(0, CONNECTION, 10, struct.pack('!BB', 0, 9) + _table(SERVER_PROPERTIES)
+                               + _longstr(b'PLAIN AMQPLAIN') + _longstr(b'en_US'))
+        try:
+            while not connection.closed:
+                frame_type, channel_id, payload = await _read_frame(reader)
+                if frame_type == FRAME_METHOD:
+                    class_id, method_id = struct.unpack_from('!HH', payload)
+                    connection.receive_method(channel_id, class_id, method_id, _Arguments(payload, 4))
+                elif frame_type == FRAME_HEADER:
+                    connection.receive_content_header(channel_id, payload)
+                elif frame_type == FRAME_BODY:
+                    connection.receive_content_body(channel_id, payload)
+                await drain_if_needed(writer)
+        finally:
+            connection.release()
+
+    def route(self, exchange_name, routing_key):
+        """Get the names of the queues a message is routed to."""
+        if exchange_name == '':
+            return [routing_key] if routing_key in self.queues else []
+        exchange = self.exchanges[exchange_name]
+        queue_names = []
+        for queue_name, binding_key in exchange.bindings:
+            if queue_name not in queue_names and (exchange.type == 'fanout'
+                                                  or exchange.type == 'direct' and binding_key == routing_key
+                                                  or exchange.type == 'topic' and topic_matches(binding_key,
+                                                                                                routing_key)):
+                queue_names.append(queue_name)
+        return queue_names
+
+    def enqueue(self, queue_name, message):
+        queue = self.queues[queue_name]
+        queue.messages.append(message)
+        self.dispatch(queue)
+
+    def dispatch(self, queue):
+        """Deliver messages of a queue to its consumers, round robin, within their channels' prefetch limits."""
+        while queue.messages and queue.consumers:
+            for _ in range(len(queue.consumers)):
+                consumer = queue.consumers[0]
+                queue.consumers.rotate(-1)
+                if consumer.channel.has_capacity():
+                    consumer.channel.deliver(consumer, queue.messages.popleft())
+                    self.delivered += 1
+                    break
+            else:
+                return
+
+    def delete_queue(self, queue_name):
+        queue = self.queues.pop(queue_name)
+        for exchange in self.exchanges.values():
+            exchange.bindings = [binding for binding in exchange.bindings if binding[0] != queue_name]
+        for consumer in queue.consumers:
+            consumer.channel.consumers.pop(consumer.tag, None)
+        return len(queue.messages)
+
+    def get_name(self, prefix):
+        return f'{prefix}-{next(self._names)}'
+
+
+class _Exchange:
+    def __init__(self, exchange_type):
+        self.type = exchange_type
+        # (queue name, binding key) pairs.
+        self.bindings = []
+
+
+class _Queue:
+    def __init__(self, auto_delete, owner):
+        self.messages = deque()
+        self.consumers = deque()
+        self.auto_delete = auto_delete
+        # Connection of an exclusive queue.
+        self.owner = owner
+
+
+class _Consumer:
+    def __init__(self, tag, channel, queue_name, no_ack):
+        self.tag = tag
+        self.channel = channel
+        self.queue_name = queue_name
+        self.no_ack = no_ack
+
+
+class _ChannelClosed(Exception):
+    """Raised to close a channel because of a failed method, with the reply code and text to close it with."""
+    def __init__(self, reply_code, reply_text):
+        super().__init__(reply_text)
+        self.reply_code = reply_code
+        self.reply_text = reply_text
+
+
+class _Connection:
+    def __init__(self, broker, writer):
+        self.broker = broker
+        self.writer = writer
+        self.channels = {}
+        self.frame_max = FRAME_MAX
+        self.closed = False
+        self._heartbeat_task = None
+
+    def send_method(self, channel_id, class_id, method_id, arguments=b''):
+        self.send_frame(FRAME_METHOD, channel_id, struct.pack('!HH', class_id, method_id) + arguments)
+
+    def send_frame(self, frame_type, channel_id, payload):
+        self.writer.write(struct.pack('!BHI', frame_type, channel_id, len(payload)) + payload + FRAME_END)
+
+    def send_content(self, channel_id, message):
+        self.send_frame(FRAME_HEADER, channel_id,
+                        struct.pack('!HHQ', BASIC, 0, len(message.body)) + message.properties)
+        body_max = self.frame_max - FRAME_OVERHEAD
+        for offset in range(0, len(message.body), body_max):
+            self.send_frame(FRAME_BODY, channel_id, message.body[offset:offset + body_max])
+
+    def receive_method(self, channel_id, class_id, method_id, arguments):
+        if class_id == CONNECTION:
+            self._receive_connection_method(method_id, arguments)
+            return
+        if class_id == CHANNEL and method_id == 10:
+            self.channels[channel_id] = _Channel(self, channel_id)
+            self.send_method(channel_id, CHANNEL, 11, _longstr(b''))
+            return
+        channel = self.channels.get(channel_id)
+        if channel is None or channel.closing:
+            # Methods of a channel being closed are ignored until the client confirms it's closed.
+            if class_id == CHANNEL and method_id == 41:
+                self.channels.pop(channel_id, None)
+            return
+        try:
+            channel.receive_method(class_id, method_id, arguments)
+        except _ChannelClosed as closed:
+            channel.close(closed.reply_code, closed.reply_text, class_id, method_id)
+
+    def receive_content_header(self, channel_id, payload):
+        channel = self.channels.get(channel_id)
+        if channel and not channel.closing:
+            body_size, = struct.unpack_from('!Q', payload, 4)
+            try:
+                channel.receive_content_header(body_size, bytes(payload[12:]))
+            except _ChannelClosed as closed:
+                channel.close(closed.reply_code, closed.reply_text, BASIC, 40)
+
+    def receive_content_body(self, channel_id, payload):
+        channel = self.channels.get(channel_id)
+        if channel and not channel.closing:
+            channel.receive_content_body(payload)
+
+    def release(self):
+        """Requeue what the connection's channels didn't acknowledge and delete its exclusive queues."""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+        for channel in self.channels.values():
+            channel.release()
+        self.channels.clear()
+        for queue_name, queue in list(self.broker.queues.items()):
+            if queue.owner is self:
+                self.broker.delete_queue(queue_name)
+
+    def _receive_connection_method(self, method_id, arguments):
+        if method_id == 11:  # Start-Ok
+            self.send_method(0, CONNECTION, 30, struct.pack('!HIH', 0, FRAME_MAX, 0))
+        elif method_id == 31:  # Tune-Ok
+            _, frame_max, heartbeat = arguments.unpack('!HIH')
+            self.frame_max = frame_max or FRAME_MAX
+            if heartbeat:
+                self._heartbeat_task = asyncio.ensure_future(self._send_heartbeats(heartbeat))
+        elif method_id == 40:  # Open
+            self.send_method(0, CONNECTION, 41, _shortstr(''))
+        elif method_id == 50:  # Close
+            self.send_method(0, CONNECTION, 51)
+            self.closed = True
+        elif method_id == 51:  # Close-Ok
+            self.closed = True
+
+    async def _send_heartbeats(self, interval_sec):
+        while True:
+            await asyncio.sleep(interval_sec / 2)
+            self.send_frame(FRAME_HEARTBEAT, 0, b'')
+
+
+class _Channel:
+    def __init__(self, connection, channel_id):
+        self.connection = connection
+        self.broker = connection.broker
+        self.id = channel_id
+        self.consumers = {}
+        # Delivery tag to (queue name, message) of messages delivered but not acknowledged.
+        self.unacked = {}
+        self.prefetch_count = 0
+        self.confirm = False
+        self.closing = False
+        self._delivery_tags = itertools.count(1)
+        self._publish_sequence = itertools.count(1)
+        self._publish = None
+        self._content = None
+
+    def has_capacity(self):
+        return not self.prefetch_count or len(self.unacked) < self.prefetch_count
+
+    def deliver(self, consumer, message):
+        delivery_tag = next(self._delivery_tags)
+        if not consumer.no_ack:
+            self.unacked[delivery_tag] = (consumer.queue_name, message)
+        self.connection.send_method(self.id, BASIC, 60,
+                                    _shortstr(consumer.tag) + struct.pack('!QB', delivery_tag, message.redelivered)
+                                    + _shortstr(message.exchange) + _shortstr(message.routing_key))
+        self.connection.send_content(self.id, message)
+
+    def close(self, reply_code, reply_text, class_id, method_id):
+        self.closing = True
+        self.release()
+        self.connection.send_method(self.id, CHANNEL, 40, struct.pack('!H', reply_code) + _shortstr(reply_text)
+                                    + struct.pack('!HH', class_id, method_id))
+
+    def release(self):
+        """Cancel the channel's consumers and requeue its unacknowledged messages."""
+        for consumer in list(self.consumers.values()):
+            self._cancel(consumer)
+        self.consumers.clear()
+        self._requeue(list(self.unacked))
+
+    def receive_method(self, class_id, method_id, arguments):
+        handler = getattr(self, f'_method_{class_id}_{method_id}', None)
+        if handler is None:
+            raise _ChannelClosed(NOT_IMPLEMENTED, f'NOT_IMPLEMENTED - method {class_id}.{method_id}')
+        handler(arguments)
+
+    def receive_content_header(self, body_size, properties):
+        if self._publish is None:
+            raise _ChannelClosed(COMMAND_INVALID, 'COMMAND_INVALID - content header without basic.publish')
+        self._content = (body_size, properties, [], 0)
+        if not body_size:
+            self._publish_content()
+
+    def receive_content_body(self, payload):
+        body_size, properties, parts, received = self._content
+        parts.append(bytes(payload))
+        self._content = (body_size, properties, parts, received + len(payload))
+        if received + len(payload) >= body_size:
+            self._publish_content()
+
+    def _publish_content(self):
+        exchange_name, routing_key, mandatory = self._publish
+        _, properties, parts, _ = self._content
+        self._publish = self._content = None
+        message = AmqpMessage(exchange_name, routing_key, properties, b''.join(parts), False)
+        self.broker.published += 1
+        queue_names = self.broker.route(exchange_name, routing_key) if exchange_name in self.broker.exchanges else []
+        if not queue_names and mandatory:
+            self.connection.send_method(self.id, BASIC, 50, struct.pack('!H', NO_ROUTE) + _shortstr('NO_ROUTE')
+                                        + _shortstr(exchange_name) + _shortstr(routing_key))
+            self.connection.send_content(self.id, message)
+        if self.confirm:
+            self.connection.send_method(self.id, BASIC, 80, struct.pack('!QB', next(self._publish_sequence), 0))
+        for queue_name in queue_names:
+            self.broker.enqueue(queue_name, message)
+
+    def _get_queue(self, queue_name):
+        queue = self.broker.queues.get(queue_name)
+        if queue is None:
+            raise _ChannelClosed(NOT_FOUND, f"NOT_FOUND - no queue '{queue_name}'")
+        return queue
+
+    def _get_exchange(self, exchange_name):
+        exchange = self.broker.exchanges.get(exchange_name)
+        if exchange is None:
+            raise _ChannelClosed(NOT_FOUND, f"NOT_FOUND - no exchange '{exchange_name}'")
+        return exchange
+
+    def _cancel(self, consumer):
+        self.consumers.pop(consumer.tag, None)
+        queue = self.broker.queues.get(consumer.queue_name)
+        if queue is not None and consumer in queue.consumers:
+            queue.consumers.remove(consumer)
+            if queue.auto_delete and not queue.consumers:
+                self.broker.delete_queue(consumer.queue_name)
+
+    def _settle(self, delivery_tag, multiple):
+        """Remove acknowledged or rejected messages from the unacknowledged ones and get their tags."""
+        delivery_tags = ([tag for tag in self.unacked if tag <= delivery_tag or not delivery_tag] if multiple
+                         else [delivery_tag] if delivery_tag in self.unacked else [])
+        if not delivery_tags and not multiple:
+            raise _ChannelClosed(PRECONDITION_FAILED, f'PRECONDITION_FAILED - unknown delivery tag {delivery_tag}')
+        return delivery_tags
+
+    def _requeue(self, delivery_tags):
+        queues = {}
+        for delivery_tag in sorted(delivery_tags, reverse=True):
+            queue_name, message = self.unacked.pop(delivery_tag)
+            queue = self.broker.queues.get(queue_name)
+            if queue is not None:
+                queue.messages.appendleft(message._replace(redelivered=True))
+                queues[queue_name] = queue
+        self._dispatch(queues.values())
+
+    def _forget(self, delivery_tags):
+        queue_names = {self.unacked.pop(delivery_tag)[0] for delivery_tag in delivery_tags}
+        self._dispatch(self.broker.queues[queue_name] for queue_name in queue_names
+                       if queue_name in self.broker.queues)
+
+    def _dispatch(self, queues):
+        for queue in list(queues):
+            self.broker.dispatch(queue)
+
+    # Channel.
+
+    def _method_20_20(self, arguments):  # Flow
+        active, = arguments.bits(1)
+        self.connection.send_method(self.id, CHANNEL, 21, struct.pack('!B', active))
+
+    def _method_20_40(self, arguments):  # Close
+        self.release()
+        self.connection.channels.pop(self.id, None)
+        self.connection.send_method(self.id, CHANNEL, 41)
+
+    # Exchange.
+
+    def _method_40_10(self, arguments):  # Declare
+        arguments.unpack('!H')
+        exchange_name, exchange_type = arguments.shortstr(), arguments.shortstr()
+        passive, _, _, _, no_wait = arguments.bits(5)
+        if passive:
+            self._get_exchange(exchange_name)
+        elif exchange_name not in self.broker.exchanges:
+            if exchange_type not in EXCHANGE_TYPES:
+                raise _ChannelClosed(NOT_IMPLEMENTED, f"NOT_IMPLEMENTED - exchange type '{exchange_type}'")
+            self.broker.exchanges[exchange_name] = _Exchange(exchange_type)
+        if not no_wait:
+            self.connection.send_method(self.id, EXCHANGE, 11)
+
+    def _method_40_20(self, arguments):  # Delete
+        arguments.unpack('!H')
+        exchange_name = arguments.shortstr()
+        _, no_wait = arguments.bits(2)
+        self.broker.exchanges.pop(exchange_name, None)
+        if not no_wait:
+            self.connection.send_method(self.id, EXCHANGE, 21)
+
+    # Queue.
+
+    def _method_50_10(self, arguments):  # Declare
+        arguments.unpack('!H')
+        queue_name = arguments.shortstr() or self.broker.get_name('amq.gen')
+        passive, _, exclusive, auto_delete, no_wait = arguments.bits(5)
+        if passive:
+            queue = self._get_queue(queue_name)
+        else:
+            queue = self.broker.queues.setdefault(queue_name,
+                                                  _Queue(auto_delete, self.connection if exclusive else None))
+        if not no_wait:
+            self.connection.send_method(self.id, QUEUE, 11, _shortstr(queue_name)
+                                        + struct.pack('!II', len(queue.messages), len(queue.consumers)))
+
+    def _method_50_20(self, arguments):  # Bind
+        arguments.unpack('!H')
+        queue_name, exchange_name, routing_key = arguments.shortstr(), arguments.shortstr(), arguments.shortstr()
+        no_wait, = arguments.bits(1)
+        self._get_queue(queue_name)
+        exchange = self._get_exchange(exchange_name)
+        if (queue_name, routing_key) not in exchange.bindings:
+            exchange.bindings.append((queue_name, routing_key))
+        if not no_wait:
+            self.connection.send_method(self.id, QUEUE, 21)
+
+    def _method_50_30(self, arguments):  # Purge
+        arguments.unpack('!H')
+        queue = self._get_queue(arguments.shortstr())
+        no_wait, = arguments.bits(1)
+        purged = len(queue.messages)
+        queue.messages.clear()
+        if not no_wait:
+            self.connection.send_method(self.id, QUEUE, 31, struct.pack('!I', purged))
+
+    def _method_50_40(self, arguments):  # Delete
+        arguments.unpack('!H')
+        queue_name = arguments.shortstr()
+        _, _, no_wait = arguments.bits(3)
+        deleted = self.broker.delete_queue(queue_name) if queue_name in self.broker.queues else 0
+        if not no_wait:
+            self.connection.send_method(self.id, QUEUE, 41, struct.pack('!I', deleted))
+
+    def _method_50_50(self, arguments):  # Unbind
+        arguments.unpack('!H')
+        queue_name, exchange_name, routing_key = arguments.shortstr(), arguments.shortstr(), arguments.shortstr()
+        exchange = self._get_exchange(exchange_name)
+        if (queue_name, routing_key) in exchange.bindings:
+            exchange.bindings.remove((queue_name, routing_key))
+        self.connection.send_method(self.id, QUEUE, 51)
+
+    # Basic.
+
+    def _method_60_10(self, arguments):  # Qos
+        _, self.prefetch_count = arguments.unpack('!IH')
+        self.connection.send_method(self.id, BASIC, 11)
+        self._dispatch(self.broker.queues[consumer.queue_name] for consumer in self.consumers.values())
+
+    def _method_60_20(self, arguments):  # Consume
+        arguments.unpack('!H')
+        queue_name = arguments.shortstr()
+        consumer_tag = arguments.shortstr() or self.broker.get_name('amq.ctag')
+        _, no_ack, _, no_wait = arguments.bits(4)
+        queue = self._get_queue(queue_name)
+        consumer = _Consumer(consumer_tag, self, queue_name, no_ack)
+        self.consumers[consumer_tag] = consumer
+        queue.consumers.append(consumer)
+        if not no_wait:
+            self.connection.send_method(self.id, BASIC, 21, _shortstr(consumer_tag))
+        self.broker.dispatch(queue)
+
+    def _method_60_30(self, arguments):  # Cancel
+        consumer_tag = arguments.shortstr()
+        no_wait, = arguments.bits(1)
+        if consumer_tag in self.consumers:
+            self._cancel(self.consumers[consumer_tag])
+        if not no_wait:
+            self.connection.send_method(self.id, BASIC, 31, _shortstr(consumer_tag))
+
+    def _method_60_40(self, arguments):  # Publish
+        arguments.unpack('!H')
+        exchange_name, routing_key = arguments.shortstr(), arguments.shortstr()
+        mandatory, _ = arguments.bits(2)
+        self._get_exchange(exchange_name)
+        self._publish = (exchange_name, routing_key, mandatory)
+
+    def _method_60_70(self, arguments):  # Get
+        arguments.unpack('!H')
+        queue_name = arguments.shortstr()
+        no_ack, = arguments.bits(1)
+        queue = self._get_queue(queue_name)
+        if not queue.messages:
+            self.connection.send_method(self.id, BASIC, 72, _shortstr(''))
+            return
+        message = queue.messages.popleft()
+        delivery_tag = next(self._delivery_tags)
+        if not no_ack:
+            self.unacked[delivery_tag] = (queue_name, message)
+        self.broker.delivered += 1
+        self.connection.send_method(self.id, BASIC, 71, struct.pack('!QB', delivery_tag, message.redelivered)
+                                    + _shortstr(message.exchange) + _shortstr(message.routing_key)
+                                    + struct.pack('!I', len(queue.messages)))
+        self.connection.send_content(self.id, message)
+
+    def _method_60_80(self, arguments):  # Ack
+        delivery_tag, = arguments.unpack('!Q')
+        multiple, = arguments.bits(1)
+        self._forget(self._settle(delivery_tag, multiple))
+
+    def _method_60_90(self, arguments):  # Reject
+        delivery_tag, = arguments.unpack('!Q')
+        requeue, = arguments.bits(1)
+        delivery_tags = self._settle(delivery_tag, False)
+        self._requeue(delivery_tags) if requeue else self._forget(delivery_tags)
+
+    def _method_60_110(self, arguments):  # Recover
+        self._requeue(list(self.unacked))
+        self.connection.send_method(self.id, BASIC, 111)
+
+    def _method_60_120(self, arguments):  # Nack
+        delivery_tag, = arguments.unpack('!Q')
+        multiple, requeue = arguments.bits(2)
+        delivery_tags = self._settle(delivery_tag, multiple)
+        self._requeue(delivery_tags) if requeue else self._forget(delivery_tags)
+
+    # Confirm.
+
+    def _method_85_10(self, arguments):  # Select
+        no_wait, = arguments.bits(1)
+        self.confirm = True
+        if not no_wait:
+            self.connection.send_method(self.id, CONFIRM, 11)
+
+
+class _Arguments:
+    """Reader of the arguments of a method frame."""
+    def __init__(self, payload, offset):
+        self.payload = payload
+        self.offset = offset
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.payload, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def shortstr(self):
+        length = self.payload[self.offset]
+        value = bytes(self.payload[self.offset + 1:self.offset + 1 + length]).decode()
+        self.offset += 1 + length
+        return value
+
+    def bits(self, count):
+        """Read consecutive bit arguments, packed into an octet."""
+        octet = self.payload[self.offset]
+        self.offset += 1
+        return [bool(octet >> bit & 1) for bit in range(count)]
+
+
+def topic_matches(binding_key, routing_key):
+    """Whether a routing key matches a topic exchange binding key with ``*`` (one word) and ``#`` (zero or more
+    words) wildcards.
+    """
+    return _words_match(binding_key.split('.'), routing_key.split('.'))
+
+
+def _words_match(pattern, words):
+    if not pattern:
+        return not words
+    if pattern[0] == '#':
+        return any(_words_match(pattern[1:], words[index:]) for index in range(len(words) + 1))
+    return bool(words) and pattern[0] in ('*', words[0]) and _words_match(pattern[1:], words[1:])
+
+
+async def _read_frame(reader):
+    frame_type, channel_id, size = struct.unpack('!BHI', await reader.readexactly(7))
+    payload = await reader.readexactly(size + 1)
+    if payload[-1:] != FRAME_END:
+        raise ConnectionError(f'Malformed frame of type {frame_type} on channel {channel_id}')
+    return frame_type, channel_id, memoryview(payload)[:-1]
+
+
+def _shortstr(value):
+    value = value.encode()
+    return struct.pack('!B', len(value)) + value
+
+
+def _longstr(value):
+    return struct.pack('!I', len(value)) + value
+
+
+def _table(values):
+    encoded = b''
+    for key, value in values.items():
+        if isinstance(value, bool):
+            encoded += _shortstr(key) + b't' + struct.pack('!B', value)
+        elif isinstance(value, dict):
+            encoded += _shortstr(key) + b'F' + _table(value)
+        else:
+            encoded += _shortstr(key) + b'S' + _longstr(str(value).encode())
+    return _longstr(encoded)
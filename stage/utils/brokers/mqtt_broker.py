@@ -0,0 +1,292 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+MQTT 3.1.1 broker stand-in.
+
+It handles connections (also MQTT 3.1 ones), publishing with QoS 0, 1 and 2, subscriptions with ``+`` and ``#``
+wildcards, retained messages and pings. Sessions are always clean and wills and authentication are ignored; messages
+aren't retransmitted, since connections are local. Like the test framework's ``mqtt_broker`` environment, it
+publishes messages for tests and records the messages published to the topics they're interested in::
+
+    with MqttBroker() as mqtt_broker:
+        mqtt_broker.initialize(initial_topics=['output'])
+        pipeline = mqtt_broker.configure_pipeline(pipeline_builder.build())
+        ...
+        messages = mqtt_broker.get_messages('output', num=10)
+"""
+
+import logging
+import struct
+import threading
+from collections import namedtuple
+
+from stage.utils.brokers.server import StandInServer, drain_if_needed
+
+logger = logging.getLogger(__name__)
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+MAX_QOS = 2
+DEFAULT_GET_MESSAGES_TIMEOUT_SEC = 30
+BROKER_URL_CONFIGURATION = 'commonConf.brokerUrl'
+
+MqttMessage = namedtuple('MqttMessage', ['topic', 'payload', 'qos', 'retain'])
+
+
+class MqttBroker(StandInServer):
+    """MQTT 3.1.1 broker on its own event loop thread.
+
+    Args:
+        port (:obj:`int`, optional): Port to listen on. Default: ``0`` (an ephemeral port)
+        host (:obj:`str`, optional): Interface to listen on. Default: ``'0.0.0.0'``
+    """
+    name = 'mqtt-broker'
+
+    def __init__(self, port=0, host='0.0.0.0'):
+        super().__init__(port, host)
+        self.published = 0
+        self.delivered = 0
+        self._sessions = set()
+        self._retained = {}
+        self._recorded = {}
+        self._recorded_condition = threading.Condition()
+
+    @property
+    def broker_url(self):
+        return f'tcp://{self.advertised_host}:{self.port}'
+
+    def configure_pipeline(self, pipeline):
+        """Point the MQTT stages of a pipeline at the broker.
+
+        Returns:
+            The pipeline.
+        """
+        for stage in pipeline.stages:
+            if 'mqtt' in stage.stage_name.lower():
+                stage.configuration[BROKER_URL_CONFIGURATION] = self.broker_url
+        return pipeline
+
+    def initialize(self, initial_topics=None):
+        """Start recording the messages published to topics, for :py:meth:`get_messages`.
+
+        Args:
+            initial_topics (:obj:`list`, optional): Topic filters. Default: ``None``
+        """
+        with self._recorded_condition:
+            for topic in initial_topics or []:
+                self._recorded.setdefault(topic, [])
+
+    def publish_message(self, topic, payload, qos=0, retain=False):
+        """Publish a message to the broker's subscribers.
+
+        Args:
+            topic (:obj:`str`): Topic.
+            payload (:obj:`str` or :obj:`bytes`): Payload, encoded as UTF-8 if a :obj:`str`.
+            qos (:obj:`int`, optional): Quality of service. Default: ``0``
+            retain (:obj:`bool`, optional): Retain the message for future subscribers. Default: ``False``
+
+        Returns:
+            The number of subscribers the message was sent to, like Redis' ``PUBLISH``.
+        """
+        payload = payload.encode() if isinstance(payload, str) else payload
+        return self.call(self._publish, MqttMessage(topic, payload, qos, retain))
+
+    def get_messages(self, topic, num=1, timeout=DEFAULT_GET_MESSAGES_TIMEOUT_SEC):
+        """Get and forget the first messages recorded for a topic filter given to :py:meth:`initialize`.
+
+        Args:
+            topic (:obj:`str`): Topic filter.
+            num (:obj:`int`, optional): Number of messages. Default: ``1``
+            timeout (:obj:`float`, optional): Time to wait for them. Default:
+                :py:const:`DEFAULT_GET_MESSAGES_TIMEOUT_SEC`
+
+        Returns:
+            A :obj:`list` of :py:class:`MqttMessage` instances.
+        """
+        with self._recorded_condition:
+            if not self._recorded_condition.wait_for(lambda: len(self._recorded[topic]) >= num, timeout):
+                raise TimeoutError(f'Got {len(self._recorded[topic])} of {num} messages on topic {topic} '
+                                   f'within {timeout} s')
+            messages = self._recorded[topic][:num]
+            del self._recorded[topic][:num]
+            return messages
+
+    def destroy(self):
+        """Forget recorded and retained messages."""
+        with self._recorded_condition:
+            self._recorded.clear()
+        self.call(self._retained.clear)
+
+    async def _handle(self, reader, writer):
+        packet_type, _, body = await _read_packet(reader)
+        if packet_type != CONNECT:
+            return
+        session = _Session(writer)
+        writer.write(bytes([CONNACK << 4, 2, 0, 0]))
+        self._sessions.add(session)
+        try:
+            while True:
+                packet_type, flags, body = await _read_packet(reader)
+                if packet_type == PUBLISH:
+                    self._receive_publish(session, flags, body)
+                elif packet_type == PUBREL:
+                    session.incoming.discard(body[:2])
+                    writer.write(bytes([PUBCOMP << 4, 2]) + body[:2])
+                elif packet_type == PUBREC:
+                    writer.write(bytes([PUBREL << 4 | 0b0010, 2]) + body[:2])
+                elif packet_type == SUBSCRIBE:
+                    self._subscribe(session, body)
+                elif packet_type == UNSUBSCRIBE:
+                    for topic_filter in _read_strings(body[2:]):
+                        session.subscriptions.pop(topic_filter, None)
+                    writer.write(bytes([UNSUBACK << 4, 2]) + body[:2])
+                elif packet_type == PINGREQ:
+                    writer.write(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    return
+                await drain_if_needed(writer)
+        finally:
+            self._sessions.discard(session)
+
+    def _receive_publish(self, session, flags, body):
+        qos = (flags >> 1) & 0b11
+        topic_length, = struct.unpack_from('!H', body)
+        topic = body[2:2 + topic_length].decode()
+        offset = 2 + topic_length
+        packet_id = body[offset:offset + 2] if qos else None
+        payload = bytes(body[offset + 2:] if qos else body[offset:])
+        if qos == 1:
+            session.writer.write(bytes([PUBACK << 4, 2]) + packet_id)
+        elif qos == 2:
+            session.writer.write(bytes([PUBREC << 4, 2]) + packet_id)
+            if packet_id in session.incoming:
+                # A retransmission of a message already delivered.
+                return
+            session.incoming.add(packet_id)
+        self._publish(MqttMessage(topic, payload, qos, bool(flags & 0b0001)))
+
+    def _publish(self, message):
+        self.published += 1
+        if message.retain:
+            if message.payload:
+                self._retained[message.topic] = message
+            else:
+                self._retained.pop(message.topic, None)
+        receivers = 0
+        for session in self._sessions:
+            qos = max((qos for topic_filter, qos in session.subscriptions.items()
+                       if topic_matches(topic_filter, message.topic)), default=None)
+            if qos is not None:
+                session.send(message, min(qos, message.qos))
+                receivers += 1
+        self.delivered += receivers
+        with self._recorded_condition:
+            recorded = [topic_filter for topic_filter in self._recorded if topic_matches(topic_filter, message.topic)]
+            for topic_filter in recorded:
+                self._recorded[topic_filter].append(message)
+            if recorded:
+                self._recorded_condition.notify_all()
+        return receivers
+
+    def _subscribe(self, session, body):
+        packet_id = body[:2]
+        granted = []
+        offset = 2
+        while offset < len(body):
+            topic_length, = struct.unpack_from('!H', body, offset)
+            topic_filter = body[offset + 2:offset + 2 + topic_length].decode()
+            qos = min(body[offset + 2 + topic_length], MAX_QOS)
+            offset += 3 + topic_length
+            session.subscriptions[topic_filter] = qos
+            granted.append(qos)
+        session.writer.write(bytes([SUBACK << 4]) + _encode_length(2 + len(granted)) + packet_id + bytes(granted))
+        for topic, message in self._retained.items():
+            qos = max((qos for topic_filter, qos in session.subscriptions.items()
+                       if topic_matches(topic_filter, topic)), default=None)
+            if qos is not None:
+                session.send(message, min(qos, message.qos), retain=True)
+
+
+class _Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.subscriptions = {}
+        # Packet ids of QoS 2 messages received but not released yet.
+        self.incoming = set()
+        self._packet_id = 0
+
+    def send(self, message, qos, retain=False):
+        topic = message.topic.encode()
+        header = struct.pack('!H', len(topic)) + topic
+        if qos:
+            self._packet_id = self._packet_id % 0xffff + 1
+            header += struct.pack('!H', self._packet_id)
+        self.writer.write(bytes([PUBLISH << 4 | qos << 1 | retain])
+                          + _encode_length(len(header) + len(message.payload)) + header + message.payload)
+
+
+def topic_matches(topic_filter, topic):
+    """Whether a topic matches a topic filter with ``+`` (one level) and ``#`` (all remaining levels) wildcards."""
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for index, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if index >= len(topic_levels) or level not in ('+', topic_levels[index]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+async def _read_packet(reader):
+    first_byte, = await reader.readexactly(1)
+    length = 0
+    for shift in range(0, 28, 7):
+        byte, = await reader.readexactly(1)
+        length |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            break
+    body = await reader.readexactly(length) if length else b''
+    return first_byte >> 4, first_byte & 0x0f, body
+
+
+def _read_strings(data):
+    strings = []
+    offset = 0
+    while offset < len(data):
+        length, = struct.unpack_from('!H', data, offset)
+        strings.append(data[offset + 2:offset + 2 + length].decode())
+        offset += 2 + length
+    return strings
+
+
+def _encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length & 0x7f, length >> 7
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
@@ -0,0 +1,384 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Redis stand-in speaking RESP, version 2 or, for clients asking for it with ``HELLO 3``, version 3.
+
+It handles pub/sub (``PUBLISH``, ``SUBSCRIBE``, ``PSUBSCRIBE`` and their ``UNSUBSCRIBE`` counterparts), lists
+(``LPUSH``, ``RPUSH``, ``LPOP``, ``RPOP``, ``BLPOP``, ``BRPOP``, ``LLEN``, ``LRANGE``), strings (``SET``, ``GET``)
+and the connection and keyspace commands clients send along (``PING``, ``ECHO``, ``SELECT``, ``AUTH``, ``DEL``,
+``EXISTS``, ``FLUSHDB``, ...), with pipelining. There is a single database and nothing expires. Like the test
+framework's ``redis`` environment, it has a ``client`` for tests (which requires the redis package)::
+
+    with RedisServer() as redis:
+        pipeline = redis.configure_pipeline(pipeline_builder.build())
+        ...
+        redis.client.publish('channel', 'message')
+"""
+
+import asyncio
+import fnmatch
+import logging
+from collections import defaultdict, deque
+
+from stage.utils.brokers.server import StandInServer, drain_if_needed
+
+try:
+    import redis as redis_client
+except ImportError:
+    redis_client = None
+
+logger = logging.getLogger(__name__)
+
+OK = b'+OK\r\n'
+NIL = b'$-1\r\n'
+NIL_ARRAY = b'*-1\r\n'
+# RESP3 has a single null for both.
+NULL = b'_\r\n'
+WRONG_TYPE = b'-WRONGTYPE Operation against a key holding the wrong kind of value\r\n'
+# Commands allowed on a connection with subscriptions.
+SUBSCRIBED_COMMANDS = {b'SUBSCRIBE', b'PSUBSCRIBE', b'UNSUBSCRIBE', b'PUNSUBSCRIBE', b'PING', b'QUIT'}
+
+
+class RedisServer(StandInServer):
+    """Redis pub/sub, lists and strings on its own event loop thread.
+
+    Args:
+        port (:obj:`int`, optional): Port to listen on. Default: ``0`` (an ephemeral port)
+        host (:obj:`str`, optional): Interface to listen on. Default: ``'0.0.0.0'``
+    """
+    name = 'redis-server'
+
+    def __init__(self, port=0, host='0.0.0.0'):
+        super().__init__(port, host)
+        self.published = 0
+        self.delivered = 0
+        self._data = {}
+        self._channels = defaultdict(set)
+        self._patterns = defaultdict(set)
+        # Blocked BLPOP and BRPOP calls waiting on a key, as futures in the order they were made.
+        self._waiters = defaultdict(deque)
+        self._client = None
+
+    @property
+    def uri(self):
+        return f'redis://{self.advertised_host}:{self.port}'
+
+    @property
+    def client(self):
+        """A :py:class:`redis.StrictRedis` client connected to the server."""
+        if redis_client is None:
+            raise Exception('The redis package is required for a client of the Redis server')
+        if self._client is None:
+            self._client = redis_client.StrictRedis(host='127.0.0.1', port=self.port)
+        return self._client
+
+    def configure_pipeline(self, pipeline):
+        """Point the Redis stages of a pipeline at the server.
+
+        Returns:
+            The pipeline.
+        """
+        for stage in pipeline.stages:
+            if 'redis' in stage.stage_name.lower():
+                stage.set_attributes(uri=self.uri)
+        return pipeline
+
+    async def _handle(self, reader, writer):
+        connection = _Connection(writer)
+        try:
+            while True:
+                command = await _read_command(reader)
+                if not command:
+                    continue
+                name = command[0].upper()
+                if name == b'QUIT':
+                    writer.write(OK)
+                    return
+                # RESP3 delivers pub/sub messages as push frames, so subscribed connections may send any command.
+                if connection.subscriptions and connection.protocol == 2 and name not in SUBSCRIBED_COMMANDS:
+                    writer.write(_error(f"Command {name.decode()} not allowed in subscribed mode"))
+                    continue
+                handler = getattr(self, f'_command_{name.decode().lower()}', None)
+                if handler is None:
+                    writer.write(_error(f"unknown command '{command[0].decode()}'"))
+                    continue
+                try:
+                    reply = handler(connection, *command[1:])
+                except TypeError:
+                    writer.write(_error(f"wrong number of arguments for '{command[0].decode()}' command"))
+                    continue
+                if asyncio.iscoroutine(reply):
+                    reply = await reply
+                if reply in (NIL, NIL_ARRAY):
+                    reply = connection.null(reply)
+                if reply is not None:
+                    writer.write(reply)
+                await drain_if_needed(writer)
+        finally:
+            for channel in connection.channels:
+                self._channels[channel].discard(connection)
+            for pattern in connection.patterns:
+                self._patterns[pattern].discard(connection)
+
+    # Connection and keyspace.
+
+    def _command_ping(self, connection, message=None):
+        if connection.subscriptions and connection.protocol == 2:
+            return _array([b'pong', message or b''])
+        return _bulk(message) if message is not None else b'+PONG\r\n'
+
+    def _command_echo(self, connection, message):
+        return _bulk(message)
+
+    def _command_hello(self, connection, version=b'2', *options):
+        if version not in (b'2', b'3'):
+            return b'-NOPROTO unsupported protocol version\r\n'
+        connection.protocol = int(version)
+        fields = [_bulk(b'server'), _bulk(b'redis'), _bulk(b'version'), _bulk(b'6.0.0'),
+                  _bulk(b'proto'), _integer(connection.protocol), _bulk(b'mode'), _bulk(b'standalone')]
+        if connection.protocol == 3:
+            return b'%%%d\r\n' % (len(fields) // 2) + b''.join(fields)
+        return _array_of_encoded(fields)
+
+    def _command_auth(self, connection, *credentials):
+        return OK
+
+    def _command_select(self, connection, index):
+        return OK
+
+    def _command_client(self, connection, *arguments):
+        return OK
+
+    def _command_command(self, connection, *arguments):
+        return _array([])
+
+    def _command_info(self, connection, *sections):
+        return _bulk(b'# Server\r\nredis_version:6.0.0\r\nredis_mode:standalone\r\n')
+
+    def _command_flushdb(self, connection, *arguments):
+        self._data.clear()
+        return OK
+
+    _command_flushall = _command_flushdb
+
+    def _command_del(self, connection, *keys):
+        return _integer(sum(self._data.pop(key, None) is not None for key in keys))
+
+    def _command_exists(self, connection, *keys):
+        return _integer(sum(key in self._data for key in keys))
+
+    def _command_type(self, connection, key):
+        value = self._data.get(key)
+        return b'+none\r\n' if value is None else b'+list\r\n' if isinstance(value, deque) else b'+string\r\n'
+
+    # Strings.
+
+    def _command_set(self, connection, key, value, *options):
+        self._data[key] = value
+        return OK
+
+    def _command_get(self, connection, key):
+        value = self._data.get(key)
+        if isinstance(value, deque):
+            return WRONG_TYPE
+        return NIL if value is None else _bulk(value)
+
+    # Lists.
+
+    def _command_lpush(self, connection, key, *values):
+        return self._push(key, values, left=True)
+
+    def _command_rpush(self, connection, key, *values):
+        return self._push(key, values, left=False)
+
+    def _command_lpop(self, connection, key):
+        return self._pop(key, left=True)
+
+    def _command_rpop(self, connection, key):
+        return self._pop(key, left=False)
+
+    async def _command_blpop(self, connection, *arguments):
+        return await self._blocking_pop(arguments[:-1], float(arguments[-1]), left=True)
+
+    async def _command_brpop(self, connection, *arguments):
+        return await self._blocking_pop(arguments[:-1], float(arguments[-1]), left=False)
+
+    def _command_llen(self, connection, key):
+        values = self._data.get(key)
+        if values is None:
+            return _integer(0)
+        return _integer(len(values)) if isinstance(values, deque) else WRONG_TYPE
+
+    def _command_lrange(self, connection, key, start, stop):
+        values = self._data.get(key, deque())
+        if not isinstance(values, deque):
+            return WRONG_TYPE
+        start, stop = int(start), int(stop)
+        start = max(start + len(values) if start < 0 else start, 0)
+        stop = stop + len(values) if stop < 0 else stop
+        return _array(list(values)[start:stop + 1])
+
+    def _push(self, key, values, left):
+        pushed = self._data.setdefault(key, deque())
+        if not isinstance(pushed, deque):
+            return WRONG_TYPE
+        served = 0
+        waiters = self._waiters.get(key)
+        for value in values:
+            # Blocked pops get values before they're stored.
+            while waiters and waiters[0].done():
+                waiters.popleft()
+            if waiters:
+                waiters.popleft().set_result((key, value))
+                served += 1
+            elif left:
+                pushed.appendleft(value)
+            else:
+                pushed.append(value)
+        length = len(pushed) + served
+        if not pushed:
+            del self._data[key]
+        return _integer(length)
+
+    def _pop(self, key, left):
+        values = self._data.get(key)
+        if values is None:
+            return NIL
+        return _bulk(self._take(key, values, left)) if isinstance(values, deque) else WRONG_TYPE
+
+    def _take(self, key, values, left):
+        value = values.popleft() if left else values.pop()
+        if not values:
+            del self._data[key]
+        return value
+
+    async def _blocking_pop(self, keys, timeout_sec, left):
+        for key in keys:
+            values = self._data.get(key)
+            if values is not None:
+                return _array([key, self._take(key, values, left)]) if isinstance(values, deque) else WRONG_TYPE
+        waiter = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._waiters[key].append(waiter)
+        try:
+            key, value = await asyncio.wait_for(waiter, timeout_sec or None)
+            return _array([key, value])
+        except asyncio.TimeoutError:
+            return NIL_ARRAY
+        finally:
+            for key in keys:
+                if waiter in self._waiters[key]:
+                    self._waiters[key].remove(waiter)
+
+    # Pub/sub.
+
+    def _command_publish(self, connection, channel, message):
+        self.published += 1
+        receivers = 0
+        if self._channels.get(channel):
+            for subscriber in self._channels[channel]:
+                subscriber.push([_bulk(b'message'), _bulk(channel), _bulk(message)])
+                receivers += 1
+        for pattern, subscribers in self._patterns.items():
+            if subscribers and fnmatch.fnmatchcase(channel.decode(errors='replace'), pattern.decode()):
+                for subscriber in subscribers:
+                    subscriber.push([_bulk(b'pmessage'), _bulk(pattern), _bulk(channel), _bulk(message)])
+                    receivers += 1
+        self.delivered += receivers
+        return _integer(receivers)
+
+    def _command_subscribe(self, connection, *channels):
+        for channel in channels:
+            connection.channels.add(channel)
+            self._channels[channel].add(connection)
+            connection.push([_bulk(b'subscribe'), _bulk(channel), _integer(connection.subscriptions)])
+
+    def _command_psubscribe(self, connection, *patterns):
+        for pattern in patterns:
+            connection.patterns.add(pattern)
+            self._patterns[pattern].add(connection)
+            connection.push([_bulk(b'psubscribe'), _bulk(pattern), _integer(connection.subscriptions)])
+
+    def _command_unsubscribe(self, connection, *channels):
+        return self._unsubscribe(connection, b'unsubscribe', connection.channels, self._channels, channels)
+
+    def _command_punsubscribe(self, connection, *patterns):
+        return self._unsubscribe(connection, b'punsubscribe', connection.patterns, self._patterns, patterns)
+
+    def _unsubscribe(self, connection, kind, subscribed, subscribers, names):
+        names = names or list(subscribed)
+        if not names:
+            connection.push([_bulk(kind), connection.null(NIL), _integer(connection.subscriptions)])
+            return None
+        for name in names:
+            subscribed.discard(name)
+            subscribers[name].discard(connection)
+            connection.push([_bulk(kind), _bulk(name), _integer(connection.subscriptions)])
+
+
+class _Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        # RESP version, switched by HELLO.
+        self.protocol = 2
+        self.channels = set()
+        self.patterns = set()
+
+    def null(self, resp2_null):
+        """Get the null of the connection's RESP version, given the RESP2 one."""
+        return NULL if self.protocol == 3 else resp2_null
+
+    def push(self, encoded_values):
+        """Write out-of-band pub/sub data: an array in RESP2, a push frame in RESP3."""
+        self.writer.write(b'%b%d\r\n' % (b'>' if self.protocol == 3 else b'*', len(encoded_values))
+                          + b''.join(encoded_values))
+
+    @property
+    def subscriptions(self):
+        return len(self.channels) + len(self.patterns)
+
+
+async def _read_command(reader):
+    """Read a command as a :obj:`list` of :obj:`bytes` arguments, either a RESP array or an inline command."""
+    line = await reader.readuntil(b'\r\n')
+    if not line.startswith(b'*'):
+        return line.split()
+    arguments = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readuntil(b'\r\n')
+        length = int(header[1:-2])
+        arguments.append((await reader.readexactly(length + 2))[:-2])
+    return arguments
+
+
+def _bulk(value):
+    value = value if isinstance(value, bytes) else str(value).encode()
+    return b'$%d\r\n%b\r\n' % (len(value), value)
+
+
+def _integer(value):
+    return b':%d\r\n' % value
+
+
+def _error(message):
+    return f'-ERR {message}\r\n'.encode()
+
+
+def _array(values):
+    return _array_of_encoded([_bulk(value) for value in values])
+
+
+def _array_of_encoded(encoded_values):
+    return b'*%d\r\n' % len(encoded_values) + b''.join(encoded_values)
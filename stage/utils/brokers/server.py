@@ -0,0 +1,122 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Base of the broker stand-ins: an asyncio TCP server running its own event loop on a background thread.
+
+Servers listen on an ephemeral port by default, so tests running in parallel don't need to shard ports. SDC reaches
+them at :py:attr:`StandInServer.advertised_host`, which is the test host's address unless the
+``BROKER_STAND_IN_HOST`` environment variable is set, e.g. when SDC runs in a container on another network.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTUP_TIMEOUT_SEC = 30
+DEFAULT_CALL_TIMEOUT_SEC = 30
+# Bytes buffered for a client beyond which its connection waits for them to be sent.
+WRITE_BUFFER_HIGH_WATER_MARK = 4 * 1024 ** 2
+
+
+class StandInServer:
+    """Asyncio TCP server on its own event loop thread. Subclasses handle connections with :py:meth:`_handle`.
+
+    Args:
+        port (:obj:`int`, optional): Port to listen on. Default: ``0`` (an ephemeral port)
+        host (:obj:`str`, optional): Interface to listen on. Default: ``'0.0.0.0'``
+    """
+    name = 'stand-in'
+
+    def __init__(self, port=0, host='0.0.0.0'):
+        self.port = port
+        self.host = host
+        self.advertised_host = os.environ.get('BROKER_STAND_IN_HOST') or socket.gethostbyname(socket.gethostname())
+        self.connections = 0
+        self._writers = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+            for writer in self._writers:
+                writer.close()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, name=f'{self.name}-server', daemon=True)
+        self._thread.start()
+        if not started.wait(DEFAULT_STARTUP_TIMEOUT_SEC):
+            raise TimeoutError(f'{self.name} did not start listening on port {self.port}')
+        logger.info('%s listening on %s:%s', self.name, self.host, self.port)
+
+    def stop(self):
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def call(self, function, *args):
+        """Call a function on the server's event loop, e.g. to change broker state from the test's thread.
+
+        Returns:
+            What the function returns.
+        """
+        async def run():
+            return function(*args)
+        return asyncio.run_coroutine_threadsafe(run(), self._loop).result(DEFAULT_CALL_TIMEOUT_SEC)
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            await self._handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # Clients going away without closing their session are routine for a broker.
+            pass
+        except Exception:
+            logger.exception('%s connection failed', self.name)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        raise NotImplementedError
+
+
+async def drain_if_needed(writer):
+    """Wait for a client to read what was written to it if it's lagging behind, to bound the memory it takes."""
+    if writer.transport.get_write_buffer_size() > WRITE_BUFFER_HIGH_WATER_MARK:
+        await writer.drain()
@@ -0,0 +1,237 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers to load a large number of rows into a database table without materializing them in memory first.
+
+Rows are pulled from any iterable (usually a generator) in fixed-size chunks and handed to the fastest bulk path
+the database offers: ``COPY ... FROM STDIN`` for PostgreSQL, multi-row ``INSERT ... VALUES`` for MySQL and a plain
+``executemany`` for everything else. :py:class:`SeededTableCache` keeps seeded tables around so that benchmarks
+reading identical data don't have to seed it again.
+"""
+
+import csv
+import io
+import itertools
+import logging
+import string
+import uuid
+from collections import namedtuple, OrderedDict
+from time import perf_counter
+
+import sqlalchemy
+from streamsets.testframework.utils import get_random_string
+
+from stage.utils.sharding import shard_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10_000
+# How often (in rows) to log seeding progress.
+DEFAULT_PROGRESS_INTERVAL = 500_000
+# Upper bound of rows kept around by SeededTableCache across all of its tables.
+DEFAULT_CACHE_MAX_ROWS = 10_000_000
+
+SeedingResult = namedtuple('SeedingResult', ['table_name', 'number_of_rows', 'duration', 'rows_per_second'])
+
+
+def uuid_rows(number_of_rows, start=1):
+    """Lazily generate rows in the ``{'id': <int>, 'name': <uuid4 string>}`` shape used by the JDBC tests.
+
+    Args:
+        number_of_rows (:obj:`int`): Number of rows to generate.
+        start (:obj:`int`, optional): First id. Default: ``1``
+
+    Yields:
+        A :obj:`dict` per row.
+    """
+    for i in range(start, start + number_of_rows):
+        yield {'id': i, 'name': str(uuid.uuid4())}
+
+
+def chunked(iterable, chunk_size):
+    """Split an iterable into lists of at most ``chunk_size`` items without consuming it up front."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def seed_table(database, table, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """Insert rows into an existing table using the database's native bulk path.
+
+    Args:
+        database (:py:class:`streamsets.testframework.environments.databases.Database`): Database environment.
+        table (:py:class:`sqlalchemy.Table`): Table to insert into. It must already exist.
+        rows (:obj:`iterable`): Iterable of :obj:`dict` keyed by column name. Consumed lazily.
+        chunk_size (:obj:`int`, optional): Number of rows sent to the database at once.
+            Default: :py:const:`DEFAULT_CHUNK_SIZE`
+        progress_interval (:obj:`int`, optional): Log progress every this many rows.
+            Default: :py:const:`DEFAULT_PROGRESS_INTERVAL`
+
+    Returns:
+        An instance of :py:class:`SeedingResult`.
+    """
+    loader = _get_loader(database.engine.dialect.name)
+    logger.info('Seeding table %s in %s database using %s ...', table.name, database.type, loader.__name__)
+
+    number_of_rows = 0
+    next_progress = progress_interval
+    start = perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        loader(database.engine, table, chunk)
+        number_of_rows += len(chunk)
+        if number_of_rows >= next_progress:
+            elapsed = perf_counter() - start
+            logger.info('Seeded %s rows into %s (%.0f rows/sec) ...',
+                        number_of_rows, table.name, number_of_rows / elapsed if elapsed else 0)
+            next_progress += progress_interval
+    duration = perf_counter() - start
+
+    result = SeedingResult(table_name=table.name,
+                           number_of_rows=number_of_rows,
+                           duration=duration,
+                           rows_per_second=number_of_rows / duration if duration else 0)
+    logger.info('Seeded %s rows into %s in %.2f s (%.0f rows/sec)',
+                result.number_of_rows, result.table_name, result.duration, result.rows_per_second)
+    return result
+
+
+def _get_loader(dialect_name):
+    return {'postgresql': _copy_loader,
+            'mysql': _multi_values_loader}.get(dialect_name, _executemany_loader)
+
+
+def _copy_loader(engine, table, chunk):
+    """Stream a chunk through PostgreSQL's ``COPY ... FROM STDIN`` as CSV."""
+    preparer = engine.dialect.identifier_preparer
+    column_names = [column.name for column in table.columns]
+    statement = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        preparer.format_table(table), ', '.join(preparer.quote(name) for name in column_names)
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([row.get(name) for name in column_names] for row in chunk)
+    buffer.seek(0)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.copy_expert(statement, buffer)
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _multi_values_loader(engine, table, chunk):
+    """Send a chunk as a single ``INSERT ... VALUES (...), (...), ...`` statement."""
+    with engine.begin() as connection:
+        connection.execute(table.insert().values(chunk))
+
+
+def _executemany_loader(engine, table, chunk):
+    with engine.begin() as connection:
+        connection.execute(table.insert(), chunk)
+
+
+SeededTable = namedtuple('SeededTable', ['name', 'prefix', 'number_of_rows'])
+
+
+def uuid_columns():
+    """Columns matching the rows produced by :py:func:`uuid_rows`."""
+    return [sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+            sqlalchemy.Column('name', sqlalchemy.String(40))]
+
+
+class SeededTableCache:
+    """Cache of seeded tables shared by benchmarks that only read from them.
+
+    A table is created and seeded the first time a (database, schema, number of rows) combination is requested and
+    every later request gets the same table back. Once the total number of cached rows goes over ``max_rows``, the
+    least recently used tables are dropped. Consumers must treat the tables as read-only.
+
+    Args:
+        max_rows (:obj:`int`, optional): Upper bound of rows kept across all cached tables.
+            Default: :py:const:`DEFAULT_CACHE_MAX_ROWS`
+    """
+    def __init__(self, max_rows=None):
+        self.max_rows = max_rows or DEFAULT_CACHE_MAX_ROWS
+        # Key -> (database, sqlalchemy.Table, SeededTable), ordered from least to most recently used.
+        self._tables = OrderedDict()
+
+    @property
+    def total_rows(self):
+        return sum(seeded_table.number_of_rows for _, _, seeded_table in self._tables.values())
+
+    def get(self, database, number_of_rows, columns=uuid_columns, rows=uuid_rows):
+        """Get a table with ``number_of_rows`` rows, creating and seeding it if it's not cached yet.
+
+        Table names start with a random prefix unique to the table, so ``'{prefix}%'`` can be used as the
+        JDBC Multitable Consumer table pattern.
+
+        Args:
+            database (:py:class:`streamsets.testframework.environments.databases.Database`): Database environment.
+            number_of_rows (:obj:`int`): Number of rows in the table.
+            columns (:obj:`callable`, optional): Returns a fresh list of :py:class:`sqlalchemy.Column` instances.
+                Default: :py:func:`uuid_columns`
+            rows (:obj:`callable`, optional): Takes the number of rows and returns an iterable of rows.
+                Default: :py:func:`uuid_rows`
+
+        Returns:
+            An instance of :py:class:`SeededTable`.
+        """
+        table_columns = columns()
+        key = (database.type,
+               str(database.engine.url),
+               tuple((column.name, repr(column.type), column.primary_key) for column in table_columns),
+               rows.__qualname__,
+               number_of_rows)
+        if key in self._tables:
+            self._tables.move_to_end(key)
+            seeded_table = self._tables[key][2]
+            logger.info('Reusing seeded table %s (%s rows)', seeded_table.name, number_of_rows)
+            return seeded_table
+
+        prefix = shard_name(get_random_string(string.ascii_lowercase, 6))
+        name = '{}_{}'.format(prefix, get_random_string(string.ascii_lowercase, 20))
+        table = sqlalchemy.Table(name, sqlalchemy.MetaData(), *table_columns)
+        logger.info('Creating table %s in %s database ...', name, database.type)
+        table.create(database.engine)
+        try:
+            seed_table(database, table, rows(number_of_rows))
+        except Exception:
+            table.drop(database.engine)
+            raise
+
+        seeded_table = SeededTable(name=name, prefix=prefix, number_of_rows=number_of_rows)
+        self._tables[key] = (database, table, seeded_table)
+        self._evict()
+        return seeded_table
+
+    def clear(self):
+        """Drop all cached tables."""
+        while self._tables:
+            self._drop(*self._tables.popitem(last=False)[1])
+
+    def _evict(self):
+        # Never evict the most recently used table; it was just handed out.
+        while len(self._tables) > 1 and self.total_rows > self.max_rows:
+            self._drop(*self._tables.popitem(last=False)[1])
+
+    def _drop(self, database, table, seeded_table):
+        logger.info('Dropping seeded table %s in %s database ...', seeded_table.name, database.type)
+        table.drop(database.engine)
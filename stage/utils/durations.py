@@ -0,0 +1,271 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+pytest plugin recording test durations into a SQLite database across runs.
+
+For every test, the setup, call and teardown durations are stored along with the time spent inside Data Collector
+calls (adding, starting, stopping and removing pipelines, capturing snapshots, and all ``wait_for_*`` helpers),
+so that fixture overhead and time spent waiting on SDC can be told apart from the test's own work. Enable it with::
+
+    $ pytest -p stage.utils.durations --durations-db durations.sqlite --durations-top 20 stage/
+
+and report on the collected history offline with::
+
+    $ python -m stage.utils.durations --db durations.sqlite --top 20
+
+The database also feeds :py:mod:`stage.utils.sharding` (``--durations durations.sqlite``).
+"""
+
+import argparse
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP = 20
+# Number of most recent runs averaged when estimating durations and shown in trends.
+DEFAULT_HISTORY_RUNS = 5
+PHASES = ('setup', 'call', 'teardown')
+# (module, class) pairs whose methods are timed as SDC calls; missing ones are skipped.
+TIMED_CLASSES = (('streamsets.testframework.sdc', 'DataCollector'),
+                 ('streamsets.sdk.sdc', 'DataCollector'),
+                 ('streamsets.sdk.sdc_api', None),
+                 ('stage.utils.waiting', 'PipelineWaiter'))
+TIMED_METHODS = ('add_pipeline', 'start_pipeline', 'stop_pipeline', 'remove_pipeline', 'capture_snapshot',
+                 'reset_origin', 'get_pipeline_history')
+TIMED_METHOD_PREFIX = 'wait_for'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started_at TEXT, args TEXT);
+    CREATE TABLE IF NOT EXISTS phases (run_id INTEGER, nodeid TEXT, module TEXT, phase TEXT, seconds REAL,
+                                       outcome TEXT);
+    CREATE TABLE IF NOT EXISTS sdc_calls (run_id INTEGER, nodeid TEXT, name TEXT, calls INTEGER, seconds REAL);
+    CREATE INDEX IF NOT EXISTS phases_nodeid ON phases (nodeid);
+"""
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('durations-db')
+    group.addoption('--durations-db', help='SQLite database to record test durations into')
+    group.addoption('--durations-top', type=int, default=0, help='Show the N slowest tests of the run at the end')
+
+
+def pytest_configure(config):
+    if config.getoption('durations_db'):
+        config.pluginmanager.register(DurationRecorder(config.getoption('durations_db'),
+                                                       config.getoption('durations_top')),
+                                      'duration-recorder')
+
+
+class DurationRecorder:
+    """pytest plugin object writing durations of the current run into the database.
+
+    Args:
+        path (:obj:`str`): Path of the SQLite database. Created if it doesn't exist.
+        top (:obj:`int`): Number of slowest tests to show in the terminal summary.
+    """
+    def __init__(self, path, top=0):
+        self.path = path
+        self.top = top
+        self.connection = connect(path)
+        self.run_id = self.connection.execute('INSERT INTO runs (started_at, args) VALUES (?, ?)',
+                                              (datetime.utcnow().isoformat(), ' '.join(sys.argv[1:]))).lastrowid
+        self.timer = SdcCallTimer()
+
+    def pytest_sessionstart(self, session):
+        self.timer.install()
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.timer.start()
+
+    def pytest_runtest_logreport(self, report):
+        self.connection.execute('INSERT INTO phases VALUES (?, ?, ?, ?, ?, ?)',
+                                (self.run_id, report.nodeid, report.nodeid.split('::')[0], report.when,
+                                 report.duration, report.outcome))
+        if report.when == 'teardown':
+            self.connection.executemany('INSERT INTO sdc_calls VALUES (?, ?, ?, ?, ?)',
+                                        [(self.run_id, report.nodeid, name, calls, seconds)
+                                         for name, (calls, seconds) in self.timer.stop().items()])
+            self.connection.commit()
+
+    def pytest_sessionfinish(self, session):
+        self.timer.uninstall()
+        self.connection.commit()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.top:
+            terminalreporter.write_sep('=', f'{self.top} slowest tests (recorded in {self.path})')
+            terminalreporter.write_line(format_slowest(self.connection, self.run_id, self.top))
+        self.connection.close()
+
+
+class SdcCallTimer:
+    """Time calls to SDC-facing methods made on the main thread, attributing them to the current test.
+
+    Only the outermost timed call is counted, e.g. the ``start_pipeline`` inside ``capture_snapshot`` isn't.
+    """
+    def __init__(self):
+        self._originals = []
+        self._calls = None
+        self._depth = 0
+
+    def install(self):
+        for module_name, class_name in TIMED_CLASSES:
+            try:
+                module = __import__(module_name, fromlist=['_'])
+            except ImportError:
+                continue
+            classes = ([getattr(module, class_name, None)] if class_name
+                       else [cls for _, cls in inspect.getmembers(module, inspect.isclass)
+                             if cls.__module__ == module_name])
+            for cls in filter(None, classes):
+                for name, method in list(vars(cls).items()):
+                    if inspect.isfunction(method) and (name in TIMED_METHODS or name.startswith(TIMED_METHOD_PREFIX)):
+                        self._originals.append((cls, name, method))
+                        setattr(cls, name, self._wrap(name, method))
+
+    def uninstall(self):
+        while self._originals:
+            cls, name, method = self._originals.pop()
+            setattr(cls, name, method)
+
+    def start(self):
+        self._calls = defaultdict(lambda: [0, 0.0])
+
+    def stop(self):
+        calls, self._calls = self._calls or {}, None
+        return {name: tuple(value) for name, value in calls.items()}
+
+    def _wrap(self, name, method):
+        timer = self
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if (timer._calls is None or timer._depth
+                    or threading.current_thread() is not threading.main_thread()):
+                return method(*args, **kwargs)
+            timer._depth += 1
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timer._depth -= 1
+                if timer._calls is not None:
+                    timer._calls[name][0] += 1
+                    timer._calls[name][1] += perf_counter() - start
+        return wrapper
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def load_module_durations(path, history_runs=DEFAULT_HISTORY_RUNS):
+    """Average total duration of each test module over its most recent runs.
+
+    Args:
+        path (:obj:`str`): Path of the SQLite database.
+        history_runs (:obj:`int`, optional): Number of most recent runs of a module to average.
+            Default: :py:const:`DEFAULT_HISTORY_RUNS`
+
+    Returns:
+        A :obj:`dict` of module path to seconds.
+    """
+    connection = connect(path)
+    rows = connection.execute('SELECT module, run_id, SUM(seconds) FROM phases GROUP BY module, run_id '
+                              'ORDER BY module, run_id DESC').fetchall()
+    connection.close()
+    totals = defaultdict(list)
+    for module, _, seconds in rows:
+        if len(totals[module]) < history_runs:
+            totals[module].append(seconds)
+    return {os.path.normpath(module): sum(seconds) / len(seconds) for module, seconds in totals.items()}
+
+
+def format_slowest(connection, run_id, top=DEFAULT_TOP):
+    """Table of the slowest tests of a run with their per-phase and SDC call times."""
+    rows = connection.execute("""
+        SELECT p.nodeid,
+               SUM(p.seconds),
+               SUM(CASE WHEN p.phase = 'setup' THEN p.seconds ELSE 0 END),
+               SUM(CASE WHEN p.phase = 'call' THEN p.seconds ELSE 0 END),
+               SUM(CASE WHEN p.phase = 'teardown' THEN p.seconds ELSE 0 END),
+               (SELECT COALESCE(SUM(c.seconds), 0) FROM sdc_calls c WHERE c.run_id = p.run_id AND c.nodeid = p.nodeid)
+        FROM phases p WHERE p.run_id = ? GROUP BY p.nodeid ORDER BY 2 DESC LIMIT ?
+    """, (run_id, top)).fetchall()
+    lines = [f'{"total":>9} {"setup":>9} {"call":>9} {"teardown":>9} {"in SDC":>9}  test']
+    lines.extend(f'{total:9.2f} {setup:9.2f} {call:9.2f} {teardown:9.2f} {sdc:9.2f}  {nodeid}'
+                 for nodeid, total, setup, call, teardown, sdc in rows)
+    return '\n'.join(lines)
+
+
+def format_report(connection, top=DEFAULT_TOP, history_runs=DEFAULT_HISTORY_RUNS):
+    """Report on the latest run: slowest tests, time per phase and per SDC call, and trends of the slowest tests."""
+    run_id = connection.execute('SELECT MAX(id) FROM runs WHERE id IN (SELECT run_id FROM phases)').fetchone()[0]
+    if run_id is None:
+        return 'No recorded runs.'
+
+    sections = [f'Slowest {top} tests of run {run_id}:', format_slowest(connection, run_id, top), '',
+                'Time per phase:']
+    phase_totals = dict(connection.execute('SELECT phase, SUM(seconds) FROM phases WHERE run_id = ? GROUP BY phase',
+                                           (run_id,)).fetchall())
+    total = sum(phase_totals.values()) or 1
+    sections.extend(f'  {phase:<9} {phase_totals.get(phase, 0):10.2f} s ({phase_totals.get(phase, 0) / total:.0%})'
+                    for phase in PHASES)
+
+    sections.extend(['', 'Time in SDC calls:'])
+    sections.extend(f'  {name:<40} {calls:6} calls {seconds:10.2f} s'
+                    for name, calls, seconds in connection.execute(
+                        'SELECT name, SUM(calls), SUM(seconds) FROM sdc_calls WHERE run_id = ? '
+                        'GROUP BY name ORDER BY 3 DESC', (run_id,)).fetchall())
+
+    sections.extend(['', f'Trends of the slowest tests over their last {history_runs} runs (oldest first):'])
+    slowest = [nodeid for nodeid, in connection.execute(
+        'SELECT nodeid FROM phases WHERE run_id = ? GROUP BY nodeid ORDER BY SUM(seconds) DESC LIMIT ?',
+        (run_id, top)).fetchall()]
+    for nodeid in slowest:
+        history = [seconds for _, seconds in connection.execute(
+            'SELECT run_id, SUM(seconds) FROM phases WHERE nodeid = ? GROUP BY run_id ORDER BY run_id DESC LIMIT ?',
+            (nodeid, history_runs)).fetchall()][::-1]
+        change = f'{history[-1] / history[0] - 1:+.0%}' if len(history) > 1 and history[0] else 'n/a'
+        sections.append(f'  {" ".join(f"{seconds:.1f}" for seconds in history):<40} {change:>6}  {nodeid}')
+    return '\n'.join(sections)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Report on test durations recorded by stage.utils.durations')
+    parser.add_argument('--db', required=True, help='SQLite database')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP)
+    parser.add_argument('--history-runs', type=int, default=DEFAULT_HISTORY_RUNS)
+    parsed_args = parser.parse_args(args)
+
+    connection = connect(parsed_args.db)
+    print(format_report(connection, top=parsed_args.top, history_runs=parsed_args.history_runs))
+    connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
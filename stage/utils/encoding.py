@@ -0,0 +1,235 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Host-side encoding of records into messages, for tests producing data for SDC's origins (e.g. to Kafka).
+
+Encoders are cached by data format and schema, so Avro schemas are parsed once and the same ``DatumWriter`` and
+protobuf message are reused by every call. :py:func:`encode_many` writes all records into one reused buffer and
+slices it into messages at the end, instead of allocating a buffer and an encoder per message::
+
+    messages = encode_many(records, 'AVRO', schema=SCHEMA)
+
+Supported data formats are:
+
+- ``AVRO``: a binary-encoded datum per record, to be read with the schema inline;
+- ``AVRO_WITHOUT_SCHEMA``: an object container file (which embeds the schema) per record;
+- ``PROTOBUF``: a serialized message of a type from ``resources/protobuf/addressbook.proto`` per record, optionally
+  prefixed with its varint-encoded length (SDC's ``delimited_messages``). It needs a protobuf package that can load
+  the generated ``addressbook_pb2``, see :py:func:`protobuf_available`;
+- anything else: records that are :obj:`bytes` already, or :obj:`str` encoded as UTF-8.
+
+Cached encoders share their buffers, so they must not be used from several threads at once.
+"""
+
+import functools
+import io
+import json
+import logging
+
+import avro
+from avro.datafile import DataFileWriter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROTOBUF_MESSAGE_TYPE = 'Contact'
+
+
+def encode(record, data_format, **kwargs):
+    """Encode a record into a message.
+
+    Args:
+        record: Record to encode, e.g. a :obj:`dict` for ``AVRO`` or ``PROTOBUF``.
+        data_format (:obj:`str`): Data format.
+        **kwargs: Arguments of :py:func:`get_encoder`.
+
+    Returns:
+        The message as :obj:`bytes`.
+    """
+    return get_encoder(data_format, **kwargs).encode(record)
+
+
+def encode_many(records, data_format, **kwargs):
+    """Encode records into a message each.
+
+    Args:
+        records (:obj:`iterable`): Records to encode.
+        data_format (:obj:`str`): Data format.
+        **kwargs: Arguments of :py:func:`get_encoder`.
+
+    Returns:
+        A :obj:`list` of messages as :obj:`bytes`.
+    """
+    return get_encoder(data_format, **kwargs).encode_many(records)
+
+
+def get_encoder(data_format, schema=None, message_type=DEFAULT_PROTOBUF_MESSAGE_TYPE, delimited=False):
+    """Get the cached encoder of a data format.
+
+    Args:
+        data_format (:obj:`str`): Data format.
+        schema (:obj:`dict` or :obj:`str`, optional): Avro schema, required by the ``AVRO`` formats. Default: ``None``
+        message_type (:obj:`str`, optional): Protobuf message type. Default: :py:const:`DEFAULT_PROTOBUF_MESSAGE_TYPE`
+        delimited (:obj:`bool`, optional): Prefix protobuf messages with their length. Default: ``False``
+
+    Returns:
+        An encoder with ``encode(record)`` and ``encode_many(records)`` methods.
+    """
+    if data_format in ('AVRO', 'AVRO_WITHOUT_SCHEMA'):
+        if schema is None:
+            raise ValueError(f'An Avro schema is required to encode {data_format}')
+        return _get_avro_encoder(data_format, _canonical_schema(schema))
+    if data_format == 'PROTOBUF':
+        return _get_protobuf_encoder(message_type, delimited)
+    return _BYTES_ENCODER
+
+
+@functools.lru_cache(maxsize=None)
+def parse_avro_schema(schema_json):
+    """Parse an Avro schema, once per distinct schema.
+
+    Args:
+        schema_json (:obj:`str`): Schema as JSON.
+
+    Returns:
+        An :py:class:`avro.schema.Schema`.
+    """
+    return avro.schema.Parse(schema_json)
+
+
+class _Encoder:
+    """Base of the encoders, writing records one after another into a reused buffer."""
+    def __init__(self):
+        self._buffer = io.BytesIO()
+
+    def encode(self, record):
+        return self.encode_many([record])[0]
+
+    def encode_many(self, records):
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        offsets = [0]
+        for record in records:
+            self._write(record, buffer)
+            offsets.append(buffer.tell())
+        # Slice messages out of a view of the buffer, so that its content is only copied once.
+        view = buffer.getbuffer()
+        try:
+            return [bytes(view[start:end]) for start, end in zip(offsets, offsets[1:])]
+        finally:
+            view.release()
+
+    def _write(self, record, buffer):
+        raise NotImplementedError
+
+
+class _BytesEncoder(_Encoder):
+    def _write(self, record, buffer):
+        buffer.write(record.encode() if isinstance(record, str) else record)
+
+
+class _AvroEncoder(_Encoder):
+    def __init__(self, schema):
+        super().__init__()
+        self._datum_writer = avro.io.DatumWriter(schema)
+        self._encoder = avro.io.BinaryEncoder(self._buffer)
+
+    def _write(self, record, buffer):
+        self._datum_writer.write(record, self._encoder)
+
+
+class _AvroContainerEncoder(_Encoder):
+    def __init__(self, schema):
+        super().__init__()
+        self._schema = schema
+        self._datum_writer = avro.io.DatumWriter(schema)
+
+    def _write(self, record, buffer):
+        # Every message is a whole container file with a header of its own, and closing the writer would close the
+        # shared buffer, so each one is written to a buffer of its own first.
+        container = io.BytesIO()
+        data_file_writer = DataFileWriter(writer=container, datum_writer=self._datum_writer,
+                                          writer_schema=self._schema)
+        data_file_writer.append(record)
+        data_file_writer.flush()
+        buffer.write(container.getvalue())
+        data_file_writer.close()
+
+
+class _ProtobufEncoder(_Encoder):
+    def __init__(self, message_type, delimited):
+        super().__init__()
+        addressbook_pb2 = _import_addressbook_pb2()
+        if addressbook_pb2 is None:
+            raise Exception('Encoding PROTOBUF requires a protobuf package compatible with addressbook_pb2')
+        self._message = getattr(addressbook_pb2, message_type)()
+        self._delimited = delimited
+
+    def _write(self, record, buffer):
+        message = self._message
+        message.Clear()
+        for name, value in record.items():
+            setattr(message, name, value)
+        serialized = message.SerializeToString()
+        if self._delimited:
+            buffer.write(_encode_varint(len(serialized)))
+        buffer.write(serialized)
+
+
+_BYTES_ENCODER = _BytesEncoder()
+
+
+def protobuf_available():
+    """Whether ``PROTOBUF`` messages can be encoded on the host.
+
+    Returns:
+        ``False`` if the protobuf package is missing or can't load ``addressbook_pb2``, ``True`` otherwise.
+    """
+    return _import_addressbook_pb2() is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _import_addressbook_pb2():
+    try:
+        from resources.protobuf import addressbook_pb2
+    except Exception as e:
+        # Besides a missing package, descriptors generated by an old protoc raise a TypeError with protobuf 4+.
+        logger.debug('Cannot import addressbook_pb2: %s', e)
+        return None
+    return addressbook_pb2
+
+
+@functools.lru_cache(maxsize=None)
+def _get_avro_encoder(data_format, schema_json):
+    schema = parse_avro_schema(schema_json)
+    return _AvroEncoder(schema) if data_format == 'AVRO' else _AvroContainerEncoder(schema)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_protobuf_encoder(message_type, delimited):
+    return _ProtobufEncoder(message_type, delimited)
+
+
+def _canonical_schema(schema):
+    return schema if isinstance(schema, str) else json.dumps(schema, sort_keys=True)
+
+
+def _encode_varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
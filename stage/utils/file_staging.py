@@ -0,0 +1,188 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers to put files on, and run shell commands against, the host SDC runs on.
+
+When SDC runs in a local Docker container, files are shipped in a single tar stream (``put_archive``) and shell
+commands go through ``exec_run``, with no pipeline involved. Directories shared with the container through a bind
+mount are written straight to the local filesystem. For any other SDC, e.g. a remote one, a single
+Jython or Shell pipeline does the work instead.
+"""
+
+import base64
+import io
+import logging
+import os
+import tarfile
+import textwrap
+import time
+
+from streamsets.sdk.models import Configuration
+
+from stage.utils.waiting import PipelineWaiter
+
+logger = logging.getLogger(__name__)
+
+# Staged files and directories are world-writable so that SDC (not running as root) can delete and move them.
+FILE_MODE = 0o666
+DIRECTORY_MODE = 0o777
+PIPELINE_TIMEOUT_SEC = 600
+
+FILES_WRITER_SCRIPT = """
+    import base64
+    import os
+
+    files = {files}
+    for record in records:
+        for path, contents in files.items():
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(contents))
+"""
+
+
+class FileStager:
+    """Write files to, and run shell commands on, the SDC host.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector whose host to use.
+        bind_mounts (:obj:`dict`, optional): Container path to local path of directories shared with the
+            SDC container. Default: ``None``
+    """
+    def __init__(self, sdc_executor, bind_mounts=None):
+        self.sdc_executor = sdc_executor
+        self.bind_mounts = bind_mounts or {}
+        container = getattr(sdc_executor, 'container', None)
+        self.container = container if hasattr(container, 'put_archive') else None
+
+    def write_file(self, path, contents, encoding='utf8'):
+        """Write a single file. See :py:meth:`write_files`."""
+        self.write_files(os.path.dirname(path), {os.path.basename(path): contents}, encoding=encoding)
+
+    def write_files(self, directory, files, encoding='utf8'):
+        """Write many files in one go, creating ``directory`` and any subdirectories as needed.
+
+        Args:
+            directory (:obj:`str`): Absolute path of the directory on the SDC host.
+            files (:obj:`dict`): Path relative to ``directory`` to contents, as :obj:`bytes` or :obj:`str`.
+            encoding (:obj:`str`, optional): Encoding of :obj:`str` contents. Default: ``'utf8'``
+        """
+        files = {name: contents if isinstance(contents, bytes) else contents.encode(encoding)
+                 for name, contents in files.items()}
+        start = time.perf_counter()
+        local_directory = self._get_local_directory(directory)
+        if local_directory:
+            method = 'bind mount'
+            for name, contents in files.items():
+                path = os.path.join(local_directory, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(contents)
+        elif self.container:
+            method = 'put_archive'
+            self._put_archive(directory, files)
+        else:
+            method = 'pipeline'
+            script = textwrap.dedent(FILES_WRITER_SCRIPT).format(
+                files={os.path.join(directory, name): base64.b64encode(contents).decode()
+                       for name, contents in files.items()}
+            )
+            self._run_jython_pipeline(script)
+        logger.debug('Wrote %s files to %s using %s in %.2f s',
+                     len(files), directory, method, time.perf_counter() - start)
+
+    def run_shell(self, script, environment_variables=None):
+        """Run a shell script on the SDC host.
+
+        Args:
+            script (:obj:`str`): Script to run with ``sh``.
+            environment_variables (:obj:`dict`, optional): Environment variables of the script. Default: ``None``
+        """
+        if self.container and hasattr(self.container, 'exec_run'):
+            exit_code, output = self.container.exec_run(['sh', '-c', script], environment=environment_variables)
+            if exit_code:
+                logger.warning('Shell script exited with %s: %s', exit_code, output)
+            return
+
+        builder = self.sdc_executor.get_pipeline_builder()
+        dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+        dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='noop', stop_after_first_batch=True)
+        shell = builder.add_stage('Shell')
+        shell.set_attributes(script=script,
+                             environment_variables=(Configuration(**environment_variables)._data
+                                                    if environment_variables
+                                                    else []))
+        trash = builder.add_stage('Trash')
+        dev_raw_data_source >> [trash, shell]
+        self._run_pipeline(builder.build('Shell executor pipeline'))
+
+    def _get_local_directory(self, directory):
+        for container_path, local_path in self.bind_mounts.items():
+            relative_path = os.path.relpath(directory, container_path)
+            if not relative_path.startswith(os.pardir):
+                return os.path.normpath(os.path.join(local_path, relative_path))
+
+    def _put_archive(self, directory, files, parents=()):
+        """Extract a tar stream of ``files`` into ``directory``. If it doesn't exist, the archive is extracted into
+        the closest existing ancestor instead, with entries for the missing ``parents`` directories.
+        """
+        archive = io.BytesIO()
+        mtime = time.time()
+        with tarfile.open(fileobj=archive, mode='w') as tar:
+            for name in _get_directories(parents, files):
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.type, tarinfo.mode, tarinfo.mtime = tarfile.DIRTYPE, DIRECTORY_MODE, mtime
+                tar.addfile(tarinfo)
+            for name, contents in files.items():
+                tarinfo = tarfile.TarInfo(os.path.join(*parents, name))
+                tarinfo.size, tarinfo.mode, tarinfo.mtime = len(contents), FILE_MODE, mtime
+                tar.addfile(tarinfo, io.BytesIO(contents))
+
+        try:
+            self.container.put_archive(directory, archive.getvalue())
+        except Exception as exception:
+            if getattr(getattr(exception, 'response', None), 'status_code', None) != 404 or directory == '/':
+                raise
+            parent, missing = os.path.split(directory.rstrip('/'))
+            self._put_archive(parent or '/', files, (missing,) + tuple(parents))
+
+    def _run_jython_pipeline(self, script):
+        builder = self.sdc_executor.get_pipeline_builder()
+        dev_raw_data_source = builder.add_stage('Dev Raw Data Source')
+        dev_raw_data_source.set_attributes(data_format='TEXT', raw_data='noop', stop_after_first_batch=True)
+        jython_evaluator = builder.add_stage('Jython Evaluator')
+        jython_evaluator.script = script
+        trash = builder.add_stage('Trash')
+        dev_raw_data_source >> jython_evaluator >> trash
+        self._run_pipeline(builder.build('File writer pipeline'))
+
+    def _run_pipeline(self, pipeline):
+        self.sdc_executor.add_pipeline(pipeline)
+        self.sdc_executor.start_pipeline(pipeline)
+        PipelineWaiter(self.sdc_executor).wait_for_finished(pipeline, timeout_sec=PIPELINE_TIMEOUT_SEC)
+        self.sdc_executor.remove_pipeline(pipeline)
+
+
+def _get_directories(parents, files):
+    """Archive entries of the missing parent directories and of every subdirectory of ``files``, parents first."""
+    directories = {os.path.join(*parents[:i]) for i in range(1, len(parents) + 1)}
+    for name in files:
+        path = os.path.dirname(name)
+        while path:
+            directories.add(os.path.join(*parents, path))
+            path = os.path.dirname(path)
+    return sorted(directories, key=lambda directory: directory.count('/'))
@@ -0,0 +1,250 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End-to-end latency probe for messaging stages (Kafka, Pulsar, JMS, MQTT, ...).
+
+:py:class:`LatencyProbe` stamps every message a test produces with a sequence id and its send time, both as a
+monotonic clock reading (``sent_ns``) and as wall clock milliseconds (``sent_ms``). A :py:class:`ProbeReceiver`
+computes the latency of the messages it gets back and detects missing and duplicated ones from their sequence ids:
+
+- messages received by the test process itself (e.g. read back from a topic a pipeline wrote to) are passed to
+  :py:meth:`ProbeReceiver.receive`, which uses the monotonic clock, shared by all processes of a host;
+- records received by a pipeline are processed by a JavaScript Evaluator running :py:const:`RECORD_LATENCY_SCRIPT`
+  and passed from a snapshot to :py:meth:`ProbeReceiver.receive_records`. These latencies come from the wall clocks
+  of SDC and the test host, which are assumed to agree, as they do with a local SDC container.
+
+Latencies are kept in a :py:class:`LatencyHistogram`, so millions of them take constant memory::
+
+    probe, receiver = LatencyProbe(), ProbeReceiver()
+    for _ in range(100_000):
+        producer.send(topic, probe.encode(payload='x' * 100))
+    for message in consumer:
+        receiver.receive(message.value)
+    report = receiver.report(expected_messages=probe.sent)
+    assert report['missing'] == report['duplicates'] == 0
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from stage.utils.record_tables import RecordTable
+
+SEQUENCE_FIELD = 'seq'
+SENT_TIME_FIELD = 'sent_ms'
+MONOTONIC_SENT_TIME_FIELD = 'sent_ns'
+RECORD_LATENCY_FIELD = 'latency_ms'
+# JavaScript Evaluator script adding the time in milliseconds between a record being sent (its ``sent_ms`` field) and
+# it being processed.
+RECORD_LATENCY_SCRIPT = f"""
+    for (var i = 0; i < records.length; i++) {{
+      records[i].value['{RECORD_LATENCY_FIELD}'] = Date.now() - records[i].value['{SENT_TIME_FIELD}'];
+      output.write(records[i]);
+    }}
+"""
+PERCENTILES = (50, 90, 99, 99.9)
+DEFAULT_SIGNIFICANT_DIGITS = 3
+# Gaps listed by reports, beyond which they're only counted.
+MAX_REPORTED_GAPS = 20
+
+
+class LatencyHistogram:
+    """Latencies bucketed with a bounded relative error, in the manner of HdrHistogram.
+
+    Latencies are counted in microseconds: exactly below ``2 * 10 ** significant_digits`` and, above that, in buckets
+    whose width doubles with every power of two, so that every value is within ``10 ** -significant_digits`` of the
+    value it's reported as.
+
+    Args:
+        significant_digits (:obj:`int`, optional): Precision of recorded values.
+            Default: :py:const:`DEFAULT_SIGNIFICANT_DIGITS`
+    """
+    def __init__(self, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+        self.significant_digits = significant_digits
+        self._sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self._sub_bucket_count = 2 ** self._sub_bucket_bits
+        self._half_count = self._sub_bucket_count // 2
+        self.counts = Counter()
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def __len__(self):
+        return self.count
+
+    def record(self, seconds, count=1):
+        """Count a latency in seconds; negative ones, from clocks disagreeing, count as 0."""
+        value = max(round(seconds * 1_000_000), 0)
+        self.counts[self._get_index(value)] += count
+        self.count += count
+        self.total_us += value * count
+        self.min_us = value if self.min_us is None else min(self.min_us, value)
+        self.max_us = value if self.max_us is None else max(self.max_us, value)
+
+    def merge(self, other):
+        """Add the counts of another histogram of the same precision."""
+        if other.significant_digits != self.significant_digits:
+            raise ValueError('Histograms of different precisions cannot be merged')
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total_us += other.total_us
+        for value in (other.min_us, other.max_us):
+            if value is not None:
+                self.min_us = value if self.min_us is None else min(self.min_us, value)
+                self.max_us = value if self.max_us is None else max(self.max_us, value)
+
+    def value_at_percentile(self, percentile):
+        """Nearest-rank percentile in seconds, ``None`` if nothing was recorded."""
+        if not self.count:
+            return None
+        rank = max(math.ceil(percentile / 100 * self.count), 1)
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= rank:
+                return min(self._get_highest_equivalent_value(index), self.max_us) / 1_000_000
+
+    def summary(self, percentiles=PERCENTILES):
+        """Get ``count``, ``mean_ms``, ``min_ms``, ``max_ms`` and a ``p<N>_ms`` per percentile, e.g. ``p999_ms`` for
+        the 99.9th.
+        """
+        if not self.count:
+            return dict(count=0)
+        summary = dict(count=self.count,
+                       mean_ms=self.total_us / self.count / 1000,
+                       min_ms=self.min_us / 1000,
+                       max_ms=self.max_us / 1000)
+        summary.update({f'p{str(percentile).replace(".", "")}_ms': self.value_at_percentile(percentile) * 1000
+                        for percentile in percentiles})
+        return summary
+
+    def _get_index(self, value):
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self._sub_bucket_bits
+        return self._sub_bucket_count + (shift - 1) * self._half_count + (value >> shift) - self._half_count
+
+    def _get_highest_equivalent_value(self, index):
+        if index < self._sub_bucket_count:
+            return index
+        shift, sub_bucket = divmod(index - self._sub_bucket_count, self._half_count)
+        shift += 1
+        return ((sub_bucket + self._half_count + 1) << shift) - 1
+
+
+class LatencyProbe:
+    """Stamp messages with a sequence id and their send time. Can be shared by several sending threads."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+
+    def message(self, **fields):
+        """Get a message as a :obj:`dict` of the given fields, :py:const:`SEQUENCE_FIELD`,
+        :py:const:`SENT_TIME_FIELD` and :py:const:`MONOTONIC_SENT_TIME_FIELD`.
+        """
+        with self._lock:
+            sequence = self.sent
+            self.sent += 1
+        return dict(fields, **{SEQUENCE_FIELD: sequence,
+                               SENT_TIME_FIELD: int(time.time() * 1000),
+                               MONOTONIC_SENT_TIME_FIELD: time.monotonic_ns()})
+
+    def encode(self, **fields):
+        """Get a message as JSON :obj:`bytes`, see :py:meth:`message`."""
+        return json.dumps(self.message(**fields)).encode()
+
+
+class ProbeReceiver:
+    """Compute the latency of messages stamped by a :py:class:`LatencyProbe` and keep track of their sequence ids.
+
+    Args:
+        significant_digits (:obj:`int`, optional): Precision of the latency histogram.
+            Default: :py:const:`DEFAULT_SIGNIFICANT_DIGITS`
+    """
+    def __init__(self, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+        self.histogram = LatencyHistogram(significant_digits)
+        self.messages = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        # One byte per sequence id, set once it's been received.
+        self._received = bytearray()
+        self._max_sequence = -1
+
+    def receive(self, message, received_ns=None):
+        """Receive a message of the probe.
+
+        Args:
+            message (:obj:`dict`, :obj:`str` or :obj:`bytes`): Message, as a :obj:`dict` or JSON.
+            received_ns (:obj:`int`, optional): Monotonic time it was received at. Default: now
+        """
+        received_ns = received_ns or time.monotonic_ns()
+        received_ms = time.time() * 1000
+        if not isinstance(message, dict):
+            message = json.loads(message)
+        if MONOTONIC_SENT_TIME_FIELD in message:
+            latency = (received_ns - message[MONOTONIC_SENT_TIME_FIELD]) / 1_000_000_000
+        else:
+            latency = (received_ms - message[SENT_TIME_FIELD]) / 1000
+        self.add(message[SEQUENCE_FIELD], latency)
+
+    def receive_records(self, records):
+        """Receive records processed by :py:const:`RECORD_LATENCY_SCRIPT`, e.g. the output of a snapshot.
+
+        Args:
+            records (:obj:`iterable`): Records, as returned by :py:meth:`stage.utils.snapshots.SnapshotReader.output`
+                or by the SDK.
+        """
+        table = RecordTable.from_records(records, [SEQUENCE_FIELD, RECORD_LATENCY_FIELD])
+        for sequence, latency_ms in table.rows(SEQUENCE_FIELD, RECORD_LATENCY_FIELD):
+            if sequence is not None and latency_ms is not None:
+                self.add(sequence, latency_ms / 1000)
+
+    def add(self, sequence, seconds):
+        """Count a message of a sequence id and latency in seconds."""
+        with self._lock:
+            self.messages += 1
+            if sequence >= len(self._received):
+                self._received.extend(bytes(max(sequence + 1 - len(self._received), len(self._received))))
+            if self._received[sequence]:
+                self.duplicates += 1
+            else:
+                self._received[sequence] = 1
+            self._max_sequence = max(self._max_sequence, sequence)
+            self.histogram.record(seconds)
+
+    def report(self, expected_messages=None):
+        """Get message counts, sequence gaps and a latency summary (see :py:meth:`LatencyHistogram.summary`).
+
+        Args:
+            expected_messages (:obj:`int`, optional): Number of messages sent, e.g. :py:attr:`LatencyProbe.sent`.
+                Default: up to the highest sequence id received
+
+        Returns:
+            A :obj:`dict` with the number of ``messages``, ``duplicates`` and ``missing`` messages, the first
+            :py:const:`MAX_REPORTED_GAPS` ``gaps`` as ``(first, last)`` sequence ids and the ``latency`` summary.
+        """
+        with self._lock:
+            end = self._max_sequence + 1 if expected_messages is None else expected_messages
+            received = bytes(self._received[:end]).ljust(end, b'\x00')
+            gaps = [(match.start(), match.end() - 1) for match in re.finditer(b'\x00+', received)]
+            return dict(messages=self.messages,
+                        duplicates=self.duplicates,
+                        missing=received.count(0),
+                        gaps=gaps[:MAX_REPORTED_GAPS],
+                        latency=self.histogram.summary())
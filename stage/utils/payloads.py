@@ -0,0 +1,316 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deterministic generator of synthetic records for high-volume tests.
+
+Records have a fixed shape described by the generator's arguments (number of top-level fields, nesting depth, list
+length, string size and ratio of null values) and their content only depends on the seed, so the same arguments
+always produce the same bytes. Records are generated lazily and encoded one at a time, which makes it possible to
+write gigabytes of input to a file without holding it in memory::
+
+    generator = PayloadGenerator(seed=42, number_of_fields=20, depth=3, list_length=5)
+    with open('/tmp/input.json', 'wb') as input_file:
+        generator.write(input_file, 'JSON', number_of_records=10_000_000)
+
+Supported data formats use the names of SDC's ``data_format`` configuration: ``JSON`` (one object per line),
+``DELIMITED`` (with a header line; nested fields and lists are flattened into columns), ``XML`` (``<record>``
+elements under a ``<records>`` root), ``AVRO`` (object container file), ``TEXT`` (one line per record), ``LOG``
+(Apache common log format) and ``SYSLOG`` (RFC 3164).
+"""
+
+import io
+import json
+import logging
+import random
+import string
+from xml.sax.saxutils import escape
+
+import avro
+from avro.datafile import DataFileWriter
+
+logger = logging.getLogger(__name__)
+
+DATA_FORMATS = ('JSON', 'DELIMITED', 'XML', 'AVRO', 'TEXT', 'LOG', 'SYSLOG')
+# Types of the top-level fields, assigned round robin.
+FIELD_TYPES = ('int', 'string', 'double', 'boolean')
+STRING_ALPHABET = string.ascii_letters + string.digits
+AVRO_RECORD_NAME = 'Record'
+XML_ROOT_ELEMENT = 'records'
+XML_RECORD_ELEMENT = 'record'
+XML_LIST_ITEM_ELEMENT = 'item'
+FLATTENED_NAME_SEPARATOR = '_'
+LOG_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+LOG_STATUS_CODES = (200, 201, 204, 301, 304, 400, 404, 500)
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+class PayloadGenerator:
+    """Generate records of a configurable shape and encode them in one of :py:const:`DATA_FORMATS`.
+
+    Each record has ``number_of_fields`` scalar fields named ``field0``, ``field1``, ... (of the types in
+    :py:const:`FIELD_TYPES`, in turn), an ``items`` list of ``list_length`` strings if ``list_length`` is positive
+    and a ``nested`` map nested ``depth`` levels deep (each level holding ``level``, ``value`` and ``nested``) if
+    ``depth`` is positive.
+
+    Args:
+        seed (:obj:`int`, optional): Random seed. Default: ``0``
+        number_of_fields (:obj:`int`, optional): Number of top-level scalar fields. Default: ``10``
+        depth (:obj:`int`, optional): Nesting depth of the ``nested`` field. Default: ``0``
+        list_length (:obj:`int`, optional): Length of the ``items`` list. Default: ``0``
+        string_length (:obj:`int`, optional): Length of generated strings. Default: ``10``
+        null_ratio (:obj:`float`, optional): Probability of a scalar field being null. Default: ``0.0``
+    """
+    def __init__(self, seed=0, number_of_fields=10, depth=0, list_length=0, string_length=10, null_ratio=0.0):
+        if not 0 <= null_ratio <= 1:
+            raise ValueError(f'null_ratio has to be between 0 and 1, got {null_ratio}.')
+        self.seed = seed
+        self.number_of_fields = number_of_fields
+        self.depth = depth
+        self.list_length = list_length
+        self.string_length = string_length
+        self.null_ratio = null_ratio
+
+    @property
+    def field_types(self):
+        """Top-level scalar field names mapped to their types."""
+        return {f'field{i}': FIELD_TYPES[i % len(FIELD_TYPES)] for i in range(self.number_of_fields)}
+
+    def records(self, number_of_records):
+        """Lazily generate records as :obj:`dict` instances.
+
+        Args:
+            number_of_records (:obj:`int`): Number of records to generate.
+
+        Yields:
+            A :obj:`dict` per record.
+        """
+        generator = random.Random(self.seed)
+        field_types = list(self.field_types.items())
+        for _ in range(number_of_records):
+            record = {name: self._get_value(generator, field_type) for name, field_type in field_types}
+            if self.list_length > 0:
+                record['items'] = [self._get_string(generator) for _ in range(self.list_length)]
+            if self.depth > 0:
+                record['nested'] = self._get_nested(generator, 1)
+            yield record
+
+    def avro_schema(self):
+        """Avro schema of the generated records as a :obj:`dict`."""
+        fields = [{'name': name, 'type': self._get_avro_type(field_type)}
+                  for name, field_type in self.field_types.items()]
+        if self.list_length > 0:
+            fields.append({'name': 'items', 'type': {'type': 'array', 'items': 'string'}})
+        if self.depth > 0:
+            fields.append({'name': 'nested', 'type': self._get_avro_nested_type(1)})
+        return {'type': 'record', 'name': AVRO_RECORD_NAME, 'fields': fields}
+
+    def columns(self):
+        """Column names used by the ``DELIMITED`` data format, i.e. paths of the flattened record."""
+        columns = list(self.field_types)
+        columns.extend(f'items{FLATTENED_NAME_SEPARATOR}{i}' for i in range(self.list_length))
+        prefix = 'nested'
+        for _ in range(self.depth):
+            columns.extend([f'{prefix}{FLATTENED_NAME_SEPARATOR}level', f'{prefix}{FLATTENED_NAME_SEPARATOR}value'])
+            prefix = f'{prefix}{FLATTENED_NAME_SEPARATOR}nested'
+        return columns
+
+    def write(self, fileobj, data_format, number_of_records, delimiter=',', encoding='utf-8'):
+        """Encode records and write them to a binary file object, one record at a time.
+
+        Args:
+            fileobj: Binary file object to write to. It's flushed but not closed.
+            data_format (:obj:`str`): One of :py:const:`DATA_FORMATS`.
+            number_of_records (:obj:`int`): Number of records to write.
+            delimiter (:obj:`str`, optional): Column delimiter of the ``DELIMITED`` data format. Can be longer than
+                one character. Default: ``','``
+            encoding (:obj:`str`, optional): Encoding of text data formats. Default: ``'utf-8'``
+
+        Returns:
+            Number of bytes written as an :obj:`int`.
+        """
+        if data_format not in DATA_FORMATS:
+            raise ValueError(f'Unsupported data format {data_format}; choose one of {", ".join(DATA_FORMATS)}.')
+
+        writer = _CountingWriter(fileobj)
+        if data_format == 'AVRO':
+            self._write_avro(writer, number_of_records)
+        else:
+            for chunk in self._iter_text(data_format, number_of_records, delimiter):
+                writer.write(chunk.encode(encoding))
+        writer.flush()
+        logger.debug('Wrote %s %s records (%s bytes)', number_of_records, data_format, writer.bytes_written)
+        return writer.bytes_written
+
+    def to_bytes(self, data_format, number_of_records, **kwargs):
+        """Encode records into a :obj:`bytes` object; meant for inputs small enough to fit in memory."""
+        buffer = io.BytesIO()
+        self.write(buffer, data_format, number_of_records, **kwargs)
+        return buffer.getvalue()
+
+    def write_file(self, path, data_format, number_of_records, **kwargs):
+        """Encode records into a file at ``path``; see :py:meth:`write` for the arguments."""
+        with open(path, 'wb') as output_file:
+            return self.write(output_file, data_format, number_of_records, **kwargs)
+
+    def lines(self, data_format, number_of_records, delimiter=','):
+        """Lazily encode records of a line-oriented data format one line per record.
+
+        Unlike :py:meth:`write`, no ``DELIMITED`` header or XML root element is produced, so every line can be
+        parsed on its own (e.g. as the ``/text`` field of a Dev Raw Data Source record). ``AVRO`` isn't supported.
+
+        Yields:
+            A :obj:`str` per record, without the line terminator.
+        """
+        records = self.records(number_of_records)
+        if data_format == 'JSON':
+            for record in records:
+                yield json.dumps(record)
+        elif data_format == 'DELIMITED':
+            for record in records:
+                yield delimiter.join(_quote(value, delimiter) for value in _flatten(record).values())
+        elif data_format == 'XML':
+            for record in records:
+                yield _to_xml(XML_RECORD_ELEMENT, record)
+        elif data_format == 'TEXT':
+            for record in records:
+                yield ' '.join(_to_text(value) for value in _flatten(record).values())
+        elif data_format in ('LOG', 'SYSLOG'):
+            # Log lines have a fixed shape; only the message part is taken from the generated records.
+            generator = random.Random(self.seed)
+            to_line = _to_log_line if data_format == 'LOG' else _to_syslog_line
+            for record in records:
+                yield to_line(generator, '-'.join(_to_text(value) for value in _flatten(record).values()))
+        else:
+            raise ValueError(f'Unsupported line-oriented data format {data_format}.')
+
+    def _iter_text(self, data_format, number_of_records, delimiter):
+        if data_format == 'DELIMITED':
+            yield delimiter.join(self.columns()) + '\n'
+        elif data_format == 'XML':
+            yield f'<?xml version="1.0" encoding="UTF-8"?>\n<{XML_ROOT_ELEMENT}>\n'
+        for line in self.lines(data_format, number_of_records, delimiter):
+            yield line + '\n'
+        if data_format == 'XML':
+            yield f'</{XML_ROOT_ELEMENT}>\n'
+
+    def _write_avro(self, fileobj, number_of_records):
+        schema = avro.schema.Parse(json.dumps(self.avro_schema()))
+        writer = DataFileWriter(writer=fileobj, datum_writer=avro.io.DatumWriter(), writer_schema=schema)
+        for record in self.records(number_of_records):
+            writer.append(record)
+        # DataFileWriter.close() would close fileobj as well.
+        writer.flush()
+
+    def _get_value(self, generator, field_type):
+        if self.null_ratio and generator.random() < self.null_ratio:
+            return None
+        if field_type == 'int':
+            return generator.randint(-2 ** 31, 2 ** 31 - 1)
+        if field_type == 'double':
+            return generator.uniform(-1e6, 1e6)
+        if field_type == 'boolean':
+            return generator.random() < 0.5
+        return self._get_string(generator)
+
+    def _get_string(self, generator):
+        return ''.join(generator.choices(STRING_ALPHABET, k=self.string_length))
+
+    def _get_nested(self, generator, level):
+        nested = {'level': level, 'value': self._get_value(generator, 'string')}
+        if level < self.depth:
+            nested['nested'] = self._get_nested(generator, level + 1)
+        return nested
+
+    def _get_avro_type(self, field_type):
+        return ['null', field_type] if self.null_ratio else field_type
+
+    def _get_avro_nested_type(self, level):
+        fields = [{'name': 'level', 'type': 'int'},
+                  {'name': 'value', 'type': self._get_avro_type('string')}]
+        if level < self.depth:
+            fields.append({'name': 'nested', 'type': self._get_avro_nested_type(level + 1)})
+        return {'type': 'record', 'name': f'Nested{level}', 'fields': fields}
+
+
+class _CountingWriter:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.bytes_written += len(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+def _flatten(value, prefix=''):
+    """Flatten nested maps and lists into an ordered :obj:`dict` of scalar values keyed by column name."""
+    flattened = {}
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value}
+    for key, child in items:
+        name = f'{prefix}{FLATTENED_NAME_SEPARATOR}{key}' if prefix else str(key)
+        flattened.update(_flatten(child, name))
+    return flattened
+
+
+def _to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _quote(value, delimiter):
+    text = _to_text(value)
+    if delimiter in text or '"' in text or '\n' in text:
+        return '"{}"'.format(text.replace('"', '""'))
+    return text
+
+
+def _to_xml(tag, value):
+    if isinstance(value, dict):
+        return '<{0}>{1}</{0}>'.format(tag, ''.join(_to_xml(key, child) for key, child in value.items()))
+    if isinstance(value, list):
+        return '<{0}>{1}</{0}>'.format(tag, ''.join(_to_xml(XML_LIST_ITEM_ELEMENT, child) for child in value))
+    if value is None:
+        return f'<{tag}/>'
+    return '<{0}>{1}</{0}>'.format(tag, escape(_to_text(value)))
+
+
+def _to_log_line(generator, message):
+    """Apache common log format line."""
+    return '{}.{}.{}.{} - user{} [{:02d}/{}/2019:{:02d}:{:02d}:{:02d} -0700] "{} /{} HTTP/1.1" {} {}'.format(
+        *(generator.randint(1, 254) for _ in range(4)), generator.randint(0, 999),
+        generator.randint(1, 28), generator.choice(MONTHS),
+        generator.randint(0, 23), generator.randint(0, 59), generator.randint(0, 59),
+        generator.choice(LOG_METHODS), message, generator.choice(LOG_STATUS_CODES), generator.randint(0, 100_000)
+    )
+
+
+def _to_syslog_line(generator, message):
+    """RFC 3164 syslog line."""
+    return '<{}>{} {:2d} {:02d}:{:02d}:{:02d} host{} app{}: {}'.format(
+        generator.randint(0, 191), generator.choice(MONTHS), generator.randint(1, 28),
+        generator.randint(0, 23), generator.randint(0, 59), generator.randint(0, 59),
+        generator.randint(0, 99), generator.randint(0, 9), message
+    )
@@ -0,0 +1,116 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Reuse of pipelines already imported into SDC.
+
+A built pipeline is fingerprinted from its definition, leaving out what changes from one build to the next (id,
+title, uuid, metadata). If a pipeline with the same fingerprint was already added, :py:meth:`PipelinePool.get` stops
+it if needed, resets its origin and hands it out again instead of importing a new one. Parameters and their default
+values are part of the definition, so tests that only differ in configuration values should turn those values into
+parameters with ``pipeline.add_parameters`` using the same defaults and pass the actual values as runtime parameters
+when starting the pipeline, as stage/test_directory_origin.py and stage/test_http.py do.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pipeline configuration keys that don't affect what the pipeline does.
+IGNORED_PIPELINE_KEYS = ('description', 'info', 'issues', 'metadata', 'pipelineId', 'previewable', 'title', 'uuid',
+                         'valid')
+CONSTANTS_CONFIGURATION = 'constants'
+ACTIVE_STATUSES = ('RUNNING', 'STARTING', 'RETRY', 'RUNNING_ERROR', 'STOPPING', 'FINISHING', 'CONNECTING')
+
+
+def get_fingerprint(pipeline):
+    """Get a digest of the pipeline's definition, ignoring ids and titles.
+
+    Args:
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Built pipeline.
+
+    Returns:
+        A hex digest :obj:`str`.
+    """
+    pipeline_config = copy.deepcopy(pipeline._data.get('pipelineConfig', pipeline._data))
+    for key in IGNORED_PIPELINE_KEYS:
+        pipeline_config.pop(key, None)
+    for config in pipeline_config.get('configuration', []):
+        if config.get('name') == CONSTANTS_CONFIGURATION:
+            # Parameters are kept with their default values, in a stable order.
+            config['value'] = sorted(config.get('value') or [], key=lambda constant: constant['key'])
+    definition = json.dumps(pipeline_config, sort_keys=True, default=str)
+    return hashlib.sha256(definition.encode()).hexdigest()
+
+
+class PipelinePool:
+    """Pipelines added to a Data Collector, keyed by fingerprint.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector to add pipelines to.
+    """
+    def __init__(self, sdc_executor):
+        self.sdc_executor = sdc_executor
+        self._pipelines = {}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._pipelines)
+
+    def get(self, pipeline):
+        """Get an added pipeline identical to ``pipeline``, adding ``pipeline`` if there's none yet.
+
+        A reused pipeline is stopped if it's still active and its origin offset is reset. As stage instance names
+        are part of the fingerprint, stages of ``pipeline`` can be used to look up snapshot data of the returned
+        pipeline.
+
+        Args:
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Built pipeline.
+
+        Returns:
+            The :py:class:`streamsets.sdk.sdc_models.Pipeline` to run.
+        """
+        fingerprint = get_fingerprint(pipeline)
+        pooled_pipeline = self._pipelines.get(fingerprint)
+        if pooled_pipeline is None:
+            self.sdc_executor.add_pipeline(pipeline)
+            self._pipelines[fingerprint] = pipeline
+            return pipeline
+
+        logger.debug('Reusing pipeline %s for %s', pooled_pipeline.id, pipeline.title)
+        self.hits += 1
+        self._stop(pooled_pipeline)
+        self.sdc_executor.reset_origin(pooled_pipeline)
+        return pooled_pipeline
+
+    def clear(self):
+        """Stop and remove all pooled pipelines."""
+        logger.info('Removing %s pooled pipelines (reused %s times) ...', len(self._pipelines), self.hits)
+        while self._pipelines:
+            _, pipeline = self._pipelines.popitem()
+            try:
+                self._stop(pipeline)
+                self.sdc_executor.remove_pipeline(pipeline)
+            except Exception as exception:
+                # A leftover pipeline shouldn't fail the tests that used it.
+                logger.warning('Could not remove pipeline %s: %s', pipeline.id, exception)
+        self.hits = 0
+
+    def _stop(self, pipeline):
+        status = self.sdc_executor.get_pipeline_status(pipeline).response.json().get('status')
+        if status in ACTIVE_STATUSES:
+            self.sdc_executor.stop_pipeline(pipeline)
@@ -0,0 +1,219 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar assertions on snapshot output.
+
+:py:class:`RecordTable` extracts the given field paths of every record once, into one column per path, holding plain
+Python values. Comparisons against expected data then use hashing instead of sorting full record lists or scanning
+them once per expected record:
+
+- :py:func:`assert_multiset_equal` and :py:func:`assert_set_equal` compare with :py:class:`collections.Counter`, O(n).
+- :py:func:`assert_joined` indexes the table by a key column and checks every expected row against its match, O(n).
+
+On failure, the :obj:`AssertionError` carries a diff report of missing, unexpected and mismatched values (sorted, so
+O(n log n) in the size of the difference only), e.g.::
+
+    output = RecordTable.from_records(snapshot[jython_evaluator.instance_name].output, ['name', 'office_space'])
+    assert_joined(output, expected_rows, key='name')
+"""
+
+from collections import Counter, namedtuple
+
+# Maximum number of entries shown per section of a diff report.
+DEFAULT_DIFF_LIMIT = 20
+
+Diff = namedtuple('Diff', ['missing', 'unexpected'])
+
+
+class RecordTable:
+    """Values of some field paths of records, one column per path.
+
+    Args:
+        columns (:obj:`dict`): Path to :obj:`list` of values, all lists of the same length.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records, paths):
+        """Extract field paths from records.
+
+        Args:
+            records (:obj:`iterable`): SDK records or :py:class:`stage.utils.snapshots.CompactRecord` instances.
+            paths (:obj:`list`): Field paths like ``/address/city`` or ``text``; list elements are addressed by index.
+                Records without a path get ``None`` in its column.
+
+        Returns:
+            A :py:class:`RecordTable` with a column per path.
+        """
+        split_paths = [_split_path(path) for path in paths]
+        columns = {path: [] for path in paths}
+        column_lists = [columns[path] for path in paths]
+        for record in records:
+            field = record.field
+            for column, path in zip(column_lists, split_paths):
+                column.append(_get_value(field, path))
+        return cls(columns)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def column(self, path):
+        """Values of a column as a :obj:`list`."""
+        return self.columns[path]
+
+    def rows(self, *paths):
+        """Rows of the given columns (default: all of them) as :obj:`tuple` instances."""
+        return list(zip(*(self.columns[path] for path in paths or self.columns)))
+
+    def records(self):
+        """Rows as :obj:`dict` instances of path to value."""
+        return [dict(zip(self.columns, row)) for row in self.rows()]
+
+
+def diff_multisets(actual, expected):
+    """Get the values of ``expected`` missing from ``actual`` and the extra ones of ``actual``, with multiplicity.
+
+    Returns:
+        A :py:class:`Diff` of two :py:class:`collections.Counter` instances.
+    """
+    actual_counts = Counter(_hashable(value) for value in actual)
+    expected_counts = Counter(_hashable(value) for value in expected)
+    return Diff(missing=expected_counts - actual_counts, unexpected=actual_counts - expected_counts)
+
+
+def assert_multiset_equal(actual, expected, limit=DEFAULT_DIFF_LIMIT):
+    """Assert two iterables hold the same values the same number of times, in any order.
+
+    Args:
+        actual (:obj:`iterable`): Values, e.g. :py:meth:`RecordTable.column` or :py:meth:`RecordTable.rows`.
+        expected (:obj:`iterable`): Expected values.
+        limit (:obj:`int`, optional): Maximum number of entries per section of the diff report.
+            Default: :py:const:`DEFAULT_DIFF_LIMIT`
+    """
+    diff = diff_multisets(actual, expected)
+    if diff.missing or diff.unexpected:
+        raise AssertionError(format_diff(diff, limit))
+
+
+def assert_set_equal(actual, expected, limit=DEFAULT_DIFF_LIMIT):
+    """Assert two iterables hold the same distinct values, ignoring order and duplicates."""
+    actual_values = {_hashable(value) for value in actual}
+    expected_values = {_hashable(value) for value in expected}
+    diff = Diff(missing=Counter(expected_values - actual_values), unexpected=Counter(actual_values - expected_values))
+    if diff.missing or diff.unexpected:
+        raise AssertionError(format_diff(diff, limit))
+
+
+def assert_joined(table, expected, key, allow_unexpected=False, limit=DEFAULT_DIFF_LIMIT):
+    """Join expected rows to the table on a key column and assert the joined values are equal.
+
+    Args:
+        table (:py:class:`RecordTable`): Actual values.
+        expected (:obj:`iterable`): :obj:`dict` instances of path to expected value. Only paths present in an
+            expected row are compared for it.
+        key (:obj:`str`): Path of the key column. Keys must be unique on both sides.
+        allow_unexpected (:obj:`bool`, optional): Whether the table may have keys that aren't expected.
+            Default: ``False``
+        limit (:obj:`int`, optional): Maximum number of entries per section of the diff report.
+            Default: :py:const:`DEFAULT_DIFF_LIMIT`
+    """
+    index = {}
+    duplicated = []
+    for row in table.records():
+        row_key = _hashable(row[key])
+        if row_key in index:
+            duplicated.append(row[key])
+        index[row_key] = row
+
+    missing, mismatched, expected_keys = [], [], set()
+    for expected_row in expected:
+        row_key = _hashable(expected_row[key])
+        expected_keys.add(row_key)
+        row = index.get(row_key)
+        if row is None:
+            missing.append(expected_row[key])
+            continue
+        mismatched.extend((expected_row[key], path, row.get(path), value)
+                          for path, value in expected_row.items() if _hashable(row.get(path)) != _hashable(value))
+    unexpected = ([] if allow_unexpected
+                  else [row[key] for row_key, row in index.items() if row_key not in expected_keys])
+
+    if duplicated or missing or mismatched or unexpected:
+        sections = [f'Join on {key} failed:']
+        for title, values in (('duplicated keys', duplicated), ('missing keys', missing),
+                              ('unexpected keys', unexpected),
+                              ('mismatched values (key, path, actual, expected)', mismatched)):
+            sections.extend(_format_section(title, [repr(value) for value in values], limit))
+        raise AssertionError('\n'.join(sections))
+
+
+def format_diff(diff, limit=DEFAULT_DIFF_LIMIT):
+    """Format a :py:class:`Diff` as a report listing at most ``limit`` values per section."""
+    sections = [f'{sum(diff.missing.values())} values missing, {sum(diff.unexpected.values())} unexpected:']
+    for title, counts in (('missing', diff.missing), ('unexpected', diff.unexpected)):
+        sections.extend(_format_section(title, [repr(value) if count == 1 else f'{value!r} (x{count})'
+                                                for value, count in counts.items()], limit))
+    return '\n'.join(sections)
+
+
+def _format_section(title, entries, limit):
+    """Format a report section of sorted ``entries`` (:obj:`str` instances)."""
+    if not entries:
+        return []
+    lines = [f'  {title} ({len(entries)}):']
+    lines.extend(f'    {entry}' for entry in sorted(entries)[:limit])
+    if len(entries) > limit:
+        lines.append(f'    ... {len(entries) - limit} more')
+    return lines
+
+
+def _split_path(path):
+    return [part for part in path.split('/') if part]
+
+
+def _get_value(field, path):
+    value = field
+    for part in path:
+        value = _unwrap(value)
+        try:
+            value = value[int(part)] if isinstance(value, (list, tuple)) else value[part]
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+    return _plain(value)
+
+
+def _unwrap(value):
+    """Get the value of an SDK field; plain values are returned as they are."""
+    while hasattr(value, 'type') and hasattr(value, 'value'):
+        value = value.value
+    return value
+
+
+def _plain(value):
+    value = _unwrap(value)
+    if isinstance(value, dict):
+        return {key: _plain(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [_plain(child) for child in value]
+    return value
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(child)) for key, child in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(child) for child in value)
+    return value
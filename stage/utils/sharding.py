@@ -0,0 +1,234 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run test modules in parallel shards, each with its own Data Collector.
+
+Test modules are spread over N shards by longest-processing-time-first bin packing of their historical durations,
+taken from the JUnit XML report of a previous run or from a :py:mod:`stage.utils.durations` database (modules
+without history are assumed to take the median time).
+Every shard is a separate test run (by default ``python -m pytest``), so every shard starts its own SDC containers;
+the reports of all shards are then merged into a single JUnit XML file, e.g.::
+
+    $ python -m stage.utils.sharding --shards 4 --durations junit.xml --junitxml junit.xml \\
+        --command 'stf test --sdc-version 3.8.0 --' stage/
+
+Shards get their index and count in the :py:const:`SHARD_INDEX_ENV` and :py:const:`SHARD_COUNT_ENV` environment
+variables. Tests use :py:func:`shard_port` and :py:func:`shard_name` to keep fixed ports and shared resource names
+(table prefixes, Kafka topics) from clashing between shards. Outside of a sharded run both are no-ops.
+"""
+
+import argparse
+import glob
+import heapq
+import logging
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import defaultdict
+
+from stage.utils import durations as durations_db
+
+logger = logging.getLogger(__name__)
+
+SHARD_INDEX_ENV = 'TEST_SHARD_INDEX'
+SHARD_COUNT_ENV = 'TEST_SHARD_COUNT'
+# Ports of shard i are offset by i times this.
+SHARD_PORT_STRIDE = 100
+DEFAULT_COMMAND = f'{sys.executable} -m pytest'
+DEFAULT_MODULE_DURATION_SEC = 60
+TEST_MODULE_PATTERN = 'test_*.py'
+
+
+def get_shard_index():
+    """Index of the shard running the current process, or ``None`` outside of a sharded run."""
+    index = os.environ.get(SHARD_INDEX_ENV)
+    return int(index) if index is not None else None
+
+
+def shard_port(port):
+    """Offset a fixed port so that every shard listens on its own one.
+
+    Args:
+        port (:obj:`int`): Port used when not sharded.
+
+    Returns:
+        The port as an :obj:`int`.
+    """
+    return int(port) + (get_shard_index() or 0) * SHARD_PORT_STRIDE
+
+
+def shard_name(name):
+    """Suffix a shared resource name (table prefix, topic, ...) with the shard index.
+
+    Args:
+        name (:obj:`str`): Name used when not sharded.
+
+    Returns:
+        The name as a :obj:`str`.
+    """
+    index = get_shard_index()
+    return name if index is None else f'{name}_s{index}'
+
+
+def collect_modules(paths):
+    """Get test module paths under ``paths`` (files or directories), sorted."""
+    modules = set()
+    for path in paths:
+        if os.path.isdir(path):
+            modules.update(glob.glob(os.path.join(path, '**', TEST_MODULE_PATTERN), recursive=True))
+        else:
+            modules.add(path)
+    return sorted(os.path.normpath(module) for module in modules)
+
+
+def load_module_durations(junit_xml):
+    """Sum test durations per module from a JUnit XML report.
+
+    Args:
+        junit_xml (:obj:`str`): Path of the report.
+
+    Returns:
+        A :obj:`dict` of module path to seconds.
+    """
+    durations = defaultdict(float)
+    for testcase in ElementTree.parse(junit_xml).iter('testcase'):
+        module = testcase.get('file') or _get_module_path(testcase.get('classname', ''))
+        if module:
+            durations[os.path.normpath(module)] += float(testcase.get('time') or 0)
+    return dict(durations)
+
+
+def assign_shards(modules, durations, number_of_shards):
+    """Spread modules over shards, longest first, each going to the least loaded shard.
+
+    Args:
+        modules (:obj:`list`): Module paths.
+        durations (:obj:`dict`): Module path to historical duration in seconds. Modules without one are assumed to
+            take the median of the known durations.
+        number_of_shards (:obj:`int`): Number of shards.
+
+    Returns:
+        A :obj:`list` of ``(estimated seconds, [module paths])``, one per shard.
+    """
+    known = [durations[module] for module in modules if module in durations]
+    default_duration = statistics.median(known) if known else DEFAULT_MODULE_DURATION_SEC
+    estimates = {module: durations.get(module, default_duration) for module in modules}
+
+    shards = [(0, index, []) for index in range(number_of_shards)]
+    heapq.heapify(shards)
+    for module in sorted(modules, key=lambda module: (-estimates[module], module)):
+        load, index, shard_modules = heapq.heappop(shards)
+        shard_modules.append(module)
+        heapq.heappush(shards, (load + estimates[module], index, shard_modules))
+    return [(load, shard_modules) for load, _, shard_modules in sorted(shards, key=lambda shard: shard[1])]
+
+
+def merge_junit_xml(paths, output_path):
+    """Merge the test suites of JUnit XML reports into a single report.
+
+    Returns:
+        A :obj:`dict` of the merged totals of ``tests``, ``failures``, ``errors`` and ``skipped``.
+    """
+    merged = ElementTree.Element('testsuites')
+    totals = dict.fromkeys(('tests', 'failures', 'errors', 'skipped'), 0)
+    for path in paths:
+        if not os.path.exists(path):
+            logger.warning('Report %s is missing', path)
+            continue
+        root = ElementTree.parse(path).getroot()
+        for testsuite in ([root] if root.tag == 'testsuite' else root.iter('testsuite')):
+            merged.append(testsuite)
+            for key in totals:
+                totals[key] += int(testsuite.get(key) or 0)
+    merged.attrib.update({key: str(value) for key, value in totals.items()})
+    ElementTree.ElementTree(merged).write(output_path, encoding='utf-8', xml_declaration=True)
+    return totals
+
+
+def run_shards(shards, command, pytest_args, output_directory):
+    """Run every shard as a separate process and wait for all of them.
+
+    Returns:
+        A :obj:`list` of ``(exit code, JUnit XML path)``, one per shard.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    processes = []
+    for index, (estimate, modules) in enumerate(shards):
+        junit_xml = os.path.join(output_directory, f'shard-{index}.xml')
+        args = shlex.split(command) + list(pytest_args) + [f'--junitxml={junit_xml}'] + modules
+        env = dict(os.environ, **{SHARD_INDEX_ENV: str(index), SHARD_COUNT_ENV: str(len(shards))})
+        log = open(os.path.join(output_directory, f'shard-{index}.log'), 'w')
+        logger.info('Starting shard %s with %s modules (estimated %.0f s) ...', index, len(modules), estimate)
+        processes.append((subprocess.Popen(args, env=env, stdout=log, stderr=subprocess.STDOUT), log, junit_xml))
+
+    results = []
+    for index, (process, log, junit_xml) in enumerate(processes):
+        exit_code = process.wait()
+        log.close()
+        logger.info('Shard %s exited with %s', index, exit_code)
+        results.append((exit_code, junit_xml))
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shards', type=int, required=True, help='Number of shards (and of SDCs running at once)')
+    parser.add_argument('--durations', help='JUnit XML report of a previous run or stage.utils.durations SQLite '
+                                            'database to take module durations from')
+    parser.add_argument('--command', default=DEFAULT_COMMAND, help='Test runner command. Default: %(default)s')
+    parser.add_argument('--junitxml', default='junit.xml', help='Merged JUnit XML report. Default: %(default)s')
+    parser.add_argument('--output-directory', default='shards',
+                        help='Directory for per-shard reports and logs. Default: %(default)s')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the shard assignment')
+    parser.add_argument('paths', nargs='+', help='Test modules or directories')
+    parsed_args, pytest_args = parser.parse_known_args(args)
+
+    modules = collect_modules(parsed_args.paths)
+    durations = {}
+    if parsed_args.durations and os.path.exists(parsed_args.durations):
+        durations = (load_module_durations(parsed_args.durations) if parsed_args.durations.endswith('.xml')
+                     else durations_db.load_module_durations(parsed_args.durations))
+    shards = [shard for shard in assign_shards(modules, durations, parsed_args.shards) if shard[1]]
+    for index, (estimate, shard_modules) in enumerate(shards):
+        print(f'Shard {index}: {len(shard_modules)} modules, estimated {estimate:.0f} s')
+    if parsed_args.dry_run:
+        return 0
+
+    start = time.perf_counter()
+    results = run_shards(shards, parsed_args.command, pytest_args, parsed_args.output_directory)
+    totals = merge_junit_xml([junit_xml for _, junit_xml in results], parsed_args.junitxml)
+    print('{tests} tests, {failures} failures, {errors} errors, {skipped} skipped'.format(**totals),
+          f'in {time.perf_counter() - start:.0f} s across {len(shards)} shards')
+
+    # pytest exits with 5 when a shard collects no tests; that isn't a failure of the run.
+    return max((exit_code for exit_code, _ in results if exit_code != 5), default=0)
+
+
+def _get_module_path(classname):
+    """Map a JUnit class name (``stage.test_http`` or ``stage.test_http.TestClass``) to an existing module path."""
+    parts = classname.split('.')
+    for end in range(len(parts), 0, -1):
+        path = os.path.join(*parts[:end]) + '.py'
+        if os.path.exists(path):
+            return path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming access to large pipeline snapshots.
+
+``sdc_executor.capture_snapshot(...).snapshot`` downloads the whole snapshot, parses it and wraps every field of every
+record in SDK objects up front. :py:class:`SnapshotReader` instead streams the snapshot JSON from SDC and yields one
+batch at a time, and its :py:class:`CompactRecord` keeps a record's raw JSON until its field is first accessed, then
+decodes it into plain Python values (``dict``, ``list``, ``str``, ``int``, ...). With `ijson
+<https://pypi.org/project/ijson/>`_ installed, only the batch being looked at is ever held in memory; without it,
+the snapshot JSON is parsed in one go but records are still decoded lazily.
+
+    reader = SnapshotReader.capture(sdc_executor, pipeline, start_pipeline=True, batches=7, batch_size=10)
+    reader.wait_for_finished()
+    texts = [record.field['text'] for record in reader.output(tcp_server.instance_name)]
+"""
+
+import base64
+import json
+import logging
+import uuid
+from collections import namedtuple
+from decimal import Decimal
+
+from stage.utils.waiting import wait_for
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SEC = 300
+SNAPSHOT_BATCHES_PREFIX = 'snapshotBatches.item'
+
+StageOutput = namedtuple('StageOutput', ['instance_name', 'output', 'error_records', 'event_records'])
+
+
+class CompactRecord:
+    """A snapshot record decoded on first access.
+
+    Attributes:
+        header (:obj:`dict`): Raw record header JSON.
+        field: Root field as plain Python values.
+    """
+    __slots__ = ('header', '_value', '_field')
+
+    def __init__(self, record_json):
+        self.header = record_json.get('header', {})
+        self._value = record_json.get('value')
+        self._field = None
+
+    @property
+    def field(self):
+        if self._value is not None:
+            self._field = decode_field(self._value)
+            self._value = None
+        return self._field
+
+    def __repr__(self):
+        return f'CompactRecord({self.field!r})'
+
+
+def decode_field(field_json):
+    """Decode SDC's JSON representation of a field into plain Python values.
+
+    Numeric types become :obj:`int`, :obj:`float` or :py:class:`decimal.Decimal`, ``BYTE_ARRAY`` becomes :obj:`bytes`,
+    ``MAP`` and ``LIST_MAP`` become :obj:`dict` and ``LIST`` becomes :obj:`list`. Date and time types are left as
+    epoch milliseconds.
+    """
+    if field_json is None:
+        return None
+    field_type = field_json.get('type')
+    value = field_json.get('value')
+    if value is None:
+        return None
+    if field_type == 'MAP':
+        return {name: decode_field(child) for name, child in value.items()}
+    if field_type == 'LIST_MAP':
+        return {_get_field_name(child): decode_field(child) for child in value}
+    if field_type == 'LIST':
+        return [decode_field(child) for child in value]
+    if field_type in ('BYTE', 'SHORT', 'INTEGER', 'LONG', 'DATE', 'DATETIME', 'TIME'):
+        return int(value)
+    if field_type in ('FLOAT', 'DOUBLE'):
+        return float(value)
+    if field_type == 'DECIMAL':
+        return Decimal(str(value))
+    if field_type == 'BOOLEAN':
+        return value if isinstance(value, bool) else str(value).lower() == 'true'
+    if field_type == 'BYTE_ARRAY':
+        return base64.b64decode(value)
+    return value
+
+
+class SnapshotReader:
+    """Lazily read a snapshot of a pipeline.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector.
+        pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Pipeline the snapshot belongs to.
+        snapshot_name (:obj:`str`): Snapshot name.
+    """
+    def __init__(self, sdc_executor, pipeline, snapshot_name):
+        self.sdc_executor = sdc_executor
+        self.pipeline = pipeline
+        self.snapshot_name = snapshot_name
+
+    @classmethod
+    def capture(cls, sdc_executor, pipeline, **kwargs):
+        """Start capturing a snapshot, without waiting for it.
+
+        Args:
+            sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector.
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline`): Pipeline.
+            **kwargs: Passed to ``sdc_executor.capture_snapshot``, e.g. ``start_pipeline``, ``batches`` and
+                ``batch_size``.
+
+        Returns:
+            A :py:class:`SnapshotReader` of the snapshot.
+        """
+        snapshot_name = kwargs.pop('snapshot_name', None) or str(uuid.uuid4())
+        sdc_executor.capture_snapshot(pipeline, snapshot_name=snapshot_name, wait=False, **kwargs)
+        return cls(sdc_executor, pipeline, snapshot_name)
+
+    @property
+    def url(self):
+        return f'{self.sdc_executor.api_client.server_url}/rest/v1/pipeline/{self.pipeline.id}/snapshot/' \
+               f'{self.snapshot_name}'
+
+    def wait_for_finished(self, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        """Wait for SDC to finish capturing the snapshot."""
+        def captured():
+            response = self.sdc_executor.api_client.session.get(f'{self.url}/status', params={'rev': 0})
+            response.raise_for_status()
+            return not response.json().get('inProgress', True)
+
+        wait_for(captured, timeout_sec=timeout_sec, description=f'snapshot {self.snapshot_name} to be captured')
+        return self
+
+    def batches(self):
+        """Stream the snapshot's batches.
+
+        Yields:
+            A :obj:`dict` of stage instance name to :py:class:`StageOutput` per batch.
+        """
+        response = self.sdc_executor.api_client.session.get(self.url, params={'rev': 0}, stream=True)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        try:
+            raw_batches = (ijson.items(response.raw, SNAPSHOT_BATCHES_PREFIX) if ijson
+                           else json.load(response.raw).get('snapshotBatches') or [])
+            for raw_batch in raw_batches:
+                yield {stage_output['instanceName']: _get_stage_output(stage_output) for stage_output in raw_batch}
+        finally:
+            response.close()
+
+    def output(self, instance_name, lane=None):
+        """Stream the output records of a stage across all batches.
+
+        Args:
+            instance_name (:obj:`str`): Stage instance name.
+            lane (:obj:`str`, optional): Output lane. Default: all lanes
+
+        Yields:
+            :py:class:`CompactRecord` instances.
+        """
+        for stage_output in self._stage_outputs(instance_name):
+            yield from (stage_output.output.get(lane, []) if lane
+                        else (record for records in stage_output.output.values() for record in records))
+
+    def error_records(self, instance_name):
+        """Stream the error records of a stage across all batches."""
+        for stage_output in self._stage_outputs(instance_name):
+            yield from stage_output.error_records
+
+    def event_records(self, instance_name):
+        """Stream the event records of a stage across all batches."""
+        for stage_output in self._stage_outputs(instance_name):
+            yield from stage_output.event_records
+
+    def delete(self):
+        """Delete the snapshot from SDC."""
+        self.sdc_executor.api_client.session.delete(self.url, params={'rev': 0}).raise_for_status()
+
+    def _stage_outputs(self, instance_name):
+        for batch in self.batches():
+            if instance_name in batch:
+                yield batch[instance_name]
+
+
+def _get_stage_output(stage_output):
+    return StageOutput(instance_name=stage_output['instanceName'],
+                       output={lane: [CompactRecord(record) for record in records]
+                               for lane, records in (stage_output.get('output') or {}).items()},
+                       error_records=[CompactRecord(record) for record in stage_output.get('errorRecords') or []],
+                       event_records=[CompactRecord(record) for record in stage_output.get('eventRecords') or []])
+
+
+def _get_field_name(field_json):
+    """Name of a ``LIST_MAP`` child, from the last element of its single-quoted path (e.g. ``/'name'``)."""
+    path = field_json.get('sqpath') or field_json.get('dqpath') or ''
+    name = path.rsplit('/', 1)[-1]
+    return name[1:-1] if len(name) > 1 and name[0] == name[-1] and name[0] in '\'"' else name
@@ -0,0 +1,443 @@
+# Copyright 2019 StreamSets Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Condition-based waiting with adaptive polling.
+
+:py:func:`wait_for` polls a condition starting with a short interval that grows exponentially up to a cap, so that
+conditions met quickly are noticed quickly while long waits don't hammer whatever is polled.
+:py:func:`wait_for_row_count` polls ``SELECT COUNT(*)`` of a table, reflecting its metadata only once.
+:py:class:`PipelineWaiter` builds on it to wait for pipeline statuses, metric counters and snapshots over the SDC
+REST API, reusing the API client's HTTP session. While a counter makes progress, its polling interval follows the
+estimated time left instead of the backoff, so the waiter wakes up close to when the target count is reached.
+
+:py:class:`SdkWaitAdapter` routes the SDK's own ``wait_for_*`` methods of pipeline and snapshot commands (e.g.
+``sdc_executor.start_pipeline(pipeline).wait_for_finished()``) through the waiter instead of their one-second
+polling, keeping their signatures and the SDK's status exceptions. The root ``conftest.py`` installs it for the
+whole suite.
+
+Every wait is timed and recorded (see :py:func:`get_wait_timings`). Timeouts report the deadline, the number of
+polls and the last value seen, and waits that are met close to their deadline are logged as warnings.
+"""
+
+import json
+import logging
+from collections import namedtuple
+from time import perf_counter, sleep
+
+import sqlalchemy
+
+try:
+    from streamsets.sdk import sdc_api
+    STATUS_ERRORS = sdc_api.STATUS_ERRORS
+except (ImportError, AttributeError):
+    sdc_api = None
+    STATUS_ERRORS = {}
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SEC = 300
+DEFAULT_INITIAL_INTERVAL_SEC = 0.05
+DEFAULT_MAX_INTERVAL_SEC = 2
+DEFAULT_BACKOFF = 1.5
+PIPELINE_OUTPUT_RECORDS_COUNTER = 'pipeline.batchOutputRecords.counter'
+PIPELINE_BATCH_COUNTER = 'pipeline.batchCount.counter'
+PIPELINE_ERROR_RECORDS_COUNTER = 'pipeline.batchErrorRecords.counter'
+DEFAULT_SNAPSHOT_TIMEOUT_SEC = 30
+# Waits met after this fraction of their timeout are logged as warnings.
+DEADLINE_WARNING_RATIO = 0.8
+# Statuses a pipeline doesn't leave on its own.
+INACTIVE_STATUSES = ('EDITED', 'FINISHED', 'KILLED', 'RUN_ERROR', 'START_ERROR', 'STOPPED', 'STOP_ERROR',
+                     'DISCONNECTED', 'CONNECT_ERROR')
+
+
+WaitTiming = namedtuple('WaitTiming', ['description', 'seconds', 'polls', 'timeout_sec', 'timed_out'])
+
+# Timings of all waits of this process, in call order.
+_wait_timings = []
+
+
+class WaitTimeoutError(TimeoutError):
+    """Raised when a condition isn't met in time."""
+
+
+def get_wait_timings():
+    """Get a :obj:`list` of :py:class:`WaitTiming`, one per wait since the last :py:func:`clear_wait_timings`."""
+    return list(_wait_timings)
+
+
+def clear_wait_timings():
+    _wait_timings.clear()
+
+
+class _Wait:
+    """Deadline, poll count and timing of a single wait."""
+    def __init__(self, description, timeout_sec):
+        self.description = description
+        self.timeout_sec = timeout_sec
+        self.start = perf_counter()
+        self.deadline = self.start + timeout_sec
+        self.polls = 0
+
+    @property
+    def remaining(self):
+        return self.deadline - perf_counter()
+
+    def met(self):
+        seconds = self._record(timed_out=False)
+        if seconds >= DEADLINE_WARNING_RATIO * self.timeout_sec:
+            logger.warning('%s met after %.2f s, close to the %s s timeout', self.description, seconds,
+                           self.timeout_sec)
+        else:
+            logger.debug('%s met after %.2f s (%s polls)', self.description, seconds, self.polls)
+
+    def timeout_error(self, last_value):
+        seconds = self._record(timed_out=True)
+        return WaitTimeoutError(f'Timed out after {seconds:.2f} s of {self.timeout_sec} s ({self.polls} polls) '
+                                f'waiting for {self.description} (last value: {last_value!r})')
+
+    def _record(self, timed_out):
+        seconds = perf_counter() - self.start
+        _wait_timings.append(WaitTiming(self.description, seconds, self.polls, self.timeout_sec, timed_out))
+        return seconds
+
+
+def wait_for(condition, timeout_sec=DEFAULT_TIMEOUT_SEC, initial_interval_sec=DEFAULT_INITIAL_INTERVAL_SEC,
+             max_interval_sec=DEFAULT_MAX_INTERVAL_SEC, backoff=DEFAULT_BACKOFF, description=None):
+    """Poll ``condition`` with exponential backoff until it returns a truthy value.
+
+    Args:
+        condition (:obj:`callable`): Called without arguments.
+        timeout_sec (:obj:`float`, optional): Timeout. Default: :py:const:`DEFAULT_TIMEOUT_SEC`
+        initial_interval_sec (:obj:`float`, optional): First polling interval.
+            Default: :py:const:`DEFAULT_INITIAL_INTERVAL_SEC`
+        max_interval_sec (:obj:`float`, optional): Polling interval cap. Default: :py:const:`DEFAULT_MAX_INTERVAL_SEC`
+        backoff (:obj:`float`, optional): Factor the interval grows by after each poll.
+            Default: :py:const:`DEFAULT_BACKOFF`
+        description (:obj:`str`, optional): What is being waited for, used in messages and timings.
+            Default: the condition's name
+
+    Returns:
+        The truthy value returned by ``condition``.
+
+    Raises:
+        :py:class:`WaitTimeoutError`: If ``condition`` isn't met within ``timeout_sec``.
+    """
+    wait = _Wait(description or getattr(condition, '__name__', 'condition'), timeout_sec)
+    interval = initial_interval_sec
+    while True:
+        result = condition()
+        wait.polls += 1
+        if result:
+            wait.met()
+            return result
+        remaining = wait.remaining
+        if remaining <= 0:
+            raise wait.timeout_error(result)
+        sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval_sec)
+
+
+def wait_for_row_count(engine, table, count, schema=None, **kwargs):
+    """Wait for a table to have at least ``count`` rows, polling ``SELECT COUNT(*)``.
+
+    Args:
+        engine (:py:class:`sqlalchemy.engine.Engine`): Engine to query with.
+        table (:py:class:`sqlalchemy.Table` or :obj:`str`): Table or table name. A name is reflected once.
+        count (:obj:`int`): Number of rows to wait for.
+        schema (:obj:`str`, optional): Schema of a table given by name. Default: ``None``
+        **kwargs: Passed to :py:func:`wait_for`.
+
+    Returns:
+        The number of rows, which may be over ``count``.
+    """
+    if isinstance(table, str):
+        table = sqlalchemy.Table(table, sqlalchemy.MetaData(), autoload=True, autoload_with=engine, schema=schema)
+    statement = sqlalchemy.select([sqlalchemy.func.count()]).select_from(table)
+    row_counts = []
+
+    def row_count_reached():
+        with engine.connect() as connection:
+            row_counts.append(connection.execute(statement).scalar())
+        return row_counts[-1] >= count
+
+    kwargs.setdefault('description', f'{count} rows in table {table.name}')
+    wait_for(row_count_reached, **kwargs)
+    return row_counts[-1]
+
+
+class PipelineWaiter:
+    """Wait for pipeline statuses and metric counters over the SDC REST API.
+
+    Args:
+        sdc_executor (:py:class:`streamsets.testframework.sdc.DataCollector`): Data Collector running the pipelines.
+        initial_interval_sec (:obj:`float`, optional): First polling interval.
+            Default: :py:const:`DEFAULT_INITIAL_INTERVAL_SEC`
+        max_interval_sec (:obj:`float`, optional): Polling interval cap. Default: :py:const:`DEFAULT_MAX_INTERVAL_SEC`
+        request_timeout_sec (:obj:`float`, optional): Timeout of every REST request, e.g. when SDC may be
+            unreachable. Default: ``None`` (no timeout)
+    """
+    def __init__(self, sdc_executor, initial_interval_sec=DEFAULT_INITIAL_INTERVAL_SEC,
+                 max_interval_sec=DEFAULT_MAX_INTERVAL_SEC, request_timeout_sec=None):
+        self.session = sdc_executor.api_client.session
+        self.server_url = sdc_executor.api_client.server_url
+        self.initial_interval_sec = initial_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.request_timeout_sec = request_timeout_sec
+
+    @classmethod
+    def for_api_client(cls, api_client, **kwargs):
+        """Get a waiter using an SDK :py:class:`streamsets.sdk.sdc_api.ApiClient` directly, e.g. the one of a command.
+        """
+        return cls(_ApiClientHolder(api_client), **kwargs)
+
+    def get_status_info(self, pipeline):
+        """Get the pipeline's status as returned by SDC, i.e. a :obj:`dict` with ``status``, ``message`` and more."""
+        return self._get(f'/rest/v1/pipeline/{_get_id(pipeline)}/status')
+
+    def get_status(self, pipeline):
+        return self.get_status_info(pipeline).get('status')
+
+    def get_metrics(self, pipeline):
+        return self._get(f'/rest/v1/pipeline/{_get_id(pipeline)}/metrics')
+
+    def get_counter(self, pipeline, name):
+        return self.get_metrics(pipeline).get('counters', {}).get(name, {}).get('count', 0)
+
+    def get_history_counter(self, pipeline, name):
+        """Get a counter of the pipeline's latest run from its history. Unlike :py:meth:`get_counter`, it works once
+        the pipeline is inactive, whose live metrics read as 0.
+        """
+        # History entries are ordered latest first; metrics are a JSON string, set once a run ends.
+        for entry in self._get(f'/rest/v1/pipeline/{_get_id(pipeline)}/history') or []:
+            if entry.get('metrics'):
+                return json.loads(entry['metrics']).get('counters', {}).get(name, {}).get('count', 0)
+        return 0
+
+    def wait_for_status(self, pipeline, statuses, timeout_sec=DEFAULT_TIMEOUT_SEC, ignore_errors=False):
+        """Wait for the pipeline to reach one of ``statuses``.
+
+        Args:
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline` or :obj:`str`): Pipeline or pipeline id.
+            statuses (:obj:`str` or :obj:`list`): Status or statuses to wait for, e.g. ``'RETRY'``.
+            timeout_sec (:obj:`float`, optional): Timeout. Default: :py:const:`DEFAULT_TIMEOUT_SEC`
+            ignore_errors (:obj:`bool`, optional): Keep waiting when the pipeline becomes inactive in another
+                status, like the SDK's ``wait_for_status``. Default: ``False``
+
+        Returns:
+            The status reached.
+
+        Raises:
+            :py:class:`WaitTimeoutError`: If none of the statuses is reached in time.
+            :py:obj:`Exception`: If the pipeline becomes inactive in a status that wasn't waited for; the SDK's
+                exception for the status (e.g. ``RunError``) when it has one.
+        """
+        statuses = (statuses,) if isinstance(statuses, str) else tuple(statuses)
+
+        def status_reached():
+            status_info = self.get_status_info(pipeline)
+            if status_info.get('status') in statuses:
+                return status_info['status']
+            if not ignore_errors:
+                self._check_inactive(pipeline, status_info)
+
+        return wait_for(status_reached, timeout_sec=timeout_sec, initial_interval_sec=self.initial_interval_sec,
+                        max_interval_sec=self.max_interval_sec,
+                        description=f'pipeline {_get_id(pipeline)} to reach status {"/".join(statuses)}')
+
+    def wait_for_finished(self, pipeline, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        return self.wait_for_status(pipeline, 'FINISHED', timeout_sec=timeout_sec)
+
+    def wait_for_output_records_count(self, pipeline, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        return self.wait_for_counter(pipeline, PIPELINE_OUTPUT_RECORDS_COUNTER, count, timeout_sec=timeout_sec)
+
+    def wait_for_batch_count(self, pipeline, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        return self.wait_for_counter(pipeline, PIPELINE_BATCH_COUNTER, count, timeout_sec=timeout_sec)
+
+    def wait_for_error_records_count(self, pipeline, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        return self.wait_for_counter(pipeline, PIPELINE_ERROR_RECORDS_COUNTER, count, timeout_sec=timeout_sec)
+
+    def wait_for_snapshot(self, pipeline, snapshot_name, timeout_sec=DEFAULT_SNAPSHOT_TIMEOUT_SEC):
+        """Wait for a snapshot of the pipeline to be captured.
+
+        Args:
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline` or :obj:`str`): Pipeline or pipeline id.
+            snapshot_name (:obj:`str`): Snapshot name.
+            timeout_sec (:obj:`float`, optional): Timeout. Default: :py:const:`DEFAULT_SNAPSHOT_TIMEOUT_SEC`
+
+        Raises:
+            :py:class:`WaitTimeoutError`: If the snapshot isn't captured in time.
+        """
+        def snapshot_captured():
+            # SDC answers with an empty body until the snapshot exists.
+            snapshot_status = self._get(f'/rest/v1/pipeline/{_get_id(pipeline)}/snapshot/{snapshot_name}/status')
+            return snapshot_status.get('inProgress') is False
+
+        wait_for(snapshot_captured, timeout_sec=timeout_sec, initial_interval_sec=self.initial_interval_sec,
+                 max_interval_sec=self.max_interval_sec,
+                 description=f'snapshot {snapshot_name} of pipeline {_get_id(pipeline)}')
+
+    def wait_for_counter(self, pipeline, name, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        """Wait for a pipeline metric counter to reach ``count``.
+
+        Args:
+            pipeline (:py:class:`streamsets.sdk.sdc_models.Pipeline` or :obj:`str`): Running pipeline or its id.
+            name (:obj:`str`): Counter name, e.g. :py:const:`PIPELINE_OUTPUT_RECORDS_COUNTER`.
+            count (:obj:`int`): Count to wait for.
+            timeout_sec (:obj:`float`, optional): Timeout. Default: :py:const:`DEFAULT_TIMEOUT_SEC`
+
+        Returns:
+            The counter's value, which may be over ``count``.
+
+        Raises:
+            :py:class:`WaitTimeoutError`: If the count isn't reached in time.
+            :py:obj:`Exception`: If the pipeline becomes inactive before reaching the count, as for
+                :py:meth:`wait_for_status`. A finished pipeline's count is read from its history.
+        """
+        wait = _Wait(f'{name} of pipeline {_get_id(pipeline)} to reach {count}', timeout_sec)
+        interval = self.initial_interval_sec
+        previous = None
+        while True:
+            value = self.get_counter(pipeline, name)
+            wait.polls += 1
+            now = perf_counter()
+            if value >= count:
+                wait.met()
+                return value
+            if previous and value > previous[0]:
+                # Progressing: poll around when the count should be reached at the current rate.
+                rate = (value - previous[0]) / (now - previous[1])
+                interval = (count - value) / rate
+            else:
+                status_info = self.get_status_info(pipeline)
+                if status_info.get('status') == 'FINISHED':
+                    # The pipeline may have finished right after reaching the count.
+                    value = self.get_history_counter(pipeline, name)
+                    if value >= count:
+                        wait.met()
+                        return value
+                self._check_inactive(pipeline, status_info)
+                interval *= DEFAULT_BACKOFF
+            interval = max(self.initial_interval_sec, min(interval, self.max_interval_sec))
+            remaining = wait.remaining
+            if remaining <= 0:
+                raise wait.timeout_error(value)
+            previous = (value, now)
+            sleep(min(interval, remaining))
+
+    def _check_inactive(self, pipeline, status_info):
+        status = status_info.get('status')
+        if status in INACTIVE_STATUSES:
+            if status in STATUS_ERRORS:
+                raise STATUS_ERRORS[status](status_info)
+            raise Exception(f'Pipeline {_get_id(pipeline)} became inactive with status {status}')
+
+    def _get(self, path):
+        response = self.session.get(f'{self.server_url}{path}', params={'rev': 0}, timeout=self.request_timeout_sec)
+        response.raise_for_status()
+        # SDC answers with an empty body when there's nothing to report, e.g. metrics of a stopped pipeline.
+        return response.json() if response.content else {}
+
+
+class SdkWaitAdapter:
+    """Replace the ``wait_for_*`` methods of the SDK's pipeline and snapshot commands with ones backed by a
+    :py:class:`PipelineWaiter`, with the same signatures and the SDK's status exceptions.
+
+    Unlike the SDK, a counter wait fails as soon as the pipeline stops, and transient ``RUNNING_ERROR`` and
+    ``STARTING_ERROR`` statuses don't fail status waits, since the pipeline may retry.
+    """
+    def __init__(self):
+        self._originals = []
+
+    def install(self):
+        if sdc_api is None:
+            return
+        replacements = {'PipelineCommand': {'wait_for_status': _wait_for_status},
+                        'StartPipelineCommand': {'wait_for_finished': _wait_for_finished,
+                                                 'wait_for_counters_metric': _wait_for_counters_metric,
+                                                 'wait_for_pipeline_output_records_count':
+                                                     _wait_for_output_records_count,
+                                                 'wait_for_pipeline_batch_count': _wait_for_batch_count,
+                                                 'wait_for_pipeline_error_records_count':
+                                                     _wait_for_error_records_count},
+                        'SnapshotCommand': {'wait_for_finished': _wait_for_snapshot_finished}}
+        for class_name, methods in replacements.items():
+            cls = getattr(sdc_api, class_name, None)
+            for name, method in methods.items():
+                if cls is not None and name in vars(cls):
+                    self._originals.append((cls, name, vars(cls)[name]))
+                    setattr(cls, name, method)
+
+    def uninstall(self):
+        while self._originals:
+            cls, name, method = self._originals.pop()
+            setattr(cls, name, method)
+
+
+# Methods installed by SdkWaitAdapter. The SDK's wait_for_stopped goes through wait_for_status.
+
+def _wait_for_status(command, status, ignore_errors=False, timeout_sec=DEFAULT_TIMEOUT_SEC):
+    PipelineWaiter.for_api_client(command.api_client).wait_for_status(_get_command_pipeline_id(command), status,
+                                                                      timeout_sec=timeout_sec,
+                                                                      ignore_errors=ignore_errors)
+    _refresh_status(command)
+
+
+def _wait_for_finished(command, timeout_sec=DEFAULT_TIMEOUT_SEC):
+    _wait_for_status(command, 'FINISHED', timeout_sec=timeout_sec)
+
+
+def _wait_for_counters_metric(command, metric_name, target_count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+    PipelineWaiter.for_api_client(command.api_client).wait_for_counter(_get_command_pipeline_id(command),
+                                                                       metric_name, target_count,
+                                                                       timeout_sec=timeout_sec)
+    _refresh_status(command)
+
+
+def _wait_for_output_records_count(command, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+    _wait_for_counters_metric(command, PIPELINE_OUTPUT_RECORDS_COUNTER, count, timeout_sec=timeout_sec)
+
+
+def _wait_for_batch_count(command, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+    _wait_for_counters_metric(command, PIPELINE_BATCH_COUNTER, count, timeout_sec=timeout_sec)
+
+
+def _wait_for_error_records_count(command, count, timeout_sec=DEFAULT_TIMEOUT_SEC):
+    _wait_for_counters_metric(command, PIPELINE_ERROR_RECORDS_COUNTER, count, timeout_sec=timeout_sec)
+
+
+def _wait_for_snapshot_finished(command, timeout_sec=DEFAULT_SNAPSHOT_TIMEOUT_SEC):
+    PipelineWaiter.for_api_client(command.api_client).wait_for_snapshot(command.pipeline_id, command.snapshot_name,
+                                                                        timeout_sec=timeout_sec)
+    command.response = command.api_client.get_snapshot_status(command.pipeline_id, command.snapshot_name).response
+    return command
+
+
+def _get_command_pipeline_id(command):
+    status_info = command.response.json()
+    return status_info.get('pipelineId') or status_info['name']
+
+
+def _refresh_status(command):
+    # The SDK's waits leave the latest status in the command's response.
+    command.response = command.api_client.get_pipeline_status(_get_command_pipeline_id(command)).response
+
+
+def _get_id(pipeline):
+    return getattr(pipeline, 'id', pipeline)
+
+
+class _ApiClientHolder:
+    def __init__(self, api_client):
+        self.api_client = api_client